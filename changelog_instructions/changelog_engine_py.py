@@ -4,12 +4,14 @@ Automated Changelog Generation Engine
 Enterprise-grade documentation with performance optimization
 """
 
-import re
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
-from dataclasses import dataclass
+from typing import Dict, List, Optional
+from dataclasses import asdict, dataclass
 from state_manager import StateManager, ChangeEvent
+from changelog_store import ChangelogStore
+from changelog_render import render_markdown
+from changelog_index import ChangelogIndex
 
 @dataclass
 class AnswerEntry:
@@ -25,9 +27,17 @@ class AnswerEntry:
     next_actions: List[str]
 
 class ChangelogEngine:
-    def __init__(self, changelog_path: str = "Changelog.md"):
+    def __init__(self, changelog_path: str = "Changelog.md", render_interval: int = 10):
         self.changelog_path = Path(changelog_path)
         self.state_manager = StateManager()
+        # Entries are appended to the store; Changelog.md is rendered from it
+        self.store = ChangelogStore(self.changelog_path, render_interval=render_interval,
+                                    default_header=self._get_changelog_header())
+        self.state_manager.ignore_directory(self.store.directory)
+        # Renders replace Changelog.md through a temporary file; neither is workspace content
+        self.state_manager.ignore_path(self.changelog_path)
+        self.state_manager.ignore_path(self.changelog_path.with_name(self.changelog_path.name + ".tmp"))
+        self._query_index = None
         self.answer_counter = self._get_last_answer_number()
         
         # Action type classification
@@ -42,14 +52,9 @@ class ChangelogEngine:
         }
     
     def _get_last_answer_number(self) -> int:
-        """Extract last answer number from existing changelog"""
-        if not self.changelog_path.exists():
-            return 0
-            
+        """Last answer number recorded in the entry store"""
         try:
-            content = self.changelog_path.read_text()
-            matches = re.findall(r'### Answer #(\d+)', content)
-            return max(int(match) for match in matches) if matches else 0
+            return self.store.last_number()
         except (IOError, ValueError):
             return 0
     
@@ -90,9 +95,14 @@ class ChangelogEngine:
             if operation == "ADDED":
                 op_type = "NEW"
                 description = f"Created {event.details.get('type', 'file')} with {event.details.get('size', 0)} bytes"
+                if event.details.get('duplicate_of'):
+                    description += f" (copy of {event.details['duplicate_of']})"
             elif operation == "REMOVED":
                 op_type = "REMOVED"
                 description = f"Deleted {event.details.get('type', 'file')}"
+            elif operation == "MOVED":
+                op_type = "MOVED"
+                description = f"Moved from {event.details.get('from', 'unknown location')}"
             else:  # MODIFIED
                 op_type = "MODIFIED"
                 size_change = event.details.get('size_change', 0)
@@ -101,11 +111,12 @@ class ChangelogEngine:
             files_affected.append({
                 "operation": op_type,
                 "file": file_path,
-                "description": description
+                "description": description,
+                "impact": event.impact_level
             })
         
-        # Sort by operation priority: NEW, MODIFIED, REMOVED
-        priority = {"NEW": 1, "MODIFIED": 2, "REMOVED": 3}
+        # Sort by operation priority: NEW, MODIFIED, MOVED, REMOVED
+        priority = {"NEW": 1, "MODIFIED": 2, "MOVED": 3, "REMOVED": 4}
         files_affected.sort(key=lambda x: (priority.get(x["operation"], 4), x["file"]))
         
         return files_affected
@@ -175,6 +186,7 @@ class ChangelogEngine:
         
         # Increment answer counter
         self.answer_counter += 1
+        self.state_manager.mark_answer(self.answer_counter)
         
         # Classify action type
         action_type = self._classify_action_type(changes, summary)
@@ -206,96 +218,7 @@ class ChangelogEngine:
     
     def format_answer_entry(self, entry: AnswerEntry) -> str:
         """Format answer entry as markdown"""
-        lines = [
-            f"### Answer #{entry.number:03d} - {entry.summary}",
-            f"**Timestamp:** {entry.timestamp}",
-            f"**Action Type:** {entry.action_type}",
-            f"**Previous State:** {entry.previous_state}",
-            f"**Current State:** {entry.current_state}",
-            "",
-            "#### Changes Made:"
-        ]
-        
-        for change in entry.changes_made:
-            lines.append(f"- {change}")
-        
-        lines.extend(["", "#### Files Affected:"])
-        for file_info in entry.files_affected:
-            lines.append(f"- **{file_info['operation']}:** {file_info['file']} - {file_info['description']}")
-        
-        lines.extend(["", "#### Technical Decisions:"])
-        for decision in entry.technical_decisions:
-            lines.append(f"- {decision}")
-        
-        lines.extend(["", "#### Next Actions Required:"])
-        for action in entry.next_actions:
-            lines.append(f"- {action}")
-        
-        lines.extend(["", "---", ""])
-        
-        return "\n".join(lines)
-    
-    def update_changelog(self, summary: str, previous_description: str = "", 
-                        current_description: str = "") -> str:
-        """Update changelog with new entry"""
-        entry = self.generate_answer_entry(summary, previous_description, current_description)
-        formatted_entry = self.format_answer_entry(entry)
-        
-        # Read existing content
-        if self.changelog_path.exists():
-            existing_content = self.changelog_path.read_text()
-        else:
-            existing_content = self._get_changelog_header()
-        
-        # Insert new entry after header
-        header_end = existing_content.find("---\n")
-        if header_end != -1:
-            insertion_point = header_end + 4
-            new_content = (existing_content[:insertion_point] + 
-                         formatted_entry
-        return AnswerEntry(
-            number=self.answer_counter,
-            timestamp=datetime.now().strftime("%Y-%m-%d %H:%M"),
-            action_type=action_type,
-            summary=summary,
-            previous_state=previous_description or "Development continuation state",
-            current_state=current_description or "Enhanced system implementation",
-            changes_made=changes_made,
-            files_affected=self._generate_files_affected(changes),
-            technical_decisions=self._extract_technical_decisions(changes, summary),
-            next_actions=self._generate_next_actions(changes, action_type)
-        )
-    
-    def format_answer_entry(self, entry: AnswerEntry) -> str:
-        """Format answer entry as markdown"""
-        lines = [
-            f"### Answer #{entry.number:03d} - {entry.summary}",
-            f"**Timestamp:** {entry.timestamp}",
-            f"**Action Type:** {entry.action_type}",
-            f"**Previous State:** {entry.previous_state}",
-            f"**Current State:** {entry.current_state}",
-            "",
-            "#### Changes Made:"
-        ]
-        
-        for change in entry.changes_made:
-            lines.append(f"- {change}")
-        
-        lines.extend(["", "#### Files Affected:"])
-        for file_info in entry.files_affected:
-            lines.append(f"- **{file_info['operation']}:** {file_info['file']} - {file_info['description']}")
-        
-        lines.extend(["", "#### Technical Decisions:"])
-        for decision in entry.technical_decisions:
-            lines.append(f"- {decision}")
-        
-        lines.extend(["", "#### Next Actions Required:"])
-        for action in entry.next_actions:
-            lines.append(f"- {action}")
-        
-        lines.extend(["", "---", ""])
-        
-        return "\n".join(lines)
+        return render_markdown(asdict(entry))
     
     def _get_changelog_header(self) -> str:
         """Generate standard changelog header"""
@@ -312,33 +235,64 @@ class ChangelogEngine:
     def update_changelog(self, summary: str, previous_description: str = "", 
                         current_description: str = "") -> str:
         """Update changelog with new entry"""
+        # Refuse before numbering the answer: a conflict must not use up its number
+        adopted = self.store.check_edits()
+        if adopted:
+            # Answers added by hand to Changelog.md take their numbers
+            self.query_index.add(adopted)
+            self.answer_counter = max(self.answer_counter, self.store.last_number())
         entry = self.generate_answer_entry(summary, previous_description, current_description)
         formatted_entry = self.format_answer_entry(entry)
-        
-        # Read existing content
-        if self.changelog_path.exists():
-            existing_content = self.changelog_path.read_text()
-        else:
-            existing_content = self._get_changelog_header()
-        
-        # Insert new entry after header
-        header_end = existing_content.find("---\n")
-        if header_end != -1:
-            insertion_point = header_end + 4
-            new_content = (existing_content[:insertion_point] + 
-                         formatted_entry + existing_content[insertion_point:])
-        else:
-            new_content = existing_content + formatted_entry
-        
-        # Write updated content
-        self.changelog_path.write_text(new_content)
+        record = asdict(entry)
+        self.store.append(record)
+        self.query_index.add([record])
         return formatted_entry
     
+    def get_entry(self, number: int) -> Optional[AnswerEntry]:
+        """Answer #number from the entry store (None for pre-formatted records)"""
+        record = self.store.get(number)
+        if record is None or "markdown" in record:
+            return None
+        return AnswerEntry(**record)
+    
+    def get_entry_markdown(self, number: int) -> Optional[str]:
+        """Formatted text of answer #number from the entry store"""
+        record = self.store.get(number)
+        return render_markdown(record) if record else None
+    
+    @property
+    def query_index(self) -> ChangelogIndex:
+        """Query index over the entry store, opened (and caught up) on first use"""
+        if self._query_index is None:
+            index = ChangelogIndex(self.store.directory / "query_index.db")
+            if len(index) != len(self.store.index):
+                indexed = index.numbers()
+                index.add(record for record in self.store.entries()
+                          if record["number"] not in indexed)
+            self._query_index = index
+        return self._query_index
+    
+    def query(self, path: Optional[str] = None, path_prefix: Optional[str] = None,
+              action_type: Optional[str] = None, impact: Optional[str] = None,
+              since: Optional[str] = None, until: Optional[str] = None,
+              limit: Optional[int] = None) -> List[Dict]:
+        """Answers matching every given filter, newest first; get_entry(number) has the full entry"""
+        return self.query_index.query(path=path, path_prefix=path_prefix,
+                                      action_type=action_type, impact=impact,
+                                      since=since, until=until, limit=limit)
+    
+    def export_changelog(self, output_path: str, fmt: str = "markdown") -> int:
+        """Write the full history, newest first, as markdown, jsonl or html"""
+        return self.store.export(output_path, fmt)
+    
+    def render_changelog(self) -> bool:
+        """Bring Changelog.md up to date with every stored entry now"""
+        return self.store.render()
+    
     def generate_workspace_report(self) -> Dict:
         """Generate comprehensive workspace analysis report"""
         current_state = self.state_manager.get_current_state()
-        changes = self.state_manager.detect_changes()
-        change_summary = self.state_manager.generate_change_summary(changes)
+        change_summary = self.state_manager.summarize_changes()
         metrics = self.state_manager.get_metrics()
         
         return {
@@ -349,6 +303,7 @@ class ChangelogEngine:
                 "state_hash": current_state.state_hash
             },
             "change_analysis": change_summary,
+            "content_duplicates": self.state_manager.get_duplicate_report(limit=5),
             "performance_metrics": metrics,
             "system_health": {
                 "cache_efficiency": metrics["cache_hit_rate"],
@@ -369,7 +324,9 @@ class ChangelogEngine:
             if not current_state or not current_state.state_hash:
                 return False
             
-            # Check answer counter consistency
+            # Check entry store and answer counter consistency
+            if not self.store.verify():
+                return False
             file_counter = self._get_last_answer_number()
             if abs(self.answer_counter - file_counter) > 1:
                 return False
@@ -379,8 +336,63 @@ class ChangelogEngine:
             return False
 
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Changelog engine")
+    subcommands = parser.add_subparsers(dest="command")
+    show_parser = subcommands.add_parser("show", help="print answer #N from the entry store")
+    show_parser.add_argument("number", type=int)
+    subcommands.add_parser("segments", help="list changelog segments and archives")
+    query_parser = subcommands.add_parser("query", help="find answers by file, type, impact or date")
+    query_parser.add_argument("--file", help="exact file path")
+    query_parser.add_argument("--under", help="directory or path prefix")
+    query_parser.add_argument("--type", help="action type, e.g. Optimization")
+    query_parser.add_argument("--impact", choices=["HIGH", "MEDIUM", "LOW"])
+    query_parser.add_argument("--since", help="YYYY-MM-DD[ HH:MM]")
+    query_parser.add_argument("--until", help="YYYY-MM-DD[ HH:MM]")
+    query_parser.add_argument("--limit", type=int)
+    query_parser.add_argument("--full", action="store_true", help="print the matching entries")
+    export_parser = subcommands.add_parser("export", help="render the full history")
+    export_parser.add_argument("output")
+    export_parser.add_argument("--format", choices=["markdown", "jsonl", "html"], default="markdown")
+    args = parser.parse_args()
+    
     engine = ChangelogEngine()
     
+    if args.command == "show":
+        text = engine.get_entry_markdown(args.number)
+        if text is None:
+            print(f"✗ Answer #{args.number:03d} not found in the entry store")
+            raise SystemExit(1)
+        print(text)
+        raise SystemExit(0)
+    
+    if args.command == "query":
+        results = engine.query(path=args.file, path_prefix=args.under, action_type=args.type,
+                               impact=args.impact, since=args.since, until=args.until,
+                               limit=args.limit)
+        for result in results:
+            if args.full:
+                print(engine.get_entry_markdown(result["number"]))
+            else:
+                print(f"#{result['number']:03d}  {result['timestamp']}  "
+                      f"{result['action_type'] or '-':15s} {result['summary'] or ''}")
+        print(f"{len(results)} answers")
+        raise SystemExit(0)
+    
+    if args.command == "export":
+        count = engine.export_changelog(args.output, args.format)
+        print(f"✓ Exported {count} entries to {args.output}")
+        raise SystemExit(0)
+    
+    if args.command == "segments":
+        for segment in engine.store.segments():
+            answers = (f"#{segment['first']:03d}-#{segment['last']:03d}"
+                       if segment.get("first") is not None else "empty")
+            print(f"{segment['id']:6d}  {answers:15s} {segment['entries']:5d} entries  "
+                  f"{segment['bytes'] / 1024:8.1f}KB  {segment['file']}")
+        raise SystemExit(0)
+    
     # System validation
     if engine.validate_system_integrity():
         print("✓ Changelog system operational")
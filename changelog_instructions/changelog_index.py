@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Changelog Query Index
+Inverted indexes over answer entries (files, action types, impact, time) in SQLite
+"""
+
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    number INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    action_type TEXT COLLATE NOCASE,
+    summary TEXT
+);
+CREATE INDEX IF NOT EXISTS answers_timestamp ON answers (timestamp);
+CREATE INDEX IF NOT EXISTS answers_action_timestamp ON answers (action_type, timestamp);
+CREATE TABLE IF NOT EXISTS answer_files (
+    path TEXT NOT NULL,
+    number INTEGER NOT NULL,
+    operation TEXT,
+    impact TEXT
+);
+CREATE INDEX IF NOT EXISTS answer_files_path ON answer_files (path, number);
+CREATE INDEX IF NOT EXISTS answer_files_impact ON answer_files (impact, number);
+CREATE INDEX IF NOT EXISTS answer_files_number ON answer_files (number);
+"""
+
+class ChangelogIndex:
+    """Answer entries in SQLite, indexed by file path, action type, impact and time"""
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self.conn = sqlite3.connect(str(self.db_path))
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+
+    def numbers(self) -> Set[int]:
+        return {row["number"] for row in self.conn.execute("SELECT number FROM answers")}
+
+    # -- writing ------------------------------------------------------------
+
+    def add(self, entries: Iterable[Dict]):
+        """Index stored entry records (replacing any already indexed under the same number)"""
+        with self.conn:
+            for entry in entries:
+                number = entry["number"]
+                self.conn.execute("DELETE FROM answer_files WHERE number = ?", (number,))
+                self.conn.execute("INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?)",
+                                  (number, entry["timestamp"], entry.get("action_type"),
+                                   entry.get("summary")))
+                self.conn.executemany(
+                    "INSERT INTO answer_files VALUES (?, ?, ?, ?)",
+                    ((info["file"], number, info.get("operation"), info.get("impact"))
+                     for info in entry.get("files_affected", ())))
+
+    # -- queries ------------------------------------------------------------
+
+    def query(self, path: Optional[str] = None, path_prefix: Optional[str] = None,
+              action_type: Optional[str] = None, impact: Optional[str] = None,
+              since: Optional[str] = None, until: Optional[str] = None,
+              limit: Optional[int] = None) -> List[Dict]:
+        """Answers matching every given filter (since/until inclusive, a bare date covering its day), newest first"""
+        query = "SELECT number, timestamp, action_type, summary FROM answers a WHERE 1"
+        params: list = []
+        if path is not None:
+            query += " AND number IN (SELECT number FROM answer_files WHERE path = ?)"
+            params.append(path)
+        if path_prefix is not None:
+            query += (" AND number IN (SELECT number FROM answer_files"
+                      " WHERE path >= ? AND path < ?)")
+            params.extend([path_prefix, path_prefix + "\U0010ffff"])
+        if impact is not None:
+            query += " AND number IN (SELECT number FROM answer_files WHERE impact = ?)"
+            params.append(impact.upper())
+        if action_type is not None:
+            query += " AND action_type = ?"
+            params.append(action_type)
+        if since is not None:
+            query += " AND timestamp >= ?"
+            params.append(since)
+        if until is not None:
+            # A bare date covers that whole day
+            query += " AND timestamp <= ?"
+            params.append(until if len(until) > 10 else until + "\U0010ffff")
+        query += " ORDER BY number DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return [dict(row) for row in self.conn.execute(query, params)]
+
+    def files_for(self, number: int) -> List[Dict]:
+        rows = self.conn.execute("SELECT path, operation, impact FROM answer_files"
+                                 " WHERE number = ? ORDER BY path", (number,))
+        return [dict(row) for row in rows]
+
+    def action_type_totals(self) -> Dict[str, int]:
+        rows = self.conn.execute("SELECT action_type, COUNT(*) AS answers FROM answers"
+                                 " GROUP BY action_type ORDER BY answers DESC")
+        return {row["action_type"]: row["answers"] for row in rows}
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Changelog Renderers
+Markdown, JSON Lines and static HTML views over stored answer entries
+"""
+
+import re
+import html
+import json
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+
+ENTRY_HEADING = re.compile(r'^### Answer #(\d+)(?: - (.*))?$', re.M)
+FIELD_PATTERN = re.compile(r'^\*\*(Timestamp|Action Type):\*\* (.*)$', re.M)
+FILE_LINE = re.compile(r'^- \*\*(\w+):\*\* (.+)$', re.M)
+
+def render_markdown(entry: Dict) -> str:
+    """Format one stored entry as a Changelog.md block"""
+    if "markdown" in entry:
+        # Legacy or hand-written entry, verbatim up to its closing rule (trailing blank lines are spacing)
+        return entry["markdown"].rstrip() + "\n"
+    lines = [
+        f"### Answer #{entry['number']:03d} - {entry['summary']}",
+        f"**Timestamp:** {entry['timestamp']}",
+        f"**Action Type:** {entry['action_type']}",
+        f"**Previous State:** {entry['previous_state']}",
+        f"**Current State:** {entry['current_state']}",
+        "",
+        "#### Changes Made:"
+    ]
+
+    for change in entry["changes_made"]:
+        lines.append(f"- {change}")
+
+    lines.extend(["", "#### Files Affected:"])
+    for file_info in entry["files_affected"]:
+        lines.append(f"- **{file_info['operation']}:** {file_info['file']} - {file_info['description']}")
+
+    lines.extend(["", "#### Technical Decisions:"])
+    for decision in entry["technical_decisions"]:
+        lines.append(f"- {decision}")
+
+    lines.extend(["", "#### Next Actions Required:"])
+    for action in entry["next_actions"]:
+        lines.append(f"- {action}")
+
+    lines.extend(["", "---", ""])
+
+    return "\n".join(lines)
+
+def parse_markdown_entries(text: str) -> Tuple[str, List[Dict], str]:
+    """Split changelog Markdown into leading text, entry records and trailing text"""
+    starts = list(ENTRY_HEADING.finditer(text))
+    if not starts:
+        return text, [], ""
+    records = []
+    tail = ""
+    for i, match in enumerate(starts):
+        end = starts[i + 1].start() if i + 1 < len(starts) else len(text)
+        block = text[match.start():end]
+        if i + 1 == len(starts):
+            # The last entry ends at its closing rule; what follows is trailing text
+            rule = block.find("\n---\n")
+            if rule != -1:
+                block, tail = block[:rule + 5], block[rule + 5:]
+        records.append(_parse_block(int(match.group(1)), match.group(2) or "", block))
+    return text[:starts[0].start()], records, tail
+
+def _parse_block(number: int, summary: str, block: str) -> Dict:
+    """Record for a hand-written or legacy entry; the Markdown is kept verbatim"""
+    fields = dict(FIELD_PATTERN.findall(block))
+    files_affected = []
+    files_start = block.find("#### Files Affected")
+    if files_start != -1:
+        files_end = block.find("\n####", files_start + 1)
+        section = block[files_start:files_end if files_end != -1 else len(block)]
+        for operation, rest in FILE_LINE.findall(section):
+            file_path, _, description = rest.partition(" - ")
+            files_affected.append({
+                "operation": operation,
+                "file": re.sub(r'\s+\(.*\)$', "", file_path.strip()),
+                "description": description.strip()
+            })
+    return {
+        "number": number,
+        "timestamp": fields.get("Timestamp", "").strip(),
+        "action_type": fields.get("Action Type", "").strip() or None,
+        "summary": summary.strip(),
+        "files_affected": files_affected,
+        "markdown": block.rstrip() + "\n"
+    }
+
+def markdown_view(entries: Iterable[Dict], header: str = "") -> Iterator[str]:
+    if header:
+        yield header
+    for entry in entries:
+        yield render_markdown(entry)
+
+def jsonl_view(entries: Iterable[Dict], header: str = "") -> Iterator[str]:
+    """One JSON object per line, the stored form of each entry"""
+    for entry in entries:
+        yield json.dumps(entry, ensure_ascii=False) + "\n"
+
+def html_view(entries: Iterable[Dict], header: str = "") -> Iterator[str]:
+    """Self-contained static HTML page, one section per entry"""
+    yield ("<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n"
+           "<title>Changelog</title>\n<style>\n"
+           "body { font-family: sans-serif; max-width: 60em; margin: auto; }\n"
+           "section { border-bottom: 1px solid #ccc; padding: 0.5em 0; }\n"
+           ".meta { color: #555; }\n"
+           "</style>\n</head>\n<body>\n<h1>Changelog</h1>\n")
+    escape = html.escape
+    for entry in entries:
+        if "markdown" in entry:
+            yield f"<section>\n<pre>{escape(entry['markdown'])}</pre>\n</section>\n"
+            continue
+        parts = [
+            f"<section id=\"answer-{entry['number']}\">",
+            f"<h2>Answer #{entry['number']:03d} - {escape(entry['summary'])}</h2>",
+            f"<p class=\"meta\">{escape(entry['timestamp'])} &middot; {escape(entry['action_type'])}</p>",
+            f"<p><strong>Previous State:</strong> {escape(entry['previous_state'])}<br>",
+            f"<strong>Current State:</strong> {escape(entry['current_state'])}</p>"
+        ]
+        sections = [
+            ("Changes Made", [escape(change) for change in entry["changes_made"]]),
+            ("Files Affected", [f"<strong>{escape(info['operation'])}:</strong> "
+                                f"<code>{escape(info['file'])}</code> - {escape(info['description'])}"
+                                for info in entry["files_affected"]]),
+            ("Technical Decisions", [escape(decision) for decision in entry["technical_decisions"]]),
+            ("Next Actions Required", [escape(action) for action in entry["next_actions"]])
+        ]
+        for title, items in sections:
+            parts.append(f"<h3>{title}</h3>")
+            parts.append("<ul>" + "".join(f"<li>{item}</li>" for item in items) + "</ul>")
+        parts.append("</section>\n")
+        yield "\n".join(parts)
+    yield "</body>\n</html>\n"
+
+RENDERERS: Dict[str, Callable[..., Iterator[str]]] = {
+    "markdown": markdown_view,
+    "jsonl": jsonl_view,
+    "html": html_view
+}
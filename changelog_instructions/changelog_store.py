@@ -0,0 +1,573 @@
+#!/usr/bin/env python3
+"""
+Changelog Entry Store
+Append-only, segmented entry journal with Changelog.md rendered from it as a view
+"""
+
+import os
+import re
+import gzip
+import json
+import hashlib
+import lzma
+import struct
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional
+from changelog_render import RENDERERS, parse_markdown_entries, render_markdown
+
+ARCHIVE_NOTE = re.compile(r'\*Answers #\d+-#\d+ are archived in [^\n]*\*\n\n---\n')
+
+class ChangelogConflictError(RuntimeError):
+    """Raised when rendering would overwrite hand edits to stored answers"""
+
+def write_atomic(path: Path, data: bytes):
+    """Replace path with data via a synced temporary file and a rename"""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def _merge_duplicates(records: List[Dict]) -> List[Dict]:
+    """Parsed entry records by number; duplicate numbers keep both texts under the first"""
+    merged: Dict[int, Dict] = {}
+    for record in records:
+        prior = merged.get(record["number"])
+        if prior is None:
+            merged[record["number"]] = record
+        else:
+            prior["markdown"] += record["markdown"]
+            prior["files_affected"] += record["files_affected"]
+    return [merged[number] for number in sorted(merged)]
+
+def _rfind_newline(f, end: int, block: int = 65536) -> int:
+    """Offset of the last newline before end in a binary file, or -1"""
+    while end > 0:
+        start = max(0, end - block)
+        f.seek(start)
+        found = f.read(end - start).rfind(b"\n")
+        if found != -1:
+            return start + found
+        end = start
+    return -1
+
+class IndexRecord(NamedTuple):
+    number: int
+    segment: int
+    offset: int
+    length: int
+    timestamp: str
+
+class AnswerIndex:
+    """Fixed-width sidecar records (number, segment, offset, length, timestamp), one per entry"""
+
+    RECORD = struct.Struct("<QQQQ32s")
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.touch()
+        size = self.path.stat().st_size
+        if size % self.RECORD.size:
+            with open(self.path, "rb+") as f:
+                f.truncate(size - size % self.RECORD.size)
+
+    def __len__(self) -> int:
+        return self.path.stat().st_size // self.RECORD.size
+
+    def _unpack(self, data: bytes) -> IndexRecord:
+        number, segment, offset, length, timestamp = self.RECORD.unpack(data)
+        return IndexRecord(number, segment, offset, length, timestamp.rstrip(b"\0").decode("utf-8", "ignore"))
+
+    def read(self, position: int) -> IndexRecord:
+        with open(self.path, "rb") as f:
+            f.seek(position * self.RECORD.size)
+            return self._unpack(f.read(self.RECORD.size))
+
+    def last(self) -> Optional[IndexRecord]:
+        count = len(self)
+        return self.read(count - 1) if count else None
+
+    def find(self, number: int) -> Optional[IndexRecord]:
+        """Record of entry #number: direct position, binary search as fallback"""
+        count = len(self)
+        if not count:
+            return None
+        first = self.read(0).number
+        position = number - first
+        if 0 <= position < count:
+            record = self.read(position)
+            if record.number == number:
+                return record
+        low, high = 0, count - 1
+        while low <= high:
+            middle = (low + high) // 2
+            record = self.read(middle)
+            if record.number == number:
+                return record
+            if record.number < number:
+                low = middle + 1
+            else:
+                high = middle - 1
+        return None
+
+    def records(self) -> Iterator[IndexRecord]:
+        with open(self.path, "rb") as f:
+            for data in iter(lambda: f.read(self.RECORD.size), b""):
+                yield self._unpack(data)
+
+    def append(self, records: List[IndexRecord]):
+        data = b"".join(self.RECORD.pack(r.number, r.segment, r.offset, r.length,
+                                         r.timestamp.encode("utf-8")) for r in records)
+        with open(self.path, "ab") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def clear(self):
+        self.path.write_bytes(b"")
+
+class ChangelogStore:
+    """Changelog entries in an append-only, segmented journal, with Changelog.md rendered from it as a view"""
+    # Layout: header.md, legacy.md, meta.json, manifest.json, index.bin,
+    # segments/<id>.jsonl (active) and archive/<id>.jsonl[.gz|.xz]; single writer.
+
+    SUFFIXES = {"gzip": ".gz", "xz": ".xz", None: ""}
+
+    def __init__(self, changelog_path, directory=None, render_interval: int = 10,
+                 default_header: str = "", max_segment_bytes: int = 1024 * 1024,
+                 max_segment_entries: int = 500, rotate_by_session: bool = True,
+                 compression: Optional[str] = "gzip", view_segments: int = 2):
+        if compression not in self.SUFFIXES:
+            raise ValueError(f"Unknown compression: {compression}")
+        self.changelog_path = Path(changelog_path)
+        self.directory = Path(directory) if directory else self.changelog_path.parent / ".changelog"
+        self.segments_dir = self.directory / "segments"
+        self.archive_dir = self.directory / "archive"
+        for path in (self.directory, self.segments_dir, self.archive_dir):
+            path.mkdir(parents=True, exist_ok=True)
+        self.render_interval = render_interval
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_entries = max_segment_entries
+        self.rotate_by_session = rotate_by_session
+        self.compression = compression
+        self.view_segments = view_segments
+        self.header_path = self.directory / "header.md"
+        self.legacy_path = self.directory / "legacy.md"
+        self.meta_path = self.directory / "meta.json"
+        self.manifest_path = self.directory / "manifest.json"
+        if not self.meta_path.exists():
+            self._import_changelog(default_header)
+        if not self.manifest_path.exists():
+            self._init_segments()
+        self.meta = json.loads(self.meta_path.read_text())
+        self.manifest = json.loads(self.manifest_path.read_text())
+        self.index = AnswerIndex(self.directory / "index.bin")
+        self._recover()
+        if not self.meta.get("legacy_imported"):
+            self._import_legacy_entries()
+        self.conflicts: List[int] = []
+        self.adopt_edits()
+
+    # -- setup --------------------------------------------------------------
+
+    def _import_changelog(self, default_header: str):
+        """Take over an existing Changelog.md (its answers are imported afterwards)"""
+        if self.changelog_path.exists():
+            content = self.changelog_path.read_text()
+        else:
+            content = default_header
+        write_atomic(self.header_path, content.encode("utf-8"))
+        write_atomic(self.legacy_path, b"")
+        write_atomic(self.meta_path, json.dumps({"legacy_last": 0, "rendered_through": 0}).encode("utf-8"))
+
+    def _import_legacy_entries(self):
+        """Move the answers in header and legacy tail into segment 0 of the store, verbatim"""
+        text = self.header_path.read_text() + self.legacy_path.read_text()
+        header, records, tail = parse_markdown_entries(text)
+        if records:
+            records = _merge_duplicates(records)
+            data = b"".join(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n"
+                            for record in records)
+            name = f"{0:06d}.jsonl{self.SUFFIXES[self.compression]}"
+            self._write_archive(self.archive_dir / name, data)
+            self.manifest["segments"].insert(0, {
+                "id": 0,
+                "file": f"{self.archive_dir.name}/{name}",
+                "compression": self.compression,
+                "first": records[0]["number"],
+                "last": records[-1]["number"],
+                "entries": len(records),
+                "session": records[0]["timestamp"][:10],
+                "bytes": len(data),
+                "stored_bytes": (self.archive_dir / name).stat().st_size
+            })
+            self.manifest["active_start"] += len(records)
+            write_atomic(self.manifest_path, json.dumps(self.manifest, indent=2).encode("utf-8"))
+            # Legacy answers precede every stored one: rebuild the index in order
+            self.index.clear()
+            self._sync_index()
+        write_atomic(self.header_path, header.encode("utf-8"))
+        write_atomic(self.legacy_path, tail.encode("utf-8"))
+        self.meta["legacy_imported"] = True
+        if records:
+            self.meta["rendered_through"] = max(self.meta["rendered_through"], records[-1]["number"])
+        write_atomic(self.meta_path, json.dumps(self.meta).encode("utf-8"))
+
+    def _write_archive(self, target: Path, data: bytes):
+        if self.compression == "gzip":
+            write_atomic(target, gzip.compress(data))
+        elif self.compression == "xz":
+            write_atomic(target, lzma.compress(data))
+        else:
+            write_atomic(target, data)
+
+    def _init_segments(self):
+        """Start segment 1, adopting a single-file journal (entries.jsonl) if present"""
+        single = self.directory / "entries.jsonl"
+        if single.exists():
+            os.replace(single, self._segment_path(1))
+            (self.directory / "index.bin").unlink(missing_ok=True)  # rebuilt with segment ids
+        write_atomic(self.manifest_path, json.dumps(
+            {"active": 1, "active_start": 0, "segments": []}, indent=2).encode("utf-8"))
+
+    def _segment_path(self, segment: int) -> Path:
+        return self.segments_dir / f"{segment:06d}.jsonl"
+
+    @property
+    def active_path(self) -> Path:
+        return self._segment_path(self.manifest["active"])
+
+    def _archived(self) -> Dict[int, Dict]:
+        return {entry["id"]: entry for entry in self.manifest["segments"]}
+
+    def _segment_ids(self) -> List[int]:
+        return [entry["id"] for entry in self.manifest["segments"]] + [self.manifest["active"]]
+
+    def _segment_size(self, segment: int) -> int:
+        """Uncompressed size of a segment"""
+        entry = self._archived().get(segment)
+        return entry["bytes"] if entry else self._segment_path(segment).stat().st_size
+
+    def _open_segment(self, segment: int):
+        """Binary reader over a segment's uncompressed lines"""
+        entry = self._archived().get(segment)
+        if entry is None:
+            return open(self._segment_path(segment), "rb")
+        path = self.directory / entry["file"]
+        if entry["compression"] == "gzip":
+            return gzip.open(path, "rb")
+        if entry["compression"] == "xz":
+            return lzma.open(path, "rb")
+        return open(path, "rb")
+
+    def _recover(self):
+        """Finish an interrupted rotation, drop a torn final line, catch up the index"""
+        for path in self.segments_dir.glob("*.jsonl"):
+            if int(path.stem) != self.manifest["active"]:
+                path.unlink()  # already archived
+        self.active_path.touch()
+        size = self.active_path.stat().st_size
+        if size:
+            with open(self.active_path, "rb+") as f:
+                f.seek(size - 1)
+                if f.read(1) != b"\n":
+                    f.truncate(_rfind_newline(f, size) + 1)
+        self._sync_index()
+
+    def _sync_index(self):
+        """Index journal lines past the last indexed one (after a crash or on upgrade)"""
+        segments = self._segment_ids()
+        last = self.index.last()
+        if last is not None and (last.segment not in segments
+                                 or last.offset + last.length > self._segment_size(last.segment)):
+            # Index ahead of a truncated journal: rebuild it
+            self.index.clear()
+            last = None
+        start_segment, start_offset = (last.segment, last.offset + last.length) if last else (0, 0)
+        records = []
+        for segment in segments:
+            if segment < start_segment:
+                continue
+            offset = start_offset if segment == start_segment else 0
+            if offset == self._segment_size(segment):
+                continue
+            with self._open_segment(segment) as f:
+                f.seek(offset)
+                for line in f:
+                    record = json.loads(line)
+                    records.append(IndexRecord(record["number"], segment, offset, len(line),
+                                               record["timestamp"]))
+                    offset += len(line)
+        if records:
+            self.index.append(records)
+
+    # -- writing ------------------------------------------------------------
+
+    def append(self, record: Dict):
+        """Record one entry (number and timestamp at least), rotating before and rendering after when due"""
+        # Hand edits are adopted (or refused) first, so a refused append stores nothing
+        self.check_edits()
+        self._write(record)
+        if record["number"] - self.meta["rendered_through"] >= self.render_interval:
+            self.render()
+
+    def _write(self, record: Dict):
+        number, timestamp = record["number"], record["timestamp"]
+        if self._rotation_due(timestamp):
+            self.rotate()
+        line = json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n"
+        with open(self.active_path, "ab") as f:
+            offset = f.tell()
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        self.index.append([IndexRecord(number, self.manifest["active"], offset, len(line), timestamp)])
+
+    def _active_count(self) -> int:
+        return len(self.index) - self.manifest["active_start"]
+
+    def _rotation_due(self, timestamp: str) -> bool:
+        count = self._active_count()
+        if not count:
+            return False
+        if count >= self.max_segment_entries:
+            return True
+        if self.active_path.stat().st_size >= self.max_segment_bytes:
+            return True
+        if self.rotate_by_session:
+            first = self.index.read(self.manifest["active_start"])
+            return first.timestamp[:10] != timestamp[:10]
+        return False
+
+    def rotate(self) -> bool:
+        """Archive the active segment and start a new one; False if it is empty"""
+        count = self._active_count()
+        if not count:
+            return False
+        segment = self.manifest["active"]
+        source = self.active_path
+        first = self.index.read(self.manifest["active_start"])
+        last = self.index.last()
+        name = f"{segment:06d}.jsonl{self.SUFFIXES[self.compression]}"
+        target = self.archive_dir / name
+        data = source.read_bytes()
+        self._write_archive(target, data)
+        self.manifest["segments"].append({
+            "id": segment,
+            "file": f"{self.archive_dir.name}/{name}",
+            "compression": self.compression,
+            "first": first.number,
+            "last": last.number,
+            "entries": count,
+            "session": first.timestamp[:10],
+            "bytes": len(data),
+            "stored_bytes": target.stat().st_size
+        })
+        self.manifest["active"] = segment + 1
+        self.manifest["active_start"] = len(self.index)
+        write_atomic(self.manifest_path, json.dumps(self.manifest, indent=2).encode("utf-8"))
+        source.unlink()
+        self.active_path.touch()
+        return True
+
+    def _shown_segments(self) -> List[int]:
+        segments = self._segment_ids()
+        return segments[-self.view_segments:] if self.view_segments > 0 else []
+
+    def render(self, force: bool = False) -> bool:
+        """Rewrite Changelog.md from the store (after adopting hand edits); False when already current"""
+        if force:
+            self.adopt_edits()
+        else:
+            self.check_edits()
+        last = self.last_number()
+        if last == self.meta["rendered_through"] and self.changelog_path.exists() and not self.conflicts:
+            return False
+        shown = self._shown_segments()
+        hidden = [entry for entry in self.manifest["segments"] if entry["id"] not in shown]
+        hasher = hashlib.blake2b(digest_size=16)
+        tmp_path = self.changelog_path.with_name(self.changelog_path.name + ".tmp")
+        with open(tmp_path, "wb") as out:
+            def emit(data: bytes):
+                hasher.update(data)
+                out.write(data)
+
+            emit(self.header_path.read_bytes())
+            for segment in reversed(shown):
+                with self._open_segment(segment) as f:
+                    lines = f.read().splitlines()
+                for line in reversed(lines):
+                    emit(render_markdown(json.loads(line)).encode("utf-8"))
+            if hidden:
+                note = (f"*Answers #{hidden[0]['first']:03d}-#{hidden[-1]['last']:03d} are archived in "
+                        f"{self.directory.name}/{self.archive_dir.name} ({len(hidden)} segments)*\n\n---\n")
+                emit(note.encode("utf-8"))
+            emit(self.legacy_path.read_bytes())
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp_path, self.changelog_path)
+        self.conflicts = []
+        self.meta["rendered_through"] = last
+        self._record_view(hasher.hexdigest())
+        return True
+
+    def _record_view(self, digest: str):
+        """Remember what Changelog.md looked like when the store last wrote or adopted it"""
+        stat = self.changelog_path.stat()
+        self.meta["view"] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": digest}
+        write_atomic(self.meta_path, json.dumps(self.meta).encode("utf-8"))
+
+    def check_edits(self) -> List[Dict]:
+        """adopt_edits, raising ChangelogConflictError if stored answers were edited by hand"""
+        added = self.adopt_edits()
+        if self.conflicts:
+            raise ChangelogConflictError(
+                f"{self.changelog_path} has hand edits to stored answers "
+                f"{', '.join(f'#{n:03d}' for n in self.conflicts)}; not overwriting it. "
+                f"Undo those edits or render with force=True to discard them.")
+        return added
+
+    def adopt_edits(self) -> List[Dict]:
+        """Take over hand edits to Changelog.md since the last render; returns the answers added"""
+        view = self.meta.get("view")
+        try:
+            stat = self.changelog_path.stat()
+        except FileNotFoundError:
+            return []
+        if view and (stat.st_size, stat.st_mtime_ns) == (view["size"], view["mtime_ns"]):
+            return []
+        data = self.changelog_path.read_bytes()
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        if view and digest == view["hash"]:
+            self._record_view(digest)
+            return []
+
+        head, records, tail = parse_markdown_entries(data.decode("utf-8"))
+        note = ARCHIVE_NOTE.match(tail)
+        if note:
+            tail = tail[note.end():]
+        last = self.last_number()
+        stored = {}
+        for segment in self._shown_segments():
+            with self._open_segment(segment) as f:
+                for line in f:
+                    record = json.loads(line)
+                    stored[record["number"]] = render_markdown(record)
+        conflicts, added = [], []
+        for record in _merge_duplicates(records):
+            number = record["number"]
+            if number > last:
+                # Without a timestamp the answer would start a new session segment
+                record["timestamp"] = record["timestamp"] or time.strftime(
+                    "%Y-%m-%d %H:%M", time.localtime(stat.st_mtime))
+                added.append(record)
+                continue
+            if number not in stored:
+                original = self.get(number)
+                stored[number] = render_markdown(original) if original else None
+            if stored[number] != record["markdown"]:
+                conflicts.append(number)
+        parsed = {record["number"] for record in records}
+        conflicts.extend(number for number in stored
+                         if number <= self.meta["rendered_through"] and number not in parsed)
+        self.conflicts = sorted(set(conflicts))
+        if self.conflicts:
+            return []
+
+        was_current = self.meta["rendered_through"] >= last
+        for record in added:
+            self._write(record)
+        write_atomic(self.header_path, head.encode("utf-8"))
+        write_atomic(self.legacy_path, tail.encode("utf-8"))
+        if was_current:
+            self.meta["rendered_through"] = self.last_number()
+        self._record_view(digest)
+        return added
+
+    # -- reading ------------------------------------------------------------
+
+    def entries(self, newest_first: bool = False) -> Iterator[Dict]:
+        """Stored entry records across all segments, one segment in memory at a time"""
+        segments = self._segment_ids()
+        for segment in (reversed(segments) if newest_first else segments):
+            with self._open_segment(segment) as f:
+                if not newest_first:
+                    for line in f:
+                        yield json.loads(line)
+                    continue
+                lines = f.read().splitlines()
+            for line in reversed(lines):
+                yield json.loads(line)
+
+    def export(self, output_path, fmt: str = "markdown", newest_first: bool = True) -> int:
+        """Write the full history through a renderer; returns the entry count"""
+        if fmt not in RENDERERS:
+            raise ValueError(f"Unknown format: {fmt}")
+        output_path = Path(output_path)
+        count = 0
+
+        def counted(entries):
+            nonlocal count
+            for entry in entries:
+                count += 1
+                yield entry
+
+        header = self.header_path.read_text() if fmt == "markdown" else ""
+        tmp_path = output_path.with_name(output_path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as out:
+            for chunk in RENDERERS[fmt](counted(self.entries(newest_first)), header):
+                out.write(chunk)
+            if fmt == "markdown":
+                out.write(self.legacy_path.read_text())
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp_path, output_path)
+        return count
+
+    def last_number(self) -> int:
+        """Number of the newest entry, from the last index record"""
+        last = self.index.last()
+        return last.number if last else self.meta["legacy_last"]
+
+    def get(self, number: int) -> Optional[Dict]:
+        """Stored record of entry #number, read from its segment at its offset"""
+        record = self.index.find(number)
+        if record is None:
+            return None
+        with self._open_segment(record.segment) as f:
+            f.seek(record.offset)
+            return json.loads(f.read(record.length))
+
+    def segments(self) -> List[Dict]:
+        """Manifest entries of archived segments plus a summary of the active one"""
+        active = {
+            "id": self.manifest["active"],
+            "file": f"{self.segments_dir.name}/{self.active_path.name}",
+            "compression": None,
+            "entries": self._active_count(),
+            "bytes": self.active_path.stat().st_size
+        }
+        if active["entries"]:
+            active["first"] = self.index.read(self.manifest["active_start"]).number
+            active["last"] = self.index.last().number
+        return self.manifest["segments"] + [active]
+
+    def verify(self) -> bool:
+        """Cheap consistency check of index against journal, with no unresolved hand edits"""
+        if self.conflicts:
+            return False
+        last = self.index.last()
+        size = self.active_path.stat().st_size
+        if last is None:
+            return size == 0 and not self.manifest["segments"]
+        if last.segment != self.manifest["active"]:
+            archived = self.manifest["segments"]
+            return size == 0 and bool(archived) and archived[-1]["last"] == last.number
+        if last.offset + last.length != size:
+            return False
+        try:
+            return self.get(last.number)["number"] == last.number
+        except (ValueError, TypeError, KeyError):
+            return False
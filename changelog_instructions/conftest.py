@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+Test Configuration
+Imports the *_py.py modules under the names the package uses for them
+"""
+
+import importlib.abc
+import importlib.util
+import sys
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+ALIASES = {
+    "workspace_scanner": HERE / "workspace_scanner_py.py",
+    "state_manager": HERE / "state_manager_py.py",
+    "changelog_engine": HERE / "changelog_engine_py.py"
+}
+
+class _AliasFinder(importlib.abc.MetaPathFinder):
+    """Resolves each alias to its file, only when nothing else provides the module"""
+
+    def find_spec(self, fullname, path=None, target=None):
+        location = ALIASES.get(fullname)
+        if location is None or not location.exists():
+            return None
+        return importlib.util.spec_from_file_location(fullname, location)
+
+sys.meta_path.append(_AliasFinder())
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Content-Addressed Dedup Index
+Reverse index from file content hash to the paths sharing that content
+"""
+
+from typing import Dict, Iterable, List, Mapping, Set
+from workspace_scanner import FileState, WorkspaceState
+
+class ContentIndex:
+    """hash -> paths for every file of a state, maintained incrementally"""
+
+    def __init__(self):
+        self._single: Dict[str, str] = {}
+        self._shared: Dict[str, Set[str]] = {}
+
+    @classmethod
+    def from_state(cls, state: WorkspaceState) -> "ContentIndex":
+        index = cls()
+        file_hash = getattr(state.files, "file_hash", None)
+        for path in state.files:
+            index.add(path, file_hash(path) if file_hash else state.files[path].hash)
+        return index
+
+    def add(self, path: str, content_hash: str):
+        if not content_hash or content_hash == "error":
+            return
+        shared = self._shared.get(content_hash)
+        if shared is not None:
+            shared.add(path)
+            return
+        existing = self._single.get(content_hash)
+        if existing is None:
+            self._single[content_hash] = path
+        elif existing != path:
+            del self._single[content_hash]
+            self._shared[content_hash] = {existing, path}
+
+    def discard(self, path: str, content_hash: str):
+        if self._single.get(content_hash) == path:
+            del self._single[content_hash]
+            return
+        shared = self._shared.get(content_hash)
+        if shared is None:
+            return
+        shared.discard(path)
+        if len(shared) == 1:
+            self._single[content_hash] = shared.pop()
+            del self._shared[content_hash]
+
+    def apply(self, changed: Mapping[str, FileState], removed: Iterable[str],
+              previous_files: Mapping[str, FileState]):
+        """Update from a file delta; previous_files supplies the hashes being replaced"""
+        for path in removed:
+            prior = previous_files.get(path)
+            if prior is not None:
+                self.discard(path, prior.hash)
+        for path, file_state in changed.items():
+            prior = previous_files.get(path)
+            if prior is not None:
+                self.discard(path, prior.hash)
+            self.add(path, file_state.hash)
+
+    def paths_for(self, content_hash: str) -> Set[str]:
+        shared = self._shared.get(content_hash)
+        if shared is not None:
+            return set(shared)
+        single = self._single.get(content_hash)
+        return {single} if single is not None else set()
+
+    def duplicates_of(self, path: str, content_hash: str) -> List[str]:
+        """Other paths with the same content as path"""
+        return sorted(self._shared.get(content_hash, set()) - {path})
+
+    def duplicate_groups(self) -> Dict[str, Set[str]]:
+        return self._shared
+
+    def report(self, files: Mapping[str, FileState], limit: int = 10) -> Dict:
+        """Duplicate totals plus the clusters wasting the most bytes (files supplies sizes)"""
+        clusters = []
+        for content_hash, paths in self._shared.items():
+            size = files[next(iter(paths))].size
+            clusters.append({
+                "hash": content_hash,
+                "size": size,
+                "copies": len(paths),
+                "wasted_bytes": size * (len(paths) - 1),
+                "paths": sorted(paths)
+            })
+        clusters.sort(key=lambda cluster: (-cluster["wasted_bytes"], -cluster["copies"], cluster["hash"]))
+        wasted = sum(cluster["wasted_bytes"] for cluster in clusters)
+        return {
+            "unique_contents": len(self._single) + len(self._shared),
+            "duplicate_groups": len(clusters),
+            "duplicate_files": sum(cluster["copies"] for cluster in clusters),
+            "wasted_bytes": wasted,
+            "wasted_mb": wasted / (1024 * 1024),
+            "hot_clusters": clusters[:limit]
+        }
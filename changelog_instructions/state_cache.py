@@ -0,0 +1,592 @@
+#!/usr/bin/env python3
+"""
+Binary State Cache Format
+Versioned, mmap-friendly on-disk representation of WorkspaceState and the
+size-bounded snapshot store that holds it
+"""
+
+import os
+import sys
+import json
+import mmap
+import time
+from array import array
+from collections.abc import Mapping, Set as AbstractSet
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import quote, unquote
+from workspace_scanner import FileState, FileStateTable, WorkspaceState
+
+MAGIC = b"WSCACHE\0"
+FORMAT_VERSION = 1
+_PREAMBLE_SIZE = 16  # magic + u32 version + u32 header length
+
+FLAG_SAMPLED = 0x01
+FLAG_RAW_HASH = 0x02  # hash did not fit the fixed-width hex column (e.g. "error")
+
+class CacheFormatError(ValueError):
+    """Raised for files that are not a readable binary state cache"""
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+def _pack_strings(values: List[str]) -> Tuple[bytes, array]:
+    """Concatenate strings into a UTF-8 blob plus an n+1 offsets array"""
+    offsets = array("Q", [0])
+    chunks = []
+    position = 0
+    for value in values:
+        encoded = value.encode("utf-8", "surrogatepass")
+        chunks.append(encoded)
+        position += len(encoded)
+        offsets.append(position)
+    return b"".join(chunks), offsets
+
+def _pack_hashes(hashes: List[str], width: int) -> Tuple[bytes, List[bool]]:
+    """Pack hex digests into fixed-width raw bytes; non-hex values are flagged"""
+    out = bytearray(width * len(hashes))
+    raw = []
+    for index, value in enumerate(hashes):
+        try:
+            digest = bytes.fromhex(value)
+        except ValueError:
+            digest = b""
+        if len(digest) != width or digest.hex() != value:
+            raw.append(True)
+            continue
+        out[index * width:(index + 1) * width] = digest
+        raw.append(False)
+    return bytes(out), raw
+
+def _hash_width(hashes) -> int:
+    widths = {len(h) // 2 for h in hashes if h and len(h) % 2 == 0}
+    return max(widths) if widths else 0
+
+def _le(values: array) -> bytes:
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+def encode_state(state: WorkspaceState) -> bytes:
+    """Serialize a WorkspaceState into the binary cache format"""
+    # Layout: preamble, JSON header (scalars, string tables, section offsets), then
+    # 8-byte aligned little-endian columns indexed by file position (paths sorted).
+    paths = sorted(state.files)
+    files = [state.files[p] for p in paths]
+    directories = sorted(state.directories)
+    types = sorted({f.type for f in files})
+    type_index = {t: i for i, t in enumerate(types)}
+
+    hash_width = _hash_width(f.hash for f in files)
+    hash_blob, raw_hash = _pack_hashes([f.hash for f in files], hash_width)
+    raw_hashes = {paths[i]: files[i].hash for i, is_raw in enumerate(raw_hash) if is_raw}
+    dir_hash_width = _hash_width(state.dir_hashes.values())
+    dir_keys = [""] + directories
+    dir_hash_blob, _ = _pack_hashes([state.dir_hashes.get(d, "") for d in dir_keys], dir_hash_width)
+    dir_meta = [state.dir_meta.get(d) for d in dir_keys]
+
+    path_blob, path_offsets = _pack_strings(paths)
+    dir_blob, dir_offsets = _pack_strings(directories)
+    flags = bytes((FLAG_SAMPLED if f.sampled else 0) | (FLAG_RAW_HASH if raw else 0)
+                  for f, raw in zip(files, raw_hash))
+
+    sections = [
+        ("path_offsets", _le(path_offsets)),
+        ("paths", path_blob),
+        ("size", _le(array("Q", (f.size for f in files)))),
+        ("mtime_ns", _le(array("q", (f.mtime_ns for f in files)))),
+        ("modified", _le(array("d", (f.modified for f in files)))),
+        ("inode", _le(array("Q", (f.inode for f in files)))),
+        ("hash", hash_blob),
+        ("type", bytes(type_index[f.type] for f in files)),
+        ("flags", flags),
+        ("dir_offsets", _le(dir_offsets)),
+        ("dirs", dir_blob),
+        ("dir_hash", dir_hash_blob),
+        ("dir_mtime_ns", _le(array("q", (m[0] if m else -1 for m in dir_meta)))),
+        ("dir_entries", _le(array("q", (m[1] if m else -1 for m in dir_meta)))),
+    ]
+    layout = {}
+    position = 0
+    for name, data in sections:
+        position = _align(position)
+        layout[name] = [position, len(data)]
+        position += len(data)
+
+    header = json.dumps({
+        "timestamp": state.timestamp,
+        "root_path": state.root_path,
+        "total_files": state.total_files,
+        "total_size": state.total_size,
+        "state_hash": state.state_hash,
+        "hash_algorithm": state.hash_algorithm,
+        "file_count": len(paths),
+        "dir_count": len(directories),
+        "hash_width": hash_width,
+        "dir_hash_width": dir_hash_width,
+        "has_dir_hashes": bool(state.dir_hashes),
+        "types": types,
+        "raw_hashes": raw_hashes,
+        "sections": layout,
+    }, separators=(",", ":")).encode()
+
+    data_start = _align(_PREAMBLE_SIZE + len(header))
+    out = bytearray(data_start + position)
+    out[:8] = MAGIC
+    out[8:12] = FORMAT_VERSION.to_bytes(4, "little")
+    out[12:16] = len(header).to_bytes(4, "little")
+    out[_PREAMBLE_SIZE:_PREAMBLE_SIZE + len(header)] = header
+    for name, data in sections:
+        offset = data_start + layout[name][0]
+        out[offset:offset + len(data)] = data
+    return bytes(out)
+
+class BinaryStateView:
+    """Zero-parse accessors over an encoded state (bytes or an mmap)"""
+
+    def __init__(self, buffer):
+        self._view = memoryview(buffer)
+        try:
+            self._load()
+        except Exception:
+            self.release()  # a failed view must not pin an mmap open
+            raise
+
+    def _load(self):
+        view = self._view
+        if len(view) < _PREAMBLE_SIZE or bytes(view[:8]) != MAGIC:
+            raise CacheFormatError("not a binary state cache")
+        version = int.from_bytes(view[8:12], "little")
+        if version != FORMAT_VERSION:
+            raise CacheFormatError(f"unsupported cache format version {version}")
+        header_len = int.from_bytes(view[12:16], "little")
+        if _PREAMBLE_SIZE + header_len > len(view):
+            raise CacheFormatError("truncated cache file")
+        try:
+            self.header = json.loads(bytes(view[_PREAMBLE_SIZE:_PREAMBLE_SIZE + header_len]))
+        except ValueError:
+            raise CacheFormatError("unreadable cache header") from None
+        self._data_start = _align(_PREAMBLE_SIZE + header_len)
+        self.file_count = self.header["file_count"]
+        self.dir_count = self.header["dir_count"]
+        self.types = self.header["types"]
+        self.raw_hashes = self.header["raw_hashes"]
+
+        self.path_offsets = self._column("path_offsets", "Q")
+        self.paths_blob = self._section("paths")
+        self.size = self._column("size", "Q")
+        self.mtime_ns = self._column("mtime_ns", "q")
+        self.modified = self._column("modified", "d")
+        self.inode = self._column("inode", "Q")
+        self.hash_blob = self._section("hash")
+        self.type = self._section("type")
+        self.flags = self._section("flags")
+        self.dir_offsets = self._column("dir_offsets", "Q")
+        self.dirs_blob = self._section("dirs")
+        self.dir_hash_blob = self._section("dir_hash")
+        self.dir_mtime_ns = self._column("dir_mtime_ns", "q")
+        self.dir_entries = self._column("dir_entries", "q")
+
+    def _section(self, name: str, itemsize: int = 1) -> memoryview:
+        offset, length = self.header["sections"][name]
+        start = self._data_start + offset
+        if start + length > len(self._view) or length % itemsize:
+            raise CacheFormatError(f"truncated cache file (section {name})")
+        return self._view[start:start + length]
+
+    def _column(self, name: str, typecode: str):
+        section = self._section(name, array(typecode).itemsize)
+        if sys.byteorder == "little":
+            return section.cast(typecode)
+        values = array(typecode, bytes(section))
+        values.byteswap()
+        return values
+
+    def release(self):
+        """Drop every view into the buffer so an underlying mmap can be closed"""
+        for name in ("path_offsets", "paths_blob", "size", "mtime_ns", "modified", "inode",
+                     "hash_blob", "type", "flags", "dir_offsets", "dirs_blob", "dir_hash_blob",
+                     "dir_mtime_ns", "dir_entries"):
+            value = getattr(self, name, None)
+            if isinstance(value, memoryview):
+                value.release()
+        self._view.release()
+
+    def path(self, index: int) -> str:
+        return bytes(self.paths_blob[self.path_offsets[index]:self.path_offsets[index + 1]]) \
+            .decode("utf-8", "surrogatepass")
+
+    def directory(self, index: int) -> str:
+        return bytes(self.dirs_blob[self.dir_offsets[index]:self.dir_offsets[index + 1]]) \
+            .decode("utf-8", "surrogatepass")
+
+    def file_hash(self, index: int, path: Optional[str] = None) -> str:
+        if self.flags[index] & FLAG_RAW_HASH:
+            return self.raw_hashes[path if path is not None else self.path(index)]
+        width = self.header["hash_width"]
+        return self.hash_blob[index * width:(index + 1) * width].hex()
+
+    def file_state(self, index: int, path: Optional[str] = None) -> FileState:
+        path = path if path is not None else self.path(index)
+        return FileState(
+            path=path,
+            size=self.size[index],
+            modified=self.modified[index],
+            hash=self.file_hash(index, path),
+            type=self.types[self.type[index]],
+            mtime_ns=self.mtime_ns[index],
+            inode=self.inode[index],
+            sampled=bool(self.flags[index] & FLAG_SAMPLED)
+        )
+
+    def dir_hashes(self) -> Dict[str, str]:
+        if not self.header["has_dir_hashes"]:
+            return {}
+        width = self.header["dir_hash_width"]
+        keys = [""] + [self.directory(i) for i in range(self.dir_count)]
+        return {key: self.dir_hash_blob[i * width:(i + 1) * width].hex() for i, key in enumerate(keys)}
+
+    def dir_meta(self) -> Dict[str, List[int]]:
+        keys = [""] + [self.directory(i) for i in range(self.dir_count)]
+        return {key: [self.dir_mtime_ns[i], self.dir_entries[i]]
+                for i, key in enumerate(keys) if self.dir_mtime_ns[i] >= 0}
+
+    def all_paths(self) -> List[str]:
+        """Decode every path in one pass (sorted order)"""
+        offsets = self.path_offsets.tolist()
+        blob = bytes(self.paths_blob)
+        text = blob.decode("utf-8", "surrogatepass")
+        if len(text) == len(blob):  # pure ASCII: byte offsets are character offsets
+            return [text[offsets[i]:offsets[i + 1]] for i in range(self.file_count)]
+        return [blob[offsets[i]:offsets[i + 1]].decode("utf-8", "surrogatepass")
+                for i in range(self.file_count)]
+
+    def to_state(self) -> WorkspaceState:
+        """Materialize a regular WorkspaceState over copies of the file columns"""
+        raw_rows = {i: self.raw_hashes[self.path(i)]
+                    for i, flag in enumerate(self.flags) if flag & FLAG_RAW_HASH}
+        # Cache columns, path table and flag bits match FileStateTable's, so they copy across as-is
+        files = FileStateTable.from_columns(
+            self.paths_blob, self.path_offsets, self.size, self.mtime_ns, self.modified, self.inode,
+            self.type, self.types, self.flags, self.hash_blob, self.header["hash_width"], raw_rows)
+        header = self.header
+        return WorkspaceState(
+            timestamp=header["timestamp"],
+            root_path=header["root_path"],
+            files=files,
+            directories={self.directory(i) for i in range(self.dir_count)},
+            total_files=header["total_files"],
+            total_size=header["total_size"],
+            state_hash=header["state_hash"],
+            hash_algorithm=header["hash_algorithm"],
+            dir_hashes=self.dir_hashes(),
+            dir_meta=self.dir_meta()
+        )
+
+def _find_sorted(key, count: int, value_at) -> int:
+    """Binary search a sorted string table; returns the index of key or -1"""
+    if not isinstance(key, str):
+        return -1
+    low, high = 0, count
+    while low < high:
+        middle = (low + high) // 2
+        if value_at(middle) < key:
+            low = middle + 1
+        else:
+            high = middle
+    return low if low < count and value_at(low) == key else -1
+
+class MappedFileMap(Mapping):
+    """Read-only path -> FileState mapping over a BinaryStateView, decoding on each access"""
+
+    def __init__(self, view: BinaryStateView):
+        self._view = view
+
+    def _index(self, path) -> int:
+        return _find_sorted(path, self._view.file_count, self._view.path)
+
+    def __getitem__(self, path: str) -> FileState:
+        index = self._index(path)
+        if index < 0:
+            raise KeyError(path)
+        return self._view.file_state(index, path)
+
+    def __contains__(self, path) -> bool:
+        return self._index(path) >= 0
+
+    def __len__(self) -> int:
+        return self._view.file_count
+
+    def __iter__(self) -> Iterator[str]:
+        view = self._view
+        return (view.path(i) for i in range(view.file_count))
+
+    def stat_signatures(self) -> Iterator[Tuple[str, int, int, int, bool]]:
+        """Yield (path, size, mtime_ns, inode, sampled) straight from the columns"""
+        view = self._view
+        for i in range(view.file_count):
+            yield (view.path(i), view.size[i], view.mtime_ns[i], view.inode[i],
+                   bool(view.flags[i] & FLAG_SAMPLED))
+
+class MappedDirectorySet(AbstractSet):
+    """Read-only set of tracked directories over a BinaryStateView"""
+
+    def __init__(self, view: BinaryStateView):
+        self._view = view
+
+    @classmethod
+    def _from_iterable(cls, iterable):
+        return set(iterable)  # set operators produce plain sets
+
+    def __contains__(self, rel_dir) -> bool:
+        return _find_sorted(rel_dir, self._view.dir_count, self._view.directory) >= 0
+
+    def __len__(self) -> int:
+        return self._view.dir_count
+
+    def __iter__(self) -> Iterator[str]:
+        view = self._view
+        return (view.directory(i) for i in range(view.dir_count))
+
+class MappedDirectoryMap(Mapping):
+    """Read-only rel_dir -> value mapping (dir hashes or dir meta) over a BinaryStateView"""
+
+    def __init__(self, view: BinaryStateView, value_at):
+        self._view = view
+        self._value_at = value_at
+        self._length: Optional[int] = None
+
+    def _row(self, rel_dir) -> int:
+        if rel_dir == "":
+            return 0
+        index = _find_sorted(rel_dir, self._view.dir_count, self._view.directory)
+        return index + 1 if index >= 0 else -1
+
+    def __getitem__(self, rel_dir: str):
+        row = self._row(rel_dir)
+        value = self._value_at(row) if row >= 0 else None
+        if value is None:
+            raise KeyError(rel_dir)
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        view = self._view
+        for row in range(view.dir_count + 1):
+            if self._value_at(row) is not None:
+                yield view.directory(row - 1) if row else ""
+
+    def __len__(self) -> int:
+        if self._length is None:
+            self._length = sum(1 for row in range(self._view.dir_count + 1)
+                               if self._value_at(row) is not None)
+        return self._length
+
+class MappedWorkspaceState(WorkspaceState):
+    """Read-only WorkspaceState over a mapped cache file; materialize() copies it, close() unmaps"""
+
+    def __init__(self, view: BinaryStateView, mapped: Optional[mmap.mmap] = None):
+        header = view.header
+        dir_hash_width = header["dir_hash_width"]
+        has_dir_hashes = header["has_dir_hashes"]
+
+        def dir_hash(row):
+            if not has_dir_hashes:
+                return None
+            return view.dir_hash_blob[row * dir_hash_width:(row + 1) * dir_hash_width].hex()
+
+        def dir_meta(row):
+            mtime_ns = view.dir_mtime_ns[row]
+            return [mtime_ns, view.dir_entries[row]] if mtime_ns >= 0 else None
+
+        super().__init__(
+            timestamp=header["timestamp"],
+            root_path=header["root_path"],
+            files=MappedFileMap(view),
+            directories=MappedDirectorySet(view),
+            total_files=header["total_files"],
+            total_size=header["total_size"],
+            state_hash=header["state_hash"],
+            hash_algorithm=header["hash_algorithm"],
+            dir_hashes=MappedDirectoryMap(view, dir_hash),
+            dir_meta=MappedDirectoryMap(view, dir_meta)
+        )
+        self._view = view
+        self._mmap = mapped
+
+    def materialize(self) -> WorkspaceState:
+        """Decode every entry into a regular, mutable WorkspaceState"""
+        return self._view.to_state()
+
+    def close(self):
+        """Release the mapping; the state must not be used afterwards"""
+        if self._mmap is not None:
+            self._view.release()
+            self._mmap.close()
+            self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def write_state_binary(state: WorkspaceState, output_path) -> int:
+    """Atomically write a state in binary cache format; returns bytes written"""
+    data = encode_state(state)
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, output_path)
+    return len(data)
+
+def read_state_header(input_path) -> Dict:
+    """Read only the header scalars (state_hash, totals, algorithm) of a cache file"""
+    with open(input_path, "rb") as f:
+        preamble = f.read(_PREAMBLE_SIZE)
+        if len(preamble) < _PREAMBLE_SIZE or preamble[:8] != MAGIC:
+            raise CacheFormatError("not a binary state cache")
+        if int.from_bytes(preamble[8:12], "little") != FORMAT_VERSION:
+            raise CacheFormatError("unsupported cache format version")
+        header_len = int.from_bytes(preamble[12:16], "little")
+        data = f.read(header_len)
+        if len(data) < header_len:
+            raise CacheFormatError("truncated cache file")
+        return json.loads(data)
+
+def read_state_binary(input_path) -> WorkspaceState:
+    """Load a binary cache file through mmap and materialize the state"""
+    with open(input_path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            raise CacheFormatError("empty cache file")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = BinaryStateView(mapped)
+            try:
+                return view.to_state()
+            finally:
+                view.release()
+
+def open_state_mapped(input_path) -> MappedWorkspaceState:
+    """Map a binary cache file and return a lazily decoded state over it"""
+    with open(input_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise CacheFormatError("empty cache file")
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        return MappedWorkspaceState(BinaryStateView(mapped), mapped)
+    except CacheFormatError:
+        mapped.close()
+        raise
+
+class CacheStore:
+    """Named state snapshots under one directory, bounded by size (with extra_size) and age"""
+    # Age for the TTL is the file mtime; recency for LRU is the atime, set on every read.
+
+    SUFFIXES = ("bin", "json")
+
+    def __init__(self, directory, max_size: int = 100 * 1024 * 1024, ttl: float = 3600,
+                 extra_size: Optional[Callable[[], int]] = None):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self.extra_size = extra_size
+        self.ttl = ttl
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0, "expirations": 0}
+
+    def path(self, name: str, suffix: str) -> Path:
+        return self.directory / f"{quote(name, safe='-_.')}_state.{suffix}"
+
+    def entries(self) -> List[Tuple[str, Path, os.stat_result]]:
+        """(name, path, stat) of every stored snapshot"""
+        found = []
+        for suffix in self.SUFFIXES:
+            for path in self.directory.glob(f"*_state.{suffix}"):
+                try:
+                    found.append((unquote(path.name[:-len(f"_state.{suffix}")]), path, path.stat()))
+                except OSError:
+                    continue
+        return found
+
+    def is_fresh(self, path: Path) -> bool:
+        try:
+            return time.time() - path.stat().st_mtime < self.ttl
+        except OSError:
+            return False
+
+    def lookup(self, name: str, suffix: str) -> Optional[Path]:
+        """Path of a fresh snapshot, marked as just used; None (a miss) otherwise"""
+        path = self.path(name, suffix)
+        if not self.is_fresh(path):
+            self.stats["misses"] += 1
+            return None
+        try:
+            os.utime(path, ns=(time.time_ns(), path.stat().st_mtime_ns))
+        except OSError:
+            pass
+        self.stats["hits"] += 1
+        return path
+
+    def write(self, name: str, suffix: str, data: bytes) -> Path:
+        """Atomically store a snapshot, then evict down to the size bound"""
+        path = self.path(name, suffix)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        self.stats["writes"] += 1
+        self.evict(keep=(path,))
+        return path
+
+    def delete(self, name: str) -> bool:
+        removed = False
+        for suffix in self.SUFFIXES:
+            try:
+                self.path(name, suffix).unlink()
+                removed = True
+            except FileNotFoundError:
+                pass
+        return removed
+
+    def total_size(self) -> int:
+        """Bytes of all snapshots plus extra_size"""
+        extra = self.extra_size() if self.extra_size else 0
+        return extra + sum(stat.st_size for _, _, stat in self.entries())
+
+    def evict(self, keep: Iterable[Path] = ()) -> int:
+        """Drop expired snapshots, then least recently used ones (never keep) until within max_size"""
+        keep = set(keep)
+        now = time.time()
+        removed = 0
+        live = []
+        for _, path, stat in self.entries():
+            if path not in keep and now - stat.st_mtime >= self.ttl:
+                if self._remove(path):
+                    self.stats["expirations"] += 1
+                    removed += 1
+            else:
+                live.append((path, stat))
+
+        total = sum(stat.st_size for _, stat in live) + (self.extra_size() if self.extra_size else 0)
+        for path, stat in sorted(live, key=lambda item: item[1].st_atime_ns):
+            if total <= self.max_size:
+                break
+            if path in keep:
+                continue
+            if self._remove(path):
+                self.stats["evictions"] += 1
+                removed += 1
+                total -= stat.st_size
+        return removed
+
+    @staticmethod
+    def _remove(path: Path) -> bool:
+        try:
+            path.unlink()
+            return True
+        except FileNotFoundError:
+            return False
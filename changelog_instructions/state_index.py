@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+SQLite State Index
+Queryable file states and change history backed by the stdlib sqlite3 module
+"""
+
+import json
+import sqlite3
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+from workspace_scanner import FileState, WorkspaceState
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    modified REAL NOT NULL,
+    hash TEXT NOT NULL,
+    type TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    sampled INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_type_size ON files (type, size);
+CREATE INDEX IF NOT EXISTS files_hash ON files (hash);
+CREATE INDEX IF NOT EXISTS files_size ON files (size);
+CREATE TABLE IF NOT EXISTS changes (
+    id INTEGER PRIMARY KEY,
+    seq INTEGER NOT NULL,
+    timestamp TEXT NOT NULL,
+    change_type TEXT NOT NULL,
+    path TEXT NOT NULL,
+    file_type TEXT,
+    hash TEXT,
+    impact_level TEXT,
+    details TEXT
+);
+CREATE INDEX IF NOT EXISTS changes_path ON changes (path);
+CREATE INDEX IF NOT EXISTS changes_type_seq ON changes (file_type, seq);
+CREATE INDEX IF NOT EXISTS changes_hash ON changes (hash);
+CREATE INDEX IF NOT EXISTS changes_timestamp ON changes (timestamp);
+CREATE INDEX IF NOT EXISTS changes_seq ON changes (seq);
+CREATE TABLE IF NOT EXISTS answers (
+    number INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    seq INTEGER NOT NULL
+);
+"""
+
+class StateIndex:
+    """File states and change events in SQLite, tagged with journal sequence numbers"""
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self.conn = sqlite3.connect(str(self.db_path))
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else None
+
+    @property
+    def seq(self) -> int:
+        """Journal sequence number of the state the files table reflects"""
+        return int(self._meta("seq") or 0)
+
+    # -- writing ------------------------------------------------------------
+
+    def sync_state(self, state: WorkspaceState, seq: int,
+                   changed: Optional[Dict[str, FileState]] = None,
+                   removed: Iterable[str] = ()):
+        """Bring the files table to state (journal sequence seq), from the delta when given"""
+        with self.conn:
+            if changed is None:
+                self.conn.execute("DELETE FROM files")
+                changed = state.files
+            else:
+                self.conn.executemany("DELETE FROM files WHERE path = ?",
+                                      ((path,) for path in removed))
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                ((path, f.size, f.modified, f.hash, f.type, f.mtime_ns, f.inode, int(f.sampled))
+                 for path, f in changed.items()))
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                [("seq", str(seq)), ("state_hash", state.state_hash),
+                 ("timestamp", state.timestamp), ("hash_algorithm", state.hash_algorithm)])
+
+    def record_changes(self, events: List, seq: int,
+                       type_of: Optional[Callable[[str], str]] = None):
+        """Store ChangeEvents produced by the state recorded as seq"""
+        def file_type(event) -> Optional[str]:
+            recorded = event.details.get("type")
+            return recorded if recorded or type_of is None else type_of(event.file_path)
+
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO changes (seq, timestamp, change_type, path, file_type, hash,"
+                " impact_level, details) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                ((seq, event.timestamp, event.change_type, event.file_path, file_type(event),
+                  event.details.get("hash"), event.impact_level,
+                  json.dumps(event.details, default=str)) for event in events))
+
+    def record_answer(self, number: int, timestamp: str, seq: int):
+        """Map a changelog answer number to the journal sequence it was written at"""
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO answers VALUES (?, ?, ?)",
+                              (number, timestamp, seq))
+
+    # -- queries ------------------------------------------------------------
+
+    def answer_seq(self, number: int) -> Optional[int]:
+        row = self.conn.execute("SELECT seq FROM answers WHERE number = ?", (number,)).fetchone()
+        return row["seq"] if row else None
+
+    def changes_since(self, seq: int = 0, file_type: Optional[str] = None,
+                      change_type: Optional[str] = None) -> List[Dict]:
+        """Change events recorded after journal sequence seq, oldest first"""
+        query = "SELECT * FROM changes WHERE seq > ?"
+        params: list = [seq]
+        if file_type is not None:
+            query += " AND file_type = ?"
+            params.append(file_type)
+        if change_type is not None:
+            query += " AND change_type = ?"
+            params.append(change_type)
+        rows = self.conn.execute(query + " ORDER BY seq, id", params).fetchall()
+        return [self._change_row(row) for row in rows]
+
+    def files_changed_since_answer(self, number: int,
+                                   file_type: Optional[str] = None) -> List[str]:
+        """Paths changed after changelog answer #number, e.g. python files since #120"""
+        seq = self.answer_seq(number)
+        if seq is None:
+            return []
+        query = "SELECT DISTINCT path FROM changes WHERE seq > ?"
+        params: list = [seq]
+        if file_type is not None:
+            query += " AND file_type = ?"
+            params.append(file_type)
+        return [row["path"] for row in self.conn.execute(query + " ORDER BY path", params)]
+
+    def changes_for_path(self, path: str) -> List[Dict]:
+        rows = self.conn.execute("SELECT * FROM changes WHERE path = ? ORDER BY seq, id", (path,))
+        return [self._change_row(row) for row in rows]
+
+    def largest_files(self, limit: int = 10, file_type: Optional[str] = None) -> List[FileState]:
+        if file_type is None:
+            rows = self.conn.execute("SELECT * FROM files ORDER BY size DESC LIMIT ?", (limit,))
+        else:
+            rows = self.conn.execute("SELECT * FROM files WHERE type = ? ORDER BY size DESC LIMIT ?",
+                                     (file_type, limit))
+        return [self._file_row(row) for row in rows]
+
+    def files_by_type(self, file_type: str) -> List[FileState]:
+        rows = self.conn.execute("SELECT * FROM files WHERE type = ? ORDER BY path", (file_type,))
+        return [self._file_row(row) for row in rows]
+
+    def files_with_hash(self, file_hash: str) -> List[FileState]:
+        rows = self.conn.execute("SELECT * FROM files WHERE hash = ? ORDER BY path", (file_hash,))
+        return [self._file_row(row) for row in rows]
+
+    def type_totals(self) -> Dict[str, Dict[str, int]]:
+        """File count and bytes per file type"""
+        rows = self.conn.execute("SELECT type, COUNT(*) AS files, SUM(size) AS bytes"
+                                 " FROM files GROUP BY type ORDER BY bytes DESC")
+        return {row["type"]: {"files": row["files"], "bytes": row["bytes"]} for row in rows}
+
+    @staticmethod
+    def _file_row(row: sqlite3.Row) -> FileState:
+        return FileState(row["path"], row["size"], row["modified"], row["hash"], row["type"],
+                         row["mtime_ns"], row["inode"], bool(row["sampled"]))
+
+    @staticmethod
+    def _change_row(row: sqlite3.Row) -> Dict:
+        return {
+            "seq": row["seq"],
+            "timestamp": row["timestamp"],
+            "change_type": row["change_type"],
+            "path": row["path"],
+            "file_type": row["file_type"],
+            "impact_level": row["impact_level"],
+            "details": json.loads(row["details"]) if row["details"] else {}
+        }
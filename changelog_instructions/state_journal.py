@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+State Change Journal
+Append-only per-file deltas with periodic checkpoints for historical states
+"""
+
+import os
+import json
+from contextlib import contextmanager
+from dataclasses import replace
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from workspace_scanner import FileState, FileStateTable, WorkspaceState
+from state_cache import CacheFormatError, encode_state, read_state_binary, read_state_header
+
+try:
+    import fcntl  # optional: serializes writers across processes (POSIX only)
+except ImportError:
+    fcntl = None
+
+class StateHistoryError(ValueError):
+    """A requested state is not (or no longer) in the journal"""
+
+def _file_row(file_state: FileState) -> list:
+    return [file_state.size, file_state.modified, file_state.hash, file_state.type,
+            file_state.mtime_ns, file_state.inode, file_state.sampled]
+
+def _dict_delta(old: Dict, new: Dict) -> Dict:
+    delta = {}
+    changed = {key: value for key, value in new.items() if old.get(key) != value}
+    removed = [key for key in old if key not in new]
+    if changed:
+        delta["set"] = changed
+    if removed:
+        delta["del"] = removed
+    return delta
+
+def diff_files(state: WorkspaceState, prior: Optional[WorkspaceState],
+               changed_paths: Optional[Iterable[str]] = None) -> Tuple[Dict[str, FileState], List[str]]:
+    """Files set and removed in state relative to prior (or only at changed_paths)"""
+    changed = {}
+    removed = []
+    if changed_paths is not None:
+        for path in changed_paths:
+            file_state = state.files.get(path)
+            if file_state is None:
+                removed.append(path)
+            else:
+                changed[path] = file_state
+    else:
+        for path, file_state in state.files.items():
+            if prior.files.get(path) != file_state:
+                changed[path] = file_state
+        removed = [path for path in prior.files if path not in state.files]
+    return changed, removed
+
+def copy_state(state: WorkspaceState) -> WorkspaceState:
+    """Independent copy of a state that can be updated without touching the original"""
+    files = state.files.copy() if isinstance(state.files, FileStateTable) else FileStateTable(state.files)
+    return replace(state, files=files, directories=set(state.directories),
+                   dir_hashes=dict(state.dir_hashes),
+                   dir_meta={key: list(value) for key, value in state.dir_meta.items()})
+
+class StateJournal:
+    """Workspace history as checkpoints plus append-only delta segments"""
+    # Layout: <seq>.ckpt (full state) and <seq>.log (one delta line per later state);
+    # only the newest keep_checkpoints checkpoints are kept. Writers (in any process)
+    # serialize on an flock of the directory and re-read the head under it.
+
+    def __init__(self, directory, checkpoint_interval: int = 50, keep_checkpoints: Optional[int] = 2):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.checkpoint_interval = checkpoint_interval
+        self.keep_checkpoints = keep_checkpoints
+        self.head_seq = 0
+        self._segment_records = 0
+        self._head_state: Optional[WorkspaceState] = None  # dir tables only; files are not kept
+        with self._locked():
+            pass  # recovers the head (and drops a torn tail) under the lock
+
+    # -- layout -------------------------------------------------------------
+
+    def _checkpoint_path(self, seq: int) -> Path:
+        return self.directory / f"{seq:010d}.ckpt"
+
+    def _segment_path(self, seq: int) -> Path:
+        return self.directory / f"{seq:010d}.log"
+
+    def head_checkpoint_path(self) -> Optional[Path]:
+        """Path of the head state when it is a checkpoint (no deltas recorded after it)"""
+        path = self._checkpoint_path(self.head_seq)
+        return path if self.head_seq and path.exists() else None
+
+    def checkpoints(self) -> List[int]:
+        return sorted(int(path.stem) for path in self.directory.glob("*.ckpt"))
+
+    @contextmanager
+    def _locked(self):
+        """Hold the writer lock, with the head re-read from disk; yields whether another writer moved it"""
+        fd = os.open(self.directory, os.O_RDONLY) if fcntl is not None else None
+        try:
+            if fd is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            seen = self.head_seq
+            self._recover()
+            moved = self.head_seq != seen
+            if moved:
+                self._head_state = None
+            yield moved
+        finally:
+            if fd is not None:
+                os.close(fd)  # releases the lock
+
+    def _recover(self):
+        """Find the head sequence from the newest checkpoint and its segment"""
+        checkpoints = self.checkpoints()
+        if not checkpoints:
+            return
+        base = checkpoints[-1]
+        self.head_seq = base
+        self._segment_records = 0
+        path = self._segment_path(base)
+        if not path.exists():
+            return
+        valid = 0
+        with open(path, "rb+") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                valid += len(line)
+                self.head_seq = record["seq"]
+                self._segment_records += 1
+            # Drop a torn final line so the next append starts on a fresh line
+            f.truncate(valid)
+
+    def _read_segment(self, base: int) -> Iterator[Dict]:
+        path = self._segment_path(base)
+        if not path.exists():
+            return
+        with open(path, "rb") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break  # torn final line from an interrupted append
+                yield record
+
+    # -- writing ------------------------------------------------------------
+
+    def append(self, state: WorkspaceState,
+               delta: Optional[Tuple[Dict[str, FileState], List[str]]] = None) -> int:
+        """Record state as the next sequence number from its file delta (a checkpoint when due); returns it"""
+        with self._locked() as moved:
+            # The delta is relative to this writer's last state; after another writer's it is not
+            return self._append(state, None if moved else delta)
+
+    def _append(self, state: WorkspaceState,
+                delta: Optional[Tuple[Dict[str, FileState], List[str]]]) -> int:
+        head = self._head_state
+        if head is None and self.head_seq and delta is not None:
+            head = self._head_state = self.state_at(self.head_seq)
+        comparable = (delta is not None and head is not None
+                      and head.hash_algorithm == state.hash_algorithm
+                      and head.root_path == state.root_path)
+        if not comparable or self._checkpoint_due():
+            return self._checkpoint(state)
+
+        seq = self.head_seq + 1
+        record = {
+            "seq": seq,
+            "timestamp": state.timestamp,
+            "state_hash": state.state_hash,
+            "total_files": state.total_files,
+            "total_size": state.total_size,
+            "files": self._file_delta(*delta)
+        }
+        dirs = {}
+        added = sorted(set(state.directories) - head.directories)
+        removed = sorted(head.directories - set(state.directories))
+        if added:
+            dirs["add"] = added
+        if removed:
+            dirs["del"] = removed
+        if dirs:
+            record["dirs"] = dirs
+        for name in ("dir_hashes", "dir_meta"):
+            delta = _dict_delta(getattr(head, name), getattr(state, name))
+            if delta:
+                record[name] = delta
+
+        line = json.dumps(record, separators=(",", ":")).encode("utf-8", "surrogatepass") + b"\n"
+        with open(self._segment_path(self._segment_base()), "ab") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        self.head_seq = seq
+        self._segment_records += 1
+        self._set_head(state)
+        return seq
+
+    @staticmethod
+    def _file_delta(changed: Dict[str, FileState], removed: List[str]) -> Dict:
+        delta = {}
+        if changed:
+            delta["set"] = {path: _file_row(file_state) for path, file_state in changed.items()}
+        if removed:
+            delta["del"] = removed
+        return delta
+
+    def _segment_base(self) -> int:
+        return self.checkpoints()[-1]
+
+    def _checkpoint_due(self) -> bool:
+        if self._segment_records >= self.checkpoint_interval:
+            return True
+        base = self._segment_base()
+        try:
+            return (self._segment_path(base).stat().st_size * 2
+                    > self._checkpoint_path(base).stat().st_size)
+        except FileNotFoundError:
+            return False
+
+    def checkpoint(self, state: WorkspaceState) -> int:
+        """Record state in full as the next sequence number"""
+        with self._locked():
+            return self._checkpoint(state)
+
+    def _checkpoint(self, state: WorkspaceState) -> int:
+        seq = self.head_seq + 1
+        path = self._checkpoint_path(seq)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(encode_state(state))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        self.head_seq = seq
+        self._segment_records = 0
+        self._set_head(state)
+        if self.keep_checkpoints:
+            checkpoints = self.checkpoints()
+            if len(checkpoints) > self.keep_checkpoints:
+                self._prune(checkpoints[-self.keep_checkpoints])
+        return seq
+
+    def _set_head(self, state: WorkspaceState):
+        self._head_state = WorkspaceState(
+            timestamp=state.timestamp, root_path=state.root_path, files={},
+            directories=set(state.directories), total_files=state.total_files,
+            total_size=state.total_size, state_hash=state.state_hash,
+            hash_algorithm=state.hash_algorithm, dir_hashes=dict(state.dir_hashes),
+            dir_meta={key: list(value) for key, value in state.dir_meta.items()})
+
+    def prune(self, before_seq: int) -> int:
+        """Drop history older than the newest checkpoint at or before before_seq; returns checkpoints removed"""
+        with self._locked():
+            return self._prune(before_seq)
+
+    def _prune(self, before_seq: int) -> int:
+        kept = [seq for seq in self.checkpoints() if seq <= before_seq]
+        if not kept:
+            return 0
+        removed = 0
+        for seq in self.checkpoints():
+            if seq < kept[-1]:
+                self._checkpoint_path(seq).unlink()
+                self._segment_path(seq).unlink(missing_ok=True)
+                removed += 1
+        return removed
+
+    # -- reading ------------------------------------------------------------
+
+    def history(self) -> List[Tuple[int, str, str]]:
+        """(seq, timestamp, state_hash) of every reconstructable state, oldest first"""
+        entries = []
+        for base in self.checkpoints():
+            try:
+                header = read_state_header(self._checkpoint_path(base))
+            except (CacheFormatError, OSError):
+                continue
+            entries.append((base, header["timestamp"], header["state_hash"]))
+            entries.extend((record["seq"], record["timestamp"], record["state_hash"])
+                           for record in self._read_segment(base))
+        return entries
+
+    def seq_at(self, timestamp: str) -> Optional[int]:
+        """Sequence number of the last state recorded at or before an ISO timestamp"""
+        found = None
+        for seq, recorded, _ in self.history():
+            if recorded <= timestamp:
+                found = seq
+        return found
+
+    def state_at(self, seq: Optional[int] = None) -> Optional[WorkspaceState]:
+        """Rebuild the state recorded as seq (default: the head); None once pruned or never recorded"""
+        states = self._replay(self.head_seq if seq is None else seq, keep_previous=False)
+        return states[1] if states else None
+
+    def latest_pair(self) -> Tuple[Optional[WorkspaceState], Optional[WorkspaceState]]:
+        """(previous, current): the two newest states, rebuilt in one replay"""
+        states = self._replay(self.head_seq, keep_previous=True)
+        return states if states else (None, None)
+
+    def _replay(self, seq: int, keep_previous: bool):
+        bases = [base for base in self.checkpoints() if base <= seq]
+        if not bases:
+            return None
+        base = bases[-1]
+        try:
+            state = read_state_binary(self._checkpoint_path(base))
+        except (CacheFormatError, OSError):
+            return None
+        if base == seq:
+            return (self.state_at(seq - 1) if keep_previous else None), state
+
+        previous = None
+        reached = base
+        for record in self._read_segment(base):
+            if record["seq"] > seq:
+                break
+            if keep_previous and record["seq"] == seq:
+                previous = copy_state(state)
+            self._apply(state, record)
+            reached = record["seq"]
+        return (previous, state) if reached == seq else None
+
+    @staticmethod
+    def _apply(state: WorkspaceState, record: Dict):
+        files = record.get("files", {})
+        for path in files.get("del", ()):
+            state.files.pop(path, None)
+        for path, row in files.get("set", {}).items():
+            state.files[path] = FileState(path, *row)
+        dirs = record.get("dirs", {})
+        state.directories.difference_update(dirs.get("del", ()))
+        state.directories.update(dirs.get("add", ()))
+        for name in ("dir_hashes", "dir_meta"):
+            table = getattr(state, name)
+            delta = record.get(name, {})
+            for key in delta.get("del", ()):
+                table.pop(key, None)
+            table.update(delta.get("set", {}))
+        state.timestamp = record["timestamp"]
+        state.state_hash = record["state_hash"]
+        state.total_files = record["total_files"]
+        state.total_size = record["total_size"]
+        if hasattr(state, "_tree_index"):
+            del state._tree_index
+
+    def size_bytes(self) -> int:
+        return sum(path.stat().st_size for path in self.directory.iterdir() if path.is_file())
@@ -4,12 +4,24 @@ State Management Engine
 High-performance change detection with multi-tier caching
 """
 
+import re
 import json
 import time
+from collections import Counter
+from datetime import datetime
 from pathlib import Path
-from typing import Dict, Optional, List, Tuple
+from typing import Dict, Iterable, Iterator, Optional, List
 from dataclasses import dataclass, asdict
-from workspace_scanner import WorkspaceScanner, WorkspaceState
+from workspace_scanner import WorkspaceScanner, WorkspaceState, FileState, FileStateTable
+from state_cache import (CacheFormatError, CacheStore, MappedWorkspaceState, encode_state,
+                         open_state_mapped, read_state_binary, read_state_header)
+from state_journal import StateHistoryError, StateJournal, diff_files
+from content_index import ContentIndex
+
+try:
+    import numpy as np  # optional: vectorized impact classification for very large diffs
+except ImportError:
+    np = None
 
 @dataclass
 class CacheMetrics:
@@ -26,196 +38,544 @@ class ChangeEvent:
     details: Dict
     impact_level: str
 
+class ImpactClassifier:
+    """Path -> impact level (first matching tier wins) with precompiled matchers, NumPy-batched when available"""
+    
+    HIGH_PATTERNS = ('changelog.md', 'requirements.txt', 'config.ini',
+                     'main.py', 'app.py', '__init__.py')
+    MEDIUM_PATTERNS = ('.md', '.json', '.yaml', '.yml', '.ini', '.cfg',
+                       '.py', '.js', '.sql', '.html', '.css')
+    LOW_PATTERNS = ('.log', '.tmp', '.cache', 'temp')
+    NUMPY_MIN_BATCH = 10000
+    
+    def __init__(self):
+        compile_tier = lambda patterns: re.compile("|".join(map(re.escape, patterns)))
+        self._high = compile_tier(self.HIGH_PATTERNS)
+        self._medium = compile_tier(self.MEDIUM_PATTERNS)
+        self._low = compile_tier(self.LOW_PATTERNS)
+    
+    def classify(self, file_path: str) -> str:
+        lowered = file_path.lower()
+        if self._high.search(lowered):
+            return "HIGH"
+        if self._medium.search(lowered):
+            return "MEDIUM"
+        if self._low.search(lowered):
+            return "LOW"
+        return "MEDIUM"
+    
+    def classify_many(self, paths: List[str]) -> List[str]:
+        """Impact level of each path, in order"""
+        if np is not None and len(paths) >= self.NUMPY_MIN_BATCH:
+            high, low = self._numpy_masks(paths)
+            levels = np.full(len(paths), "MEDIUM", dtype=object)
+            levels[high] = "HIGH"
+            levels[low] = "LOW"
+            return levels.tolist()
+        return [self.classify(path) for path in paths]
+    
+    def _numpy_masks(self, paths: List[str]):
+        lowered = np.char.lower(np.asarray(paths, dtype=str))
+        
+        def any_of(patterns):
+            mask = np.zeros(len(paths), dtype=bool)
+            for pattern in patterns:
+                mask |= np.char.find(lowered, pattern) >= 0
+            return mask
+        
+        high = any_of(self.HIGH_PATTERNS)
+        low = ~high & ~any_of(self.MEDIUM_PATTERNS) & any_of(self.LOW_PATTERNS)
+        return high, low
+
 class StateManager:
-    def __init__(self, cache_dir: str = ".workspace_cache"):
+    def __init__(self, cache_dir: str = ".workspace_cache", index_backend: Optional[str] = None):
         self.cache_dir = Path(cache_dir)
-        self.cache_dir.mkdir(exist_ok=True)
+        self.journal = StateJournal(self.cache_dir / "journal")
+        # Snapshots and journal share the max_cache_size bound
+        self.store = CacheStore(self.cache_dir, extra_size=self.journal.size_bytes)
+        # Older versions kept the current and previous states as snapshots
+        for name in ("current", "previous"):
+            self.store.delete(name)
+        
+        # Optional queryable index of file states and change history
+        self._content_index: Optional[ContentIndex] = None
+        self._other_content_index: Optional[tuple] = None  # (state, index) for events on other states
+        self.classifier = ImpactClassifier()
+        self.index = None
+        if index_backend == "sqlite":
+            from state_index import StateIndex
+            self.index = StateIndex(self.cache_dir / "state_index.db")
+        elif index_backend is not None:
+            raise ValueError(f"Unknown index_backend: {index_backend}")
         
         self.scanner = WorkspaceScanner()
+        # The cache is rewritten on every scan; tracking it would invalidate every state
+        self.ignore_directory(self.cache_dir)
         self.current_state: Optional[WorkspaceState] = None
         self.previous_state: Optional[WorkspaceState] = None
-        self.metrics = CacheMetrics()
+        self._previous_seq: Optional[int] = None  # journal seq of a previous_state not yet rebuilt
+        self.metrics = CacheMetrics(cache_size=self.store.total_size())
+        self.watcher = None
         
         # Performance configuration
         self.max_cache_size = 100 * 1024 * 1024  # 100MB
         self.cache_ttl = 3600  # 1 hour
         self.compression_enabled = True
+        self.cache_format = "binary"  # "binary" (mmap-friendly) or "json"
         
+    def ignore_directory(self, directory):
+        """Keep a directory inside the workspace (e.g. a tool's own data) out of scans"""
+        self.ignore_path(directory, directory=True)
+    
+    def ignore_path(self, path, directory: bool = False):
+        """Keep one file (e.g. a tool's own output) or directory inside the workspace out of scans"""
+        try:
+            rel = Path(path).resolve().relative_to(self.scanner.root_path)
+        except ValueError:
+            return
+        if rel.parts:
+            self.scanner.ignore_patterns.add(f"/{rel.as_posix()}/" if directory else f"/{rel.as_posix()}")
+    
+    @property
+    def previous_state(self) -> Optional[WorkspaceState]:
+        """State before current_state; after a mapped cold start, rebuilt from the journal on first use"""
+        if self._previous_seq is not None:
+            seq = self._previous_seq
+            self.previous_state = self.journal.state_at(seq) if seq else None
+        return self._previous_state
+    
+    @previous_state.setter
+    def previous_state(self, state: Optional[WorkspaceState]):
+        self._previous_seq = None
+        self._previous_state = state
+    
+    @property
+    def max_cache_size(self) -> int:
+        return self.store.max_size
+    
+    @max_cache_size.setter
+    def max_cache_size(self, value: int):
+        self.store.max_size = value
+    
+    @property
+    def cache_ttl(self) -> float:
+        return self.store.ttl
+    
+    @cache_ttl.setter
+    def cache_ttl(self, value: float):
+        self.store.ttl = value
+    
+    def _cache_suffix(self) -> str:
+        return "bin" if self.cache_format == "binary" else "json"
+    
     def _get_cache_path(self, cache_type: str) -> Path:
         """Generate cache file path"""
-        return self.cache_dir / f"{cache_type}_state.json"
+        return self.store.path(cache_type, self._cache_suffix())
     
     def _is_cache_valid(self, cache_path: Path) -> bool:
         """Check if cache is within TTL"""
-        if not cache_path.exists():
-            return False
-        
-        cache_age = time.time() - cache_path.stat().st_mtime
-        return cache_age < self.cache_ttl
+        return self.store.is_fresh(cache_path)
     
-    def save_state_cache(self, state: WorkspaceState, cache_type: str = "current"):
-        """Save workspace state to cache"""
-        cache_path = self._get_cache_path(cache_type)
-        
-        state_dict = {
+    def _state_to_dict(self, state: WorkspaceState) -> Dict:
+        return {
             "timestamp": state.timestamp,
             "root_path": state.root_path,
             "files": {k: asdict(v) for k, v in state.files.items()},
             "directories": sorted(state.directories),
             "total_files": state.total_files,
             "total_size": state.total_size,
-            "state_hash": state.state_hash
+            "state_hash": state.state_hash,
+            "hash_algorithm": state.hash_algorithm,
+            "dir_hashes": state.dir_hashes,
+            "dir_meta": state.dir_meta
         }
+    
+    def _state_from_dict(self, data: Dict) -> WorkspaceState:
+        return WorkspaceState(
+            timestamp=data["timestamp"],
+            root_path=data["root_path"],
+            files=FileStateTable((k, FileState(**v)) for k, v in data["files"].items()),
+            directories=set(data["directories"]),
+            total_files=data["total_files"],
+            total_size=data["total_size"],
+            state_hash=data["state_hash"],
+            hash_algorithm=data.get("hash_algorithm", "sha256"),
+            dir_hashes=data.get("dir_hashes", {}),
+            dir_meta=data.get("dir_meta", {})
+        )
+    
+    def save_state_cache(self, state: WorkspaceState, cache_type: str):
+        """Save workspace state as the snapshot named cache_type (e.g. a branch or session id)"""
+        if self.cache_format == "binary":
+            data = encode_state(state)
+        else:
+            data = json.dumps(self._state_to_dict(state),
+                              separators=(',', ':') if self.compression_enabled else None).encode()
+        self.store.write(cache_type, self._cache_suffix(), data)
         
-        with open(cache_path, 'w') as f:
-            json.dump(state_dict, f, separators=(',', ':') if self.compression_enabled else None)
-        
-        self.metrics.cache_size = cache_path.stat().st_size
+        self.metrics.cache_size = self.store.total_size()
         self.metrics.last_update = time.time()
     
-    def load_state_cache(self, cache_type: str = "current") -> Optional[WorkspaceState]:
-        """Load workspace state from cache"""
-        cache_path = self._get_cache_path(cache_type)
+    def export_state_json(self, state: WorkspaceState, output_path: str):
+        """Export a state as JSON regardless of the cache format"""
+        with open(output_path, 'w') as f:
+            json.dump(self._state_to_dict(state), f, indent=2)
+    
+    def _read_state_cache(self, cache_type: str,
+                          lazy: bool = False) -> Optional[WorkspaceState]:
+        """Read a cached state, or None if missing, expired, unreadable or incomparable"""
+        cache_path = self.store.lookup(cache_type, self._cache_suffix())
+        if cache_path is None:
+            return None
         
-        if self._is_cache_valid(cache_path):
-            try:
+        try:
+            if self.cache_format == "binary":
+                # Only the header is parsed before deciding the cache is usable
+                algorithm = read_state_header(cache_path).get("hash_algorithm")
+            else:
                 with open(cache_path, 'r') as f:
                     data = json.load(f)
-                
-                from workspace_scanner import FileState
-                files = {k: FileState(**v) for k, v in data["files"].items()}
-                
-                self.metrics.hit_count += 1
-                return WorkspaceState(
-                    timestamp=data["timestamp"],
-                    root_path=data["root_path"],
-                    files=files,
-                    directories=set(data["directories"]),
-                    total_files=data["total_files"],
-                    total_size=data["total_size"],
-                    state_hash=data["state_hash"]
-                )
-            except (json.JSONDecodeError, KeyError):
-                self.metrics.miss_count += 1
+                algorithm = data.get("hash_algorithm", "sha256")
+            
+            # States fingerprinted with another algorithm are not comparable
+            if algorithm != self.scanner.hash_algorithm:
                 return None
-        
-        self.metrics.miss_count += 1
-        return None
+            
+            if self.cache_format == "binary":
+                return open_state_mapped(cache_path) if lazy else read_state_binary(cache_path)
+            return self._state_from_dict(data)
+        except (json.JSONDecodeError, KeyError, CacheFormatError, OSError):
+            return None
+    
+    def load_state_cache(self, cache_type: str,
+                         lazy: bool = False) -> Optional[WorkspaceState]:
+        """Load workspace state from cache (lazy=True memory-maps a binary cache; close() it when done)"""
+        state = self._read_state_cache(cache_type, lazy)
+        if state is None:
+            self.metrics.miss_count += 1
+        else:
+            self.metrics.hit_count += 1
+        return state
     
-    def get_current_state(self, force_refresh: bool = False) -> WorkspaceState:
+    def get_current_state(self, force_refresh: bool = False,
+                          force_rehash: bool = False) -> WorkspaceState:
         """Get current workspace state with caching"""
-        if not force_refresh and self.current_state:
-            cached_state = self.load_state_cache("current")
-            if cached_state and cached_state.state_hash == self.current_state.state_hash:
-                return cached_state
+        # Hit: the last known state (in memory, or the journal head on a cold start)
+        # revalidates by stat. Miss: rescan reusing unchanged hashes and journal the delta.
+        # Watch mode: the watcher keeps the state live, no scan needed
+        if self.watcher is not None and self.watcher.live and not force_refresh:
+            polled = self.watcher.poll()
+            self.current_state = self.watcher.state
+            if polled and self._content_index is not None:
+                changed, removed = diff_files(self.current_state, None, polled)
+                self._content_index.apply(changed, removed, polled)
+            self.metrics.hit_count += 1
+            return self.current_state
         
-        # Generate fresh state
-        self.previous_state = self.current_state
-        self.current_state = self.scanner.scan_workspace()
+        baseline = self.current_state
+        cold_start = baseline is None
+        if cold_start:
+            # A head checkpoint is mapped rather than decoded (read-only consumers
+            # such as reports only touch its header) and the state before it is
+            # rebuilt only if asked for; with deltas pending both are replayed
+            previous, previous_seq = None, None
+            baseline = self._map_head_checkpoint()
+            if baseline is not None:
+                previous_seq = self.journal.head_seq - 1
+            else:
+                previous, baseline = self.journal.latest_pair()
+            # States fingerprinted with another algorithm are not comparable
+            if baseline is not None and baseline.hash_algorithm != self.scanner.hash_algorithm:
+                previous, previous_seq, baseline = None, None, None
         
-        # Cache new state
-        self.save_state_cache(self.current_state, "current")
-        if self.previous_state:
-            self.save_state_cache(self.previous_state, "previous")
+        if (not force_refresh and not force_rehash and baseline is not None
+                and self.scanner.revalidate(baseline)):
+            if cold_start:
+                self.current_state = baseline
+                self.previous_state = previous
+                self._previous_seq = previous_seq
+                self._update_index(self.journal.head_seq, None, baseline)
+            self.metrics.hit_count += 1
+            return self.current_state
+        
+        # Generate fresh state, hashing only new or touched files
+        self.metrics.miss_count += 1
+        fresh = self.scanner.scan_workspace(previous_state=baseline, force_rehash=force_rehash)
+        self.metrics.last_update = time.time()
+        
+        # A miss without content changes (e.g. a directory changed too recently
+        # to be trusted) keeps previous_state, so pending changes are not lost
+        if baseline is not None and fresh.state_hash == baseline.state_hash:
+            if cold_start:
+                self.previous_state = previous
+                self._previous_seq = previous_seq
+                self._update_index(self.journal.head_seq, None, fresh)
+            self.current_state = fresh
+            return self.current_state
+        
+        self.previous_state = baseline
+        self.current_state = fresh
+        
+        # Journal only what changed since the previous state
+        self._record_state(baseline, self.current_state)
         
         return self.current_state
     
-    def detect_changes(self) -> List[ChangeEvent]:
-        """Detect changes between states"""
+    def _map_head_checkpoint(self) -> Optional[MappedWorkspaceState]:
+        """The journal head mapped read-only when it is a checkpoint, else None"""
+        # Checkpoints are never rewritten in place (renamed in, later unlinked), so the mapping stays valid
+        path = self.journal.head_checkpoint_path()
+        if path is None:
+            return None
+        try:
+            return open_state_mapped(path)
+        except (CacheFormatError, OSError):
+            return None
+    
+    def _record_state(self, previous: Optional[WorkspaceState], current: WorkspaceState,
+                      changed_paths=None, events: Optional[List[ChangeEvent]] = None) -> int:
+        """Journal a new current state and bring the derived indexes up to date from one file delta"""
+        delta = None
+        previous_files = {}
+        if changed_paths is not None:
+            delta = diff_files(current, None, changed_paths)
+            previous_files = changed_paths
+        elif (previous is not None and previous.hash_algorithm == current.hash_algorithm
+              and previous.root_path == current.root_path):
+            delta = diff_files(current, previous)
+            previous_files = previous.files
+        
+        seq = self.journal.append(current, delta)
+        if self._content_index is not None:
+            if delta is None:
+                self._content_index = None  # rebuilt on next use
+            else:
+                self._content_index.apply(delta[0], delta[1], previous_files)
+        self._update_index(seq, previous, current, delta, events)
+        return seq
+    
+    def _update_index(self, seq: int, previous: Optional[WorkspaceState], current: WorkspaceState,
+                      delta=None, events: Optional[List[ChangeEvent]] = None):
+        """Sync the optional index to the state journaled as seq and record its changes"""
+        if self.index is None or self.index.seq == seq:
+            return
+        if delta is not None and self.index.seq == seq - 1:
+            self.index.sync_state(current, seq, delta[0], delta[1])
+        else:
+            self.index.sync_state(current, seq)
+        
+        if events is None and previous is not None and previous.hash_algorithm == current.hash_algorithm:
+            changes = self.scanner.compare_states(previous, current)
+            events = self._build_events(changes, current, previous.files)
+        if events:
+            self.index.record_changes(events, seq, self.scanner.get_file_type)
+    
+    @property
+    def content_index(self) -> ContentIndex:
+        """hash -> paths index of the current state, built on first use then kept in step"""
+        if self._content_index is None:
+            state = self.get_current_state()
+            self._content_index = ContentIndex.from_state(state)
+        return self._content_index
+    
+    def _content_index_of(self, state: WorkspaceState) -> ContentIndex:
+        """Content index of state: the live one for the current state, else one built for it"""
+        if state is self.current_state:
+            if self._content_index is None:
+                self._content_index = ContentIndex.from_state(state)
+            return self._content_index
+        if self._other_content_index is None or self._other_content_index[0] is not state:
+            self._other_content_index = (state, ContentIndex.from_state(state))
+        return self._other_content_index[1]
+    
+    def get_duplicate_report(self, limit: int = 10) -> Dict:
+        """Duplicate content, wasted bytes and the largest duplicate clusters"""
+        index = self.content_index
+        return index.report(self.current_state.files, limit)
+    
+    def mark_answer(self, number: int, timestamp: Optional[str] = None):
+        """Tie a changelog answer number to the current journal position (index only)"""
+        if self.index is not None:
+            self.index.record_answer(number, timestamp or datetime.now().isoformat(),
+                                     self.journal.head_seq)
+    
+    def state_at(self, point) -> Optional[WorkspaceState]:
+        """Rebuild a journaled state by sequence number (int) or ISO timestamp (str)"""
+        # Only states from the oldest retained checkpoint on can be rebuilt: older
+        # history is pruned once journal.keep_checkpoints newer checkpoints exist
+        seq = point if isinstance(point, int) else self.journal.seq_at(point)
+        return self.journal.state_at(seq) if seq else None
+    
+    def _state_since(self, since) -> WorkspaceState:
+        """state_at(since), raising StateHistoryError when that point is not in the journal"""
+        past = self.state_at(since)
+        if past is None:
+            oldest = self.journal.history()[:1]
+            raise StateHistoryError(
+                f"No journaled state at {since!r}; history starts at "
+                + (f"#{oldest[0][0]} ({oldest[0][1]})" if oldest else "the next recorded state"))
+        return past
+    
+    def start_watching(self) -> bool:
+        """Keep the current state live through inotify; False if unavailable"""
+        baseline = self.current_state or self.journal.state_at()
+        if baseline is not None and baseline.hash_algorithm != self.scanner.hash_algorithm:
+            baseline = None
+        try:
+            from workspace_watcher import WorkspaceWatcher
+            watcher = WorkspaceWatcher(self.scanner, baseline)
+            self.current_state = watcher.start()
+        except (ImportError, OSError):
+            return False
+        self.watcher = watcher
+        self._content_index = None
+        self._record_state(baseline, self.current_state)
+        return True
+    
+    def stop_watching(self):
+        """Stop watch mode; later calls go back to scanning"""
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+    
+    def detect_changes(self, since=None) -> List[ChangeEvent]:
+        """Detect changes between states (since: a journaled sequence number or ISO timestamp)"""
+        # since must still be retained (see state_at); StateHistoryError otherwise
+        if since is None and self.watcher is not None and self.watcher.live:
+            return self._detect_watched_changes()
+        
         current = self.get_current_state()
+        past = self.previous_state if since is None else self._state_since(since)
         
-        if not self.previous_state:
+        if not past:
             return []
         
-        changes = self.scanner.compare_states(self.previous_state, current)
-        events = []
+        changes = self.scanner.compare_states(past, current)
+        return self._build_events(changes, current, past.files)
+    
+    def iter_changes(self, since=None, detect_moves: bool = True) -> Iterator[ChangeEvent]:
+        """Yield ChangeEvents lazily while the diff is walked (moves follow once the walk ends)"""
+        if since is None and self.watcher is not None and self.watcher.live:
+            yield from self._detect_watched_changes()
+            return
+        
+        current = self.get_current_state()
+        past = self.previous_state if since is None else self._state_since(since)
+        if not past:
+            return
         
-        # Process added files
-        for file_path in changes["added"]:
-            file_info = current.files[file_path]
-            events.append(ChangeEvent(
+        for kind, entry in self.scanner.iter_changes(past, current, detect_moves=detect_moves):
+            yield self._event_for(kind, entry, current, past.files)
+    
+    def _detect_watched_changes(self) -> List[ChangeEvent]:
+        """Changes applied by the watcher since the last call, without scanning"""
+        drained = self.watcher.drain_changes()
+        current = self.watcher.state
+        self.current_state = current
+        self.metrics.hit_count += 1
+        changes = {"added": [], "modified": [], "removed": [], "moved": []}
+        for file_path, prior in drained.items():
+            file_info = current.files.get(file_path)
+            if prior is None:
+                changes["added"].append(file_path)
+            elif file_info is None:
+                changes["removed"].append(file_path)
+            elif self.scanner._content_changed(prior, file_info):
+                changes["modified"].append({
+                    "path": file_path,
+                    "size_change": file_info.size - prior.size,
+                    "modified_time": file_info.modified
+                })
+        self.scanner.detect_moves(changes, drained, current.files)
+        events = self._build_events(changes, current, drained)
+        if drained:
+            self._record_state(None, current, changed_paths=drained, events=events)
+        return events
+    
+    def _build_events(self, changes: Dict, current: WorkspaceState,
+                      previous_files: Dict) -> List[ChangeEvent]:
+        """Turn a compare_states-style diff into ChangeEvents"""
+        return [self._event_for(kind, entry, current, previous_files)
+                for kind in ("added", "removed", "modified", "moved")
+                for entry in changes[kind]]
+    
+    def _event_for(self, kind: str, entry, current: WorkspaceState,
+                   previous_files: Dict) -> ChangeEvent:
+        """ChangeEvent for one compare_states entry of the given kind"""
+        if kind == "added":
+            file_info = current.files[entry]
+            details = {
+                "size": file_info.size,
+                "type": file_info.type,
+                "hash": file_info.hash
+            }
+            # Copies of content already in the workspace
+            duplicates = self._content_index_of(current).duplicates_of(entry, file_info.hash)
+            if duplicates:
+                details["duplicate_of"] = duplicates[0]
+            return ChangeEvent(
                 timestamp=current.timestamp,
                 change_type="ADDED",
-                file_path=file_path,
-                details={
-                    "size": file_info.size,
-                    "type": file_info.type,
-                    "hash": file_info.hash
-                },
-                impact_level=self._assess_impact(file_path, "ADDED")
-            ))
+                file_path=entry,
+                details=details,
+                impact_level=self._assess_impact(entry, "ADDED")
+            )
         
-        # Process removed files
-        for file_path in changes["removed"]:
-            file_info = self.previous_state.files[file_path]
-            events.append(ChangeEvent(
+        if kind == "removed":
+            file_info = previous_files[entry]
+            return ChangeEvent(
                 timestamp=current.timestamp,
                 change_type="REMOVED",
-                file_path=file_path,
+                file_path=entry,
                 details={
                     "size": file_info.size,
                     "type": file_info.type
                 },
-                impact_level=self._assess_impact(file_path, "REMOVED")
-            ))
+                impact_level=self._assess_impact(entry, "REMOVED")
+            )
         
-        # Process modified files
-        for mod_info in changes["modified"]:
-            events.append(ChangeEvent(
+        if kind == "modified":
+            return ChangeEvent(
                 timestamp=current.timestamp,
                 change_type="MODIFIED",
-                file_path=mod_info["path"],
+                file_path=entry["path"],
                 details={
-                    "size_change": mod_info["size_change"],
-                    "modified_time": mod_info["modified_time"]
+                    "size_change": entry["size_change"],
+                    "modified_time": entry["modified_time"]
                 },
-                impact_level=self._assess_impact(mod_info["path"], "MODIFIED")
-            ))
+                impact_level=self._assess_impact(entry["path"], "MODIFIED")
+            )
         
-        return events
+        file_info = current.files[entry["to"]]
+        return ChangeEvent(
+            timestamp=current.timestamp,
+            change_type="MOVED",
+            file_path=entry["to"],
+            details={
+                "from": entry["from"],
+                "size": file_info.size,
+                "type": file_info.type,
+                "hash": file_info.hash
+            },
+            impact_level=self._assess_impact(entry["to"], "MOVED")
+        )
     
     def _assess_impact(self, file_path: str, change_type: str) -> str:
         """Assess change impact level"""
-        file_path_lower = file_path.lower()
-        
-        # Critical system files
-        if any(pattern in file_path_lower for pattern in [
-            'changelog.md', 'requirements.txt', 'config.ini', 
-            'main.py', 'app.py', '__init__.py'
-        ]):
-            return "HIGH"
-        
-        # Configuration and documentation
-        if any(pattern in file_path_lower for pattern in [
-            '.md', '.json', '.yaml', '.yml', '.ini', '.cfg'
-        ]):
-            return "MEDIUM"
-        
-        # Source code
-        if any(pattern in file_path_lower for pattern in [
-            '.py', '.js', '.sql', '.html', '.css'
-        ]):
-            return "MEDIUM"
-        
-        # Logs and temporary files
-        if any(pattern in file_path_lower for pattern in [
-            '.log', '.tmp', '.cache', 'temp'
-        ]):
-            return "LOW"
-        
-        return "MEDIUM"
+        return self.classifier.classify(file_path)
     
-    def generate_change_summary(self, events: List[ChangeEvent]) -> Dict:
-        """Generate structured change summary"""
+    def generate_change_summary(self, events: Iterable[ChangeEvent]) -> Dict:
+        """Generate structured change summary (events may be a one-pass iterable)"""
         summary = {
-            "total_changes": len(events),
-            "by_type": {"ADDED": 0, "MODIFIED": 0, "REMOVED": 0},
+            "total_changes": 0,
+            "by_type": {"ADDED": 0, "MODIFIED": 0, "REMOVED": 0, "MOVED": 0},
             "by_impact": {"HIGH": 0, "MEDIUM": 0, "LOW": 0},
             "affected_types": set(),
             "critical_changes": []
         }
         
         for event in events:
+            summary["total_changes"] += 1
             summary["by_type"][event.change_type] += 1
             summary["by_impact"][event.impact_level] += 1
             
@@ -234,23 +594,109 @@ class StateManager:
         summary["affected_types"] = list(summary["affected_types"])
         return summary
     
-    def cleanup_cache(self):
-        """Clean up expired cache files"""
-        for cache_file in self.cache_dir.glob("*_state.json"):
-            if not self._is_cache_valid(cache_file):
-                cache_file.unlink()
+    def summarize_changes(self, since=None, include_events: bool = False) -> Dict:
+        """Change summary computed in bulk, building ChangeEvents only for HIGH-impact files"""
+        if since is None and self.watcher is not None and self.watcher.live:
+            events = self._detect_watched_changes()
+            summary = self.generate_change_summary(events)
+            if include_events:
+                summary["events"] = events
+            return summary
+        
+        current = self.get_current_state()
+        past = self.previous_state if since is None else self._state_since(since)
+        changes = (self.scanner.compare_states(past, current) if past
+                   else {"added": [], "modified": [], "removed": [], "moved": []})
+        modified = [mod["path"] for mod in changes["modified"]]
+        moved = [move["to"] for move in changes["moved"]]
+        paths = changes["added"] + changes["removed"] + modified + moved
+        levels = self.classifier.classify_many(paths)
+        
+        affected_types = {current.files[path].type for path in changes["added"] + moved}
+        affected_types.update(past.files[path].type for path in changes["removed"])
+        if modified:
+            affected_types.add("unknown")  # modification events carry no file type
+        
+        # Full events only for the (few) critical files
+        high = {path for path, level in zip(paths, levels) if level == "HIGH"}
+        critical = []
+        if high:
+            high_changes = {
+                "added": [p for p in changes["added"] if p in high],
+                "removed": [p for p in changes["removed"] if p in high],
+                "modified": [m for m in changes["modified"] if m["path"] in high],
+                "moved": [m for m in changes["moved"] if m["to"] in high]
+            }
+            critical = [{"file": event.file_path, "type": event.change_type, "details": event.details}
+                        for event in self._build_events(high_changes, current, past.files)]
+        
+        by_impact = Counter(levels)
+        summary = {
+            "total_changes": len(paths),
+            "by_type": {"ADDED": len(changes["added"]), "MODIFIED": len(modified),
+                        "REMOVED": len(changes["removed"]), "MOVED": len(moved)},
+            "by_impact": {level: by_impact.get(level, 0) for level in ("HIGH", "MEDIUM", "LOW")},
+            "affected_types": list(affected_types),
+            "critical_changes": critical
+        }
+        if include_events:
+            summary["events"] = self._build_events(changes, current, past.files) if past else []
+        return summary
+    
+    def save_snapshot(self, name: str, state: Optional[WorkspaceState] = None):
+        """Keep a named snapshot (e.g. per branch or session) of a state, by default the current one"""
+        if name in ("current", "previous"):
+            raise ValueError(f"Snapshot name is reserved: {name}")
+        self.save_state_cache(state or self.get_current_state(), name)
+    
+    def load_snapshot(self, name: str, lazy: bool = False) -> Optional[WorkspaceState]:
+        """Load a named snapshot; None if missing, expired or incomparable"""
+        return self.load_state_cache(name, lazy)
+    
+    def list_snapshots(self) -> Dict[str, Dict]:
+        """Stored snapshots with their size, age and time since last use (seconds)"""
+        now = time.time()
+        return {
+            name: {"size": stat.st_size, "age": now - stat.st_mtime, "idle": now - stat.st_atime}
+            for name, _, stat in self.store.entries()
+        }
+    
+    def delete_snapshot(self, name: str) -> bool:
+        return self.store.delete(name)
+    
+    def cleanup_cache(self) -> int:
+        """Evict expired snapshots, then least recently used ones beyond max_cache_size"""
+        removed = self.store.evict()
+        self.metrics.cache_size = self.store.total_size()
+        return removed
     
     def get_metrics(self) -> Dict:
         """Get performance metrics"""
         hit_rate = 0
         if self.metrics.hit_count + self.metrics.miss_count > 0:
             hit_rate = self.metrics.hit_count / (self.metrics.hit_count + self.metrics.miss_count)
+        store_stats = self.store.stats
+        self.metrics.cache_size = self.store.total_size()
         
         return {
             "cache_hit_rate": f"{hit_rate:.2%}",
             "cache_size_mb": f"{self.metrics.cache_size / (1024*1024):.2f}",
             "last_update": self.metrics.last_update,
-            "total_requests": self.metrics.hit_count + self.metrics.miss_count
+            "total_requests": self.metrics.hit_count + self.metrics.miss_count,
+            "cache_store": {
+                "snapshots": len(self.store.entries()),
+                "hits": store_stats["hits"],
+                "misses": store_stats["misses"],
+                "writes": store_stats["writes"],
+                "evictions": store_stats["evictions"],
+                "expirations": store_stats["expirations"],
+                "max_size_mb": f"{self.store.max_size / (1024*1024):.2f}"
+            },
+            "journal": {
+                "head": self.journal.head_seq,
+                "checkpoints": len(self.journal.checkpoints()),
+                "size_mb": f"{self.journal.size_bytes() / (1024*1024):.2f}"
+            }
         }
 
 if __name__ == "__main__":
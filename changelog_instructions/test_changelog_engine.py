@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Changelog Engine Tests
+"""
+
+import os
+import time
+import pytest
+from changelog_engine import ChangelogEngine
+from changelog_store import ChangelogConflictError
+
+def test_rendering_does_not_invalidate_the_workspace_state(tmp_path, monkeypatch):
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "app.py").write_text("print('app')\n")
+    past = time.time_ns() - 100 * 10**9
+    os.utime(tmp_path / "src" / "app.py", ns=(past, past))
+    monkeypatch.chdir(tmp_path)
+    engine = ChangelogEngine(render_interval=1)
+    engine.update_changelog("first change")
+    manager = engine.state_manager
+    misses = manager.metrics.miss_count
+
+    engine.update_changelog("second change")
+    manager.get_current_state()
+
+    assert manager.metrics.miss_count == misses
+    assert "Changelog.md" not in manager.current_state.files
+    engine.query_index.close()
+
+def test_refused_update_stores_nothing(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    engine = ChangelogEngine(render_interval=1)
+    engine.update_changelog("first change")
+    path = tmp_path / "Changelog.md"
+    path.write_text(path.read_text().replace("first change", "edited by hand"))
+
+    with pytest.raises(ChangelogConflictError):
+        engine.update_changelog("second change")
+    assert engine.store.last_number() == 1 and engine.answer_counter == 1
+
+    engine.store.render(force=True)
+    engine.update_changelog("second change")
+    assert [record["number"] for record in engine.store.entries()] == [1, 2]
+    assert engine.store.verify()
+    engine.query_index.close()
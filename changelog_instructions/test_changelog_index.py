@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Changelog Query Index Tests
+"""
+
+import pytest
+from changelog_index import ChangelogIndex
+
+def record(number, timestamp, action_type, files):
+    return {
+        "number": number,
+        "timestamp": timestamp,
+        "action_type": action_type,
+        "summary": f"Answer {number}",
+        "files_affected": [{"file": path, "operation": "MODIFIED", "impact": impact}
+                           for path, impact in files]
+    }
+
+@pytest.fixture
+def index(tmp_path):
+    index = ChangelogIndex(tmp_path / "query_index.db")
+    index.add([
+        record(1, "2025-05-01 10:00", "Implementation", [("src/app.py", "HIGH")]),
+        record(2, "2025-05-15 12:00", "Optimization", [("src/util/cache.py", "MEDIUM"),
+                                                       ("README.md", "LOW")]),
+        record(3, "2025-05-31 23:59", "Optimization", [("src/app.py", "LOW")]),
+        record(4, "2025-06-01 00:00", "Documentation", [("docs/guide.md", "LOW")])
+    ])
+    yield index
+    index.close()
+
+def numbers(rows):
+    return [row["number"] for row in rows]
+
+def test_filters(index):
+    assert numbers(index.query(path="src/app.py")) == [3, 1]
+    assert numbers(index.query(path_prefix="src/")) == [3, 2, 1]
+    assert numbers(index.query(path_prefix="src/util/")) == [2]
+    assert numbers(index.query(impact="high")) == [1]
+    assert numbers(index.query(action_type="optimization")) == [3, 2]
+    assert numbers(index.query(since="2025-05-15", until="2025-05-31")) == [3, 2]
+    assert numbers(index.query(until="2025-05-15 11:00")) == [1]
+    assert numbers(index.query(path_prefix="src/", impact="MEDIUM", action_type="Optimization")) == [2]
+    assert numbers(index.query(limit=2)) == [4, 3]
+
+def test_re_adding_replaces_an_entry(index):
+    index.add([record(1, "2025-05-01 10:00", "Modification", [("lib/new.py", "LOW")])])
+
+    assert len(index) == 4 and index.numbers() == {1, 2, 3, 4}
+    assert numbers(index.query(path="src/app.py")) == [3]
+    assert index.files_for(1) == [{"path": "lib/new.py", "operation": "MODIFIED", "impact": "LOW"}]
+    assert index.action_type_totals()["Optimization"] == 2
+
+def test_engine_catches_up_missing_entries(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    from changelog_engine import ChangelogEngine
+    engine = ChangelogEngine(render_interval=1)
+    engine.update_changelog("first change")
+    engine.update_changelog("second change")
+    engine.query_index.close()
+    (engine.store.directory / "query_index.db").unlink()
+
+    reopened = ChangelogEngine(render_interval=1)
+    assert numbers(reopened.query()) == [2, 1]
+    reopened.query_index.close()
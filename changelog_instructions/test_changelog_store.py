@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Changelog Store Tests
+"""
+
+import json
+import pytest
+from changelog_store import ChangelogConflictError, ChangelogStore
+
+HEADER = "# Changelog\n\n---\n\n"
+
+def entry(number, timestamp="2025-05-01 10:00", summary=None):
+    return {
+        "number": number,
+        "timestamp": timestamp,
+        "action_type": "Implementation",
+        "summary": summary or f"Answer {number}",
+        "previous_state": "before",
+        "current_state": "after",
+        "changes_made": [f"change {number}"],
+        "files_affected": [{"file": f"src/{number}.py", "operation": "ADDED",
+                            "description": "new", "impact": "LOW"}],
+        "technical_decisions": [],
+        "next_actions": []
+    }
+
+@pytest.fixture
+def store(tmp_path):
+    store = ChangelogStore(tmp_path / "Changelog.md", render_interval=1, default_header=HEADER)
+    for number in (1, 2):
+        store.append(entry(number))
+    return store
+
+def test_hand_added_answer_is_adopted(store, tmp_path):
+    path = tmp_path / "Changelog.md"
+    text = path.read_text()
+    added = "### Answer #003 - Fixed by hand\n**Timestamp:** 2025-05-01 11:00\n\nnotes\n\n---\n"
+    path.write_text(text.replace(HEADER, HEADER + added) + "Footer note\n")
+
+    reopened = ChangelogStore(path, render_interval=1)
+    assert reopened.last_number() == 3
+    assert reopened.get(3)["markdown"] == added
+    reopened.append(entry(4))
+    text = path.read_text()
+    assert text.index("Answer #004") < text.index("Fixed by hand") < text.index("Answer #002")
+    assert text.endswith("Footer note\n")
+    assert reopened.verify()
+
+def test_hand_added_answer_in_a_migrated_changelog_is_adopted(tmp_path):
+    path = tmp_path / "Changelog.md"
+    legacy = "".join(f"### Answer #{number:03d} - Legacy {number}\n**Timestamp:** 2025-04-0{number} 10:00\n"
+                     f"\nnotes\n\n---\n\n" for number in (1, 2))
+    path.write_text(HEADER + legacy + "Footer note\n")
+    store = ChangelogStore(path, render_interval=1)
+    store.append(entry(3))
+    added = "### Answer #004 - Fixed by hand\n**Timestamp:** 2025-05-01 11:00\n\nnotes\n\n---\n"
+    path.write_text(path.read_text().replace(HEADER, HEADER + added))
+
+    store.append(entry(5))
+    assert store.conflicts == []
+    assert [record["number"] for record in store.entries()] == [1, 2, 3, 4, 5]
+    text = path.read_text()
+    assert text.index("Answer #005") < text.index("Fixed by hand") < text.index("Legacy 1")
+    assert text.endswith("Footer note\n") and store.verify()
+
+def test_edited_stored_answer_blocks_render(store, tmp_path):
+    path = tmp_path / "Changelog.md"
+    path.write_text(path.read_text().replace("change 1", "changed by hand"))
+
+    with pytest.raises(ChangelogConflictError, match="#001"):
+        store.append(entry(3))
+    assert "changed by hand" in path.read_text()
+    assert store.get(3) is None and store.last_number() == 2 and not store.verify()
+
+    assert store.render(force=True)
+    assert "changed by hand" not in path.read_text() and store.verify()
+
+def test_removed_stored_answer_blocks_render(store, tmp_path):
+    path = tmp_path / "Changelog.md"
+    text = path.read_text()
+    start = text.index("### Answer #001")
+    path.write_text(text[:start])
+
+    reopened = ChangelogStore(path, render_interval=1)
+    assert reopened.conflicts == [1]
+    with pytest.raises(ChangelogConflictError):
+        reopened.render()
+
+def test_torn_line_is_dropped_and_index_caught_up(store, tmp_path):
+    store.append(entry(3))
+    with open(store.active_path, "ab") as f:
+        f.write(b'{"number": 4, "timest')
+    index_path = store.directory / "index.bin"
+    index_path.write_bytes(index_path.read_bytes()[:-store.index.RECORD.size - 3])
+
+    reopened = ChangelogStore(tmp_path / "Changelog.md")
+    assert reopened.last_number() == 3 and reopened.verify()
+    assert reopened.get(3)["summary"] == "Answer 3"
+    reopened.append(entry(4))
+    assert [record["number"] for record in reopened.entries()] == [1, 2, 3, 4]
+
+def test_missing_index_is_rebuilt(store, tmp_path):
+    (store.directory / "index.bin").unlink()
+
+    reopened = ChangelogStore(tmp_path / "Changelog.md")
+    assert len(reopened.index) == 2
+    assert reopened.get(1)["summary"] == "Answer 1" and reopened.verify()
+
+@pytest.mark.parametrize("compression", ["gzip", "xz", None])
+def test_rotation_archives_segments(tmp_path, compression):
+    store = ChangelogStore(tmp_path / "Changelog.md", render_interval=100, default_header=HEADER,
+                           max_segment_entries=2, compression=compression, view_segments=2)
+    for number in range(1, 6):
+        store.append(entry(number))
+    store.render()
+
+    segments = store.segments()
+    assert [(s["id"], s.get("first"), s.get("last")) for s in segments] == [(1, 1, 2), (2, 3, 4), (3, 5, 5)]
+    assert segments[0]["compression"] == compression
+    assert store.get(1)["summary"] == "Answer 1" and store.verify()
+    text = (tmp_path / "Changelog.md").read_text()
+    assert "Answer #005" in text and "Answer #003" in text and "Answer #001" not in text
+    assert "Answers #001-#002 are archived" in text
+
+    reopened = ChangelogStore(tmp_path / "Changelog.md", max_segment_entries=2, compression=compression)
+    assert [record["number"] for record in reopened.entries(newest_first=True)] == [5, 4, 3, 2, 1]
+    export = tmp_path / "full.md"
+    assert reopened.export(export) == 5
+    assert "Answer #001" in export.read_text()
+
+def test_new_session_starts_a_segment(tmp_path):
+    store = ChangelogStore(tmp_path / "Changelog.md", render_interval=100)
+    store.append(entry(1, "2025-05-01 10:00"))
+    store.append(entry(2, "2025-05-01 18:00"))
+    store.append(entry(3, "2025-05-02 09:00"))
+
+    assert [s["session"] for s in store.segments()[:-1]] == ["2025-05-01"]
+    assert store.segments()[-1]["first"] == 3
+
+def test_interrupted_rotation_is_finished_on_open(tmp_path):
+    store = ChangelogStore(tmp_path / "Changelog.md", render_interval=100, max_segment_entries=2)
+    for number in range(1, 4):
+        store.append(entry(number))
+    # Crash after the manifest was written but before the old segment was removed
+    with store._open_segment(1) as f:
+        (store.segments_dir / "000001.jsonl").write_bytes(f.read())
+
+    reopened = ChangelogStore(tmp_path / "Changelog.md", max_segment_entries=2)
+    assert not (reopened.segments_dir / "000001.jsonl").exists()
+    assert [record["number"] for record in reopened.entries()] == [1, 2, 3] and reopened.verify()
+
+def test_exports_round_trip_stored_entries(tmp_path):
+    store = ChangelogStore(tmp_path / "Changelog.md", default_header=HEADER)
+    stored = [entry(number, summary=f"Answer {number} <b>&</b>") for number in (1, 2, 3)]
+    for record in stored:
+        store.append(record)
+
+    assert store.export(tmp_path / "out.jsonl", "jsonl") == 3
+    lines = (tmp_path / "out.jsonl").read_text().splitlines()
+    assert [json.loads(line) for line in lines] == stored[::-1]
+
+    assert store.export(tmp_path / "out.html", "html", newest_first=False) == 3
+    page = (tmp_path / "out.html").read_text()
+    positions = [page.index(f'id="answer-{number}"') for number in (1, 2, 3)]
+    assert positions == sorted(positions)
+    assert "Answer 1 &lt;b&gt;&amp;&lt;/b&gt;" in page and "<b>&</b>" not in page
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+State Cache Tests
+"""
+
+import os
+import time
+import pytest
+from workspace_scanner import WorkspaceScanner
+from state_cache import (CacheFormatError, CacheStore, encode_state, open_state_mapped,
+                         read_state_binary, read_state_header, write_state_binary)
+
+@pytest.fixture
+def state(tmp_path):
+    root = tmp_path / "ws"
+    (root / "src" / "deep").mkdir(parents=True)
+    (root / "src" / "app.py").write_text("print('app')\n")
+    (root / "src" / "deep" / "naïve.txt").write_text("text\n")
+    (root / "README.md").write_text("# readme\n")
+    return WorkspaceScanner(str(root)).scan_workspace()
+
+def test_binary_round_trip(state, tmp_path):
+    path = tmp_path / "state.bin"
+    assert write_state_binary(state, path) == path.stat().st_size
+
+    assert read_state_binary(path) == state
+    header = read_state_header(path)
+    assert (header["state_hash"], header["total_files"]) == (state.state_hash, state.total_files)
+
+def test_mapped_state_decodes_on_access(state, tmp_path):
+    path = tmp_path / "state.bin"
+    write_state_binary(state, path)
+
+    with open_state_mapped(path) as mapped:
+        assert mapped.files["src/app.py"] == state.files["src/app.py"]
+        assert "missing.py" not in mapped.files
+        assert sorted(mapped.files) == sorted(state.files)
+        assert set(mapped.directories) == state.directories
+        assert dict(mapped.dir_hashes) == state.dir_hashes
+        assert mapped.materialize() == state
+
+@pytest.mark.parametrize("keep", [0.99, 0.5, 20, 5])
+def test_truncated_cache_is_rejected(state, tmp_path, keep):
+    data = encode_state(state)
+    path = tmp_path / "state.bin"
+    path.write_bytes(data[:int(len(data) * keep) if keep < 1 else keep])
+
+    with pytest.raises(CacheFormatError):
+        read_state_binary(path)
+    with pytest.raises(CacheFormatError):
+        open_state_mapped(path)
+
+def test_cache_store_expires_then_evicts_least_recently_used(tmp_path):
+    store = CacheStore(tmp_path / "cache", max_size=250, ttl=60)
+    now = time.time()
+    for name, used in (("a", now - 30), ("b", now - 20)):
+        store.write(name, "bin", b"x" * 100)
+        os.utime(store.path(name, "bin"), (used, now))
+    assert store.lookup("a", "bin") is not None
+
+    store.write("c", "bin", b"x" * 100)
+    assert sorted(name for name, _, _ in store.entries()) == ["a", "c"]
+
+    os.utime(store.path("a", "bin"), (now, now - 120))
+    assert store.lookup("a", "bin") is None
+    assert store.evict() == 1
+    assert [name for name, _, _ in store.entries()] == ["c"]
+    assert (store.stats["evictions"], store.stats["expirations"]) == (1, 1)
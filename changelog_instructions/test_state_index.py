@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+State Index Tests
+"""
+
+
+from state_manager import StateManager
+
+def test_index_answers_queries_after_a_rebuild(tmp_path, monkeypatch):
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "app.py").write_text("print('app')\n")
+    monkeypatch.chdir(tmp_path)
+    manager = StateManager(index_backend="sqlite")
+    manager.get_current_state()
+    manager.mark_answer(1)
+    (tmp_path / "src" / "big.py").write_text("x = 1\n" * 100)
+    (tmp_path / "notes.md").write_text("notes\n")
+    state = manager.get_current_state(force_refresh=True)
+    assert manager.index.files_changed_since_answer(1, "python") == ["src/big.py"]
+    manager.index.close()
+
+    # A lost database is rebuilt from the journal on the next start
+    for path in (tmp_path / ".workspace_cache").glob("state_index.db*"):
+        path.unlink()
+    rebuilt = StateManager(index_backend="sqlite")
+    rebuilt.get_current_state()
+    try:
+        assert rebuilt.index.seq == rebuilt.journal.head_seq
+        assert [f.path for f in rebuilt.index.largest_files(1)] == ["src/big.py"]
+        assert [f.path for f in rebuilt.index.files_by_type("python")] == ["src/app.py", "src/big.py"]
+        assert rebuilt.index.files_with_hash(state.files["src/app.py"].hash) == [state.files["src/app.py"]]
+        assert rebuilt.index.type_totals()["python"]["files"] == 2
+    finally:
+        rebuilt.index.close()
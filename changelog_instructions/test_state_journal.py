@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+State Journal Tests
+"""
+
+import pytest
+from workspace_scanner import WorkspaceScanner
+from state_journal import StateJournal, diff_files
+
+@pytest.fixture
+def workspace(tmp_path):
+    root = tmp_path / "ws"
+    (root / "src").mkdir(parents=True)
+    (root / "src" / "app.py").write_text("print('app')\n")
+    return root
+
+def record_steps(journal, root, steps):
+    """Journal a scan after each of steps edits; returns {seq: state}"""
+    scanner = WorkspaceScanner(str(root))
+    state = scanner.scan_workspace()
+    states = {journal.append(state): state}
+    for step in range(steps):
+        (root / "src" / f"m{step}.py").write_text(f"x = {step}\n")
+        if step % 3 == 2:
+            (root / "src" / f"m{step - 1}.py").unlink()
+        if step == 4:
+            (root / "docs").mkdir()
+            (root / "docs" / "a.md").write_text("a\n")
+        fresh = scanner.scan_workspace(previous_state=state)
+        states[journal.append(fresh, diff_files(fresh, state))] = fresh
+        state = fresh
+    return states
+
+def test_replay_rebuilds_every_state(workspace, tmp_path):
+    journal = StateJournal(tmp_path / "journal", checkpoint_interval=3, keep_checkpoints=None)
+    states = record_steps(journal, workspace, 8)
+
+    assert len(journal.checkpoints()) > 1
+    for seq, state in states.items():
+        assert journal.state_at(seq) == state
+    previous, current = journal.latest_pair()
+    assert (previous, current) == (states[journal.head_seq - 1], states[journal.head_seq])
+    assert [seq for seq, _, _ in journal.history()] == sorted(states)
+
+def test_torn_tail_is_dropped_on_reopen(workspace, tmp_path):
+    journal = StateJournal(tmp_path / "journal", checkpoint_interval=50)
+    states = record_steps(journal, workspace, 3)
+    segment = journal._segment_path(journal.checkpoints()[-1])
+    with open(segment, "ab") as f:
+        f.write(b'{"seq": 99, "timest')
+
+    reopened = StateJournal(tmp_path / "journal", checkpoint_interval=50)
+    assert reopened.head_seq == max(states)
+    (workspace / "src" / "late.py").write_text("late\n")
+    head = states[reopened.head_seq]
+    fresh = WorkspaceScanner(str(workspace)).scan_workspace(previous_state=head)
+    seq = reopened.append(fresh, diff_files(fresh, head))
+
+    assert StateJournal(tmp_path / "journal").state_at(seq) == fresh
+
+def test_checkpoints_prune_old_history(workspace, tmp_path):
+    journal = StateJournal(tmp_path / "journal", checkpoint_interval=2, keep_checkpoints=2)
+    states = record_steps(journal, workspace, 9)
+
+    checkpoints = journal.checkpoints()
+    assert len(checkpoints) == 2
+    assert {int(path.stem) for path in journal.directory.iterdir()} == set(checkpoints)
+    assert journal.state_at(1) is None
+    assert journal.state_at(checkpoints[0]) == states[checkpoints[0]]
+    assert journal.state_at() == states[journal.head_seq]
+
+def test_two_writers_share_one_sequence(workspace, tmp_path):
+    writers = [StateJournal(tmp_path / "journal", keep_checkpoints=None) for _ in range(2)]
+    scanner = WorkspaceScanner(str(workspace))
+    state = scanner.scan_workspace()
+    states = {writers[0].append(state): state}
+    for step, writer in enumerate([1, 1, 0, 0, 1]):
+        (workspace / "src" / f"m{step}.py").write_text(f"x = {step}\n")
+        fresh = scanner.scan_workspace(previous_state=state)
+        states[writers[writer].append(fresh, diff_files(fresh, state))] = fresh
+        state = fresh
+
+    reader = StateJournal(tmp_path / "journal")
+    assert [seq for seq, _, _ in reader.history()] == sorted(states) == list(range(1, 7))
+    for seq, recorded in states.items():
+        assert reader.state_at(seq) == recorded
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+State Manager Tests
+"""
+
+import pytest
+import state_manager
+from state_cache import MappedWorkspaceState
+from state_journal import StateHistoryError
+from state_manager import ImpactClassifier, StateManager
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "app.py").write_text("print('app')\n")
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+def test_repeated_refresh_keeps_pending_changes(workspace):
+    manager = StateManager()
+    manager.get_current_state()
+    (workspace / "src" / "new.py").write_text("print('new')\n")
+
+    # The second call misses again (new.py changed too recently to be trusted)
+    # but finds nothing new; it must not replace previous_state
+    manager.get_current_state()
+    head = manager.journal.head_seq
+    manager.get_current_state()
+
+    assert manager.journal.head_seq == head
+    assert [(e.change_type, e.file_path) for e in manager.detect_changes()] == [("ADDED", "src/new.py")]
+    assert manager.summarize_changes()["total_changes"] == 1
+
+def test_journal_counts_against_cache_bound(workspace):
+    manager = StateManager()
+    manager.get_current_state()
+    manager.max_cache_size = manager.journal.size_bytes()
+    manager.save_snapshot("first")
+    manager.save_snapshot("second")
+
+    assert list(manager.list_snapshots()) == ["second"]
+    manager.get_metrics()
+    assert manager.metrics.cache_size > manager.journal.size_bytes()
+
+def test_cold_start_maps_head_checkpoint(workspace):
+    manager = StateManager()
+    manager.get_current_state()
+    (workspace / "src" / "new.py").write_text("print('new')\n")
+    manager.journal.checkpoint_interval = 0
+    manager.get_current_state(force_refresh=True)
+    assert manager.journal.head_checkpoint_path() is not None
+
+    reopened = StateManager()
+    state = reopened.get_current_state()
+    assert isinstance(state, MappedWorkspaceState)
+    assert state.state_hash == manager.current_state.state_hash
+    assert reopened._previous_seq == manager.journal.head_seq - 1
+    assert [(e.change_type, e.file_path) for e in reopened.detect_changes()] == [("ADDED", "src/new.py")]
+
+def test_changes_since_pruned_state_raise(workspace):
+    manager = StateManager()
+    manager.get_current_state()
+    first = manager.journal.head_seq
+    since = manager.current_state.timestamp
+    (workspace / "src" / "new.py").write_text("print('new')\n")
+    assert [e.file_path for e in manager.detect_changes(since=first)] == ["src/new.py"]
+
+    manager.journal.keep_checkpoints = 1
+    manager.journal.checkpoint(manager.get_current_state())
+    for point in (first, since, "2000-01-01T00:00:00"):
+        with pytest.raises(StateHistoryError, match="history starts at #"):
+            manager.detect_changes(since=point)
+    with pytest.raises(ValueError):
+        manager.summarize_changes(since=first)
+
+def test_added_copy_reports_duplicate_of(workspace):
+    manager = StateManager()
+    manager.get_current_state()
+    (workspace / "src" / "copy.py").write_text("print('app')\n")
+
+    events = manager.detect_changes()
+
+    assert [(e.change_type, e.details.get("duplicate_of")) for e in events] == [("ADDED", "src/app.py")]
+    assert [e.details.get("duplicate_of") for e in manager.iter_changes()] == ["src/app.py"]
+
+@pytest.mark.parametrize("use_numpy", [False, True])
+def test_classify_many_matches_classify(monkeypatch, use_numpy):
+    if use_numpy:
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(state_manager, "np", None)
+    classifier = ImpactClassifier()
+    sample = ["Changelog.md", "src/app.py", "docs/guide.md", "logs/run.log", "tmp/x.tmp",
+              "temp/data.bin", "README", "pkg/__init__.py", "cache/run.cache.py", "NOTES.LOG"]
+    paths = sample * (ImpactClassifier.NUMPY_MIN_BATCH // len(sample) + 1)
+
+    assert classifier.classify_many(paths) == [classifier.classify(path) for path in paths]
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Workspace Scanner Tests
+"""
+
+import os
+import time
+import json
+import random
+import pytest
+from pathlib import Path
+from dataclasses import replace
+from workspace_scanner import (HASH_ALGORITHMS, HASH_READ_MODES, READ_BUFFER_SIZE,
+                               SAMPLE_BLOCK_SIZE, FileState, FileStateTable, IgnoreMatcher,
+                               WorkspaceScanner, hash_file_content)
+
+@pytest.mark.parametrize("path, is_dir, ignored", [
+    ("debug.log", False, True),
+    ("sub/debug.log", False, True),
+    ("keep.log", False, False),
+    ("sub/keep.log", False, False),
+    ("build", True, True),
+    ("sub/build", True, False),
+    ("out", True, True),
+    ("out", False, False),
+    ("docs/c.tmp", False, True),
+    ("docs/a/b/c.tmp", False, True),
+    ("other/docs/c.tmp", False, False),
+    ("abc.txt", False, True),
+    ("ab/c.txt", False, False),
+])
+def test_matcher_rules(path, is_dir, ignored):
+    matcher = IgnoreMatcher({"*.log", "!keep.log", "/build", "out/", "docs/**/*.tmp", "a?c.txt"})
+    assert matcher.is_ignored(path, is_dir) is ignored
+
+def test_nested_gitignore_applies_to_its_subtree(tmp_path):
+    (tmp_path / ".gitignore").write_text("*.tmp\n/generated/\n")
+    (tmp_path / "pkg" / "generated").mkdir(parents=True)
+    (tmp_path / "pkg" / ".gitignore").write_text("!keep.tmp\n/local.txt\n")
+    files = ["a.tmp", "pkg/b.tmp", "pkg/keep.tmp", "pkg/local.txt", "pkg/generated/x.py",
+             "keep.tmp", "local.txt", "generated/y.py"]
+    for name in files:
+        (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / name).write_text(name)
+
+    state = WorkspaceScanner(str(tmp_path)).scan_workspace()
+
+    tracked = set(state.files) - {".gitignore", "pkg/.gitignore"}
+    assert tracked == {"pkg/keep.tmp", "pkg/generated/x.py", "local.txt"}
+
+def test_sampled_file_edit_between_blocks_is_a_change(tmp_path):
+    big = tmp_path / "big.bin"
+    big.write_bytes(bytes(64 * SAMPLE_BLOCK_SIZE))
+    past = time.time_ns() - 100 * 10**9
+    os.utime(big, ns=(past, past))
+    scanner = WorkspaceScanner(str(tmp_path))
+    scanner.max_file_size = SAMPLE_BLOCK_SIZE
+    before = scanner.scan_workspace()
+    assert before.files["big.bin"].sampled
+
+    with open(big, "r+b") as f:
+        f.seek(SAMPLE_BLOCK_SIZE + 10)  # between the first two sampled blocks
+        f.write(b"x")
+    os.utime(big, ns=(past + 10**9, past + 10**9))
+    after = scanner.scan_workspace(previous_state=before)
+
+    assert after.state_hash != before.state_hash
+    assert [change["path"] for change in scanner.compare_states(before, after)["modified"]] == ["big.bin"]
+
+def test_sampled_copies_share_a_fingerprint_and_moves_are_paired(tmp_path):
+    data = os.urandom(64 * SAMPLE_BLOCK_SIZE)
+    (tmp_path / "big.bin").write_bytes(data)
+    (tmp_path / "copy.bin").write_bytes(data)
+    scanner = WorkspaceScanner(str(tmp_path))
+    scanner.max_file_size = SAMPLE_BLOCK_SIZE
+    before = scanner.scan_workspace()
+    assert before.files["big.bin"].sampled
+    assert before.files["big.bin"].hash == before.files["copy.bin"].hash
+
+    (tmp_path / "big.bin").rename(tmp_path / "moved.bin")
+    changes = scanner.compare_states(before, scanner.scan_workspace(previous_state=before))
+
+    assert [(move["from"], move["to"]) for move in changes["moved"]] == [("big.bin", "moved.bin")]
+    assert changes["added"] == changes["removed"] == changes["modified"] == []
+
+def aged(root):
+    """Backdate every file so scans record (and trust) its stat data"""
+    past = time.time_ns() - 100 * 10**9
+    for path in root.rglob("*"):
+        os.utime(path, ns=(past, past))
+
+def test_file_state_table_matches_a_dict(monkeypatch):
+    monkeypatch.setattr(FileStateTable, "COMPACT_MIN", 8)
+    rng = random.Random(13)
+    names = [f"dir{i % 7}/file_{i}.py" for i in range(300)] + ["é.md", "z/\udcff.bin", "Ω/x"]
+    table, expected = FileStateTable(), {}
+    for step in range(3000):
+        path = rng.choice(names)
+        if path in expected and rng.random() < 0.4:
+            del table[path]
+            del expected[path]
+        else:
+            file_hash = rng.choice([os.urandom(16).hex(), "error"])
+            expected[path] = FileState(path, step, step / 3, file_hash, rng.choice(["python", "other"]),
+                                       step * 1000, step, rng.random() < 0.1)
+            table[path] = expected[path]
+        if step % 500 == 0:
+            table = table.copy()
+
+    assert len(table) == len(expected) and sorted(table) == sorted(expected)
+    assert dict(table.items()) == expected and table == expected
+    assert all(table.file_hash(path) == state.hash for path, state in expected.items())
+    assert "missing.py" not in table and table.get("missing.py") is None and None not in table
+    table.compact()
+    assert list(table) == sorted(expected) and dict(table.items()) == expected
+
+def test_revalidate_lists_changed_directories(tmp_path):
+    (tmp_path / ".gitignore").write_text("*.out\n")
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "a.py").write_text("a\n")
+    aged(tmp_path)
+    scanner = WorkspaceScanner(str(tmp_path))
+    state = scanner.scan_workspace()
+    assert scanner.revalidate(state)
+
+    # Ignored output replaced through a temporary file changes only the root's mtime
+    (tmp_path / "report.out.tmp").write_text("report\n")
+    os.replace(tmp_path / "report.out.tmp", tmp_path / "report.out")
+    assert scanner.revalidate(state)
+
+    (tmp_path / "src" / "a.py").rename(tmp_path / "src" / "b.py")
+    assert not scanner.revalidate(state)
+    (tmp_path / "src" / "b.py").rename(tmp_path / "src" / "a.py")
+    (tmp_path / "src" / "c.py").write_text("c\n")
+    assert not scanner.revalidate(state)
+
+def test_rescan_reuses_hashes_of_unchanged_files(tmp_path):
+    (tmp_path / "a.py").write_text("a = 1\n")
+    (tmp_path / "b.py").write_text("b = 1\n")
+    scanner = WorkspaceScanner(str(tmp_path))
+    first = scanner.scan_workspace()
+    (tmp_path / "b.py").write_text("b = 22\n")
+
+    second = scanner.scan_workspace(previous_state=first)
+    assert (scanner.last_scan_stats["hashed"], scanner.last_scan_stats["reused"]) == (1, 1)
+    assert second.files["a.py"].hash == first.files["a.py"].hash
+    assert second.files["b.py"].hash != first.files["b.py"].hash
+
+    scanner.scan_workspace(previous_state=second, force_rehash=True)
+    assert (scanner.last_scan_stats["hashed"], scanner.last_scan_stats["reused"]) == (2, 0)
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_pooled_hashing_matches_a_serial_scan(tmp_path, executor):
+    for index in range(24):
+        path = tmp_path / f"dir{index % 3}" / f"file{index}.txt"
+        path.parent.mkdir(exist_ok=True)
+        path.write_bytes(bytes([index]) * (index * 1000 + 1))
+    serial = WorkspaceScanner(str(tmp_path), hash_workers=1).scan_workspace()
+
+    pooled = WorkspaceScanner(str(tmp_path), hash_workers=4, hash_executor=executor).scan_workspace()
+
+    assert pooled.files == serial.files
+    assert pooled.state_hash == serial.state_hash
+
+def test_scandir_walk_matches_an_os_walk_listing(tmp_path):
+    for rel in ("a.py", "src/b.py", "src/deep/c.txt", "node_modules/pkg/x.js",
+                "src/__pycache__/b.pyc", "d.pyc"):
+        (tmp_path / rel).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / rel).write_text(rel)
+    (tmp_path / "empty").mkdir()
+    scanner = WorkspaceScanner(str(tmp_path))
+
+    # The listing the scanner produced with os.walk and should_ignore
+    files, directories = set(), set()
+    for root, dirs, names in os.walk(tmp_path):
+        rel_root = os.path.relpath(root, tmp_path)
+        if rel_root != ".":
+            directories.add(rel_root)
+        relative = [(name, name if rel_root == "." else os.path.join(rel_root, name)) for name in names]
+        files.update(rel for _, rel in relative if not scanner.should_ignore(Path(rel)))
+        dirs[:] = [d for d in dirs
+                   if not scanner.should_ignore(Path(d if rel_root == "." else os.path.join(rel_root, d)))]
+
+    state = scanner.scan_workspace()
+    assert set(state.files) == files == {"a.py", "src/b.py", "src/deep/c.txt"}
+    assert state.directories == directories
+
+@pytest.mark.parametrize("algorithm", HASH_ALGORITHMS)
+def test_read_modes_agree(tmp_path, algorithm):
+    path = tmp_path / "data.bin"
+    path.write_bytes(os.urandom(READ_BUFFER_SIZE * 3 // 2))
+
+    digests = {hash_file_content(path, algorithm, mode) for mode in HASH_READ_MODES}
+    assert len(digests) == 1 and "error" not in digests
+
+def test_states_from_different_algorithms_are_not_mixed(tmp_path):
+    root = tmp_path / "ws"
+    root.mkdir()
+    (root / "a.py").write_text("a = 1\n")
+    config = tmp_path / "config.ini"
+    config.write_text("[WORKSPACE]\nhash_algorithm = sha256\n")
+    legacy = WorkspaceScanner(str(root), config_path=str(config)).scan_workspace()
+    scanner = WorkspaceScanner(str(root), config_path=str(tmp_path / "missing.ini"))
+
+    current = scanner.scan_workspace(previous_state=legacy)
+    assert scanner.last_scan_stats["reused"] == 0
+    assert current.hash_algorithm != legacy.hash_algorithm
+    with pytest.raises(ValueError):
+        scanner.compare_states(legacy, current)
+
+def edit_tree(root):
+    """Scan a small tree, then add, edit, remove and move files; returns (scanner, old, new)"""
+    for rel in ("src/keep.py", "src/edit.py", "src/gone.py", "old/moved.txt", "docs/guide.md"):
+        (root / rel).parent.mkdir(parents=True, exist_ok=True)
+        (root / rel).write_text(f"{rel}\n")
+    scanner = WorkspaceScanner(str(root))
+    old = scanner.scan_workspace()
+    (root / "src" / "edit.py").write_text("edited = True\n")
+    (root / "src" / "gone.py").unlink()
+    (root / "new").mkdir()
+    (root / "old" / "moved.txt").rename(root / "new" / "moved.txt")
+    (root / "src" / "added.py").write_text("added = True\n")
+    return scanner, old, scanner.scan_workspace(previous_state=old)
+
+def normalized(changes):
+    return {kind: sorted(json.dumps(entry, sort_keys=True) for entry in entries)
+            for kind, entries in changes.items()}
+
+def test_tree_diff_matches_a_flat_compare(tmp_path):
+    scanner, old, new = edit_tree(tmp_path)
+    assert old.dir_hashes["docs"] == new.dir_hashes["docs"]
+
+    tree = scanner.compare_states(old, new)
+    flat = scanner.compare_states(replace(old, dir_hashes={}), replace(new, dir_hashes={}))
+
+    assert normalized(tree) == normalized(flat)
+    assert tree["added"] and tree["removed"] and tree["modified"]
+
+def test_iter_changes_streams_the_compare_states_diff(tmp_path):
+    scanner, old, new = edit_tree(tmp_path)
+    expected = scanner.compare_states(old, new)
+    assert expected["moved"]
+
+    streamed = {kind: [] for kind in expected}
+    for kind, entry in scanner.iter_changes(old, new):
+        streamed[kind].append(entry)
+    assert normalized(streamed) == normalized(expected)
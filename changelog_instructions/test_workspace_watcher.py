@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Workspace Watcher Tests
+"""
+
+import time
+import pytest
+from workspace_scanner import WorkspaceScanner
+from workspace_watcher import WorkspaceWatcher
+
+def test_full_rescan_reports_moved_paths(tmp_path):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "a" / "1.txt").write_text("one")
+    watcher = WorkspaceWatcher(WorkspaceScanner(str(tmp_path)))
+    try:
+        watcher.start()
+    except OSError:
+        pytest.skip("inotify unavailable")
+    try:
+        watcher.drain_changes()
+        (tmp_path / "a").rename(tmp_path / "b")
+        changed = watcher._full_rescan()
+    finally:
+        watcher.stop()
+
+    assert set(changed) == {"a/1.txt", "b/1.txt"}
+    assert changed["a/1.txt"].hash and changed["b/1.txt"] is None
+
+def test_events_keep_the_state_equal_to_a_rescan(tmp_path):
+    for name in ("keep.txt", "edit.txt", "gone.txt"):
+        (tmp_path / name).write_text(name)
+    scanner = WorkspaceScanner(str(tmp_path))
+    watcher = WorkspaceWatcher(scanner)
+    try:
+        watcher.start()
+    except OSError:
+        pytest.skip("inotify unavailable")
+    try:
+        (tmp_path / "edit.txt").write_text("edited text")
+        (tmp_path / "gone.txt").unlink()
+        (tmp_path / "new").mkdir()
+        (tmp_path / "new" / "added.txt").write_text("added")
+        expected = WorkspaceScanner(str(tmp_path)).scan_workspace()
+        changed = {}
+        deadline = time.monotonic() + 5
+        while watcher.state.files != expected.files and time.monotonic() < deadline:
+            time.sleep(0.05)
+            changed.update(watcher.drain_changes())
+    finally:
+        watcher.stop()
+
+    assert watcher.state.files == expected.files
+    assert watcher.state.directories == expected.directories
+    assert watcher.state.state_hash == expected.state_hash
+    assert set(changed) == {"edit.txt", "gone.txt", "new/added.txt"}
+    assert changed["new/added.txt"] is None and changed["gone.txt"].path == "gone.txt"
@@ -12,7 +12,6 @@ from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass, asdict
 
 from workspace_scanner import WorkspaceScanner
-from state_manager import StateManager
 from changelog_engine import ChangelogEngine
 
 @dataclass
@@ -33,8 +32,8 @@ class SystemHealth:
 class ValidationSuite:
     def __init__(self):
         self.scanner = WorkspaceScanner()
-        self.state_manager = StateManager()
         self.changelog_engine = ChangelogEngine()
+        self.state_manager = self.changelog_engine.state_manager
         
         # Performance thresholds
         self.performance_thresholds = {
@@ -10,12 +10,11 @@ from pathlib import Path
 from typing import Dict, Optional, Callable
 from functools import wraps
 from changelog_engine import ChangelogEngine
-from state_manager import StateManager
 
 class WindsurfIntegration:
     def __init__(self):
         self.changelog_engine = ChangelogEngine()
-        self.state_manager = StateManager()
+        self.state_manager = self.changelog_engine.state_manager
         self.session_active = False
         self.mandatory_protocol_enabled = True
         
@@ -5,119 +5,907 @@ Real-time filesystem analysis with performance optimization
 """
 
 import os
+import re
+import time
+import mmap
+import zlib
 import hashlib
+import itertools
 import json
+import configparser
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import ItemsView, MutableMapping, ValuesView
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
-from typing import Dict, List, Set, Tuple
-from dataclasses import dataclass, asdict
+from stat import S_ISDIR
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from dataclasses import dataclass, asdict, field
 from datetime import datetime
 
+HASH_ALGORITHMS = ("sha256", "blake2b", "crc32")
+HASH_READ_MODES = ("buffered", "mmap", "file_digest")
+READ_BUFFER_SIZE = 1024 * 1024
+SAMPLE_BLOCK_SIZE = 64 * 1024
+
+class _ZlibChecksum:
+    """Fast non-cryptographic fingerprint: CRC-32 and Adler-32 side by side"""
+
+    def __init__(self):
+        self.crc = 0
+        self.adler = 1
+
+    def update(self, data):
+        self.crc = zlib.crc32(data, self.crc)
+        self.adler = zlib.adler32(data, self.adler)
+
+    def hexdigest(self) -> str:
+        return f"{self.crc:08x}{self.adler:08x}"
+
+def _new_hasher(algorithm: str):
+    if algorithm == "blake2b":
+        return hashlib.blake2b(digest_size=16)
+    if algorithm == "crc32":
+        return _ZlibChecksum()
+    return hashlib.sha256()
+
+def _finish_digest(hasher, algorithm: str) -> str:
+    # Legacy sha256 fingerprints were truncated; keep them comparable with old caches
+    return hasher.hexdigest()[:16] if algorithm == "sha256" else hasher.hexdigest()
+
+def hash_file_content(file_path, algorithm: str = "sha256", read_mode: str = "buffered") -> str:
+    """Fingerprint file content with algorithm and read_mode (module level so process pools can pickle it)"""
+    try:
+        hasher = _new_hasher(algorithm)
+        with open(file_path, "rb") as f:
+            if read_mode == "file_digest" and algorithm != "crc32" and hasattr(hashlib, "file_digest"):
+                return _finish_digest(hashlib.file_digest(f, lambda: _new_hasher(algorithm)), algorithm)
+            if read_mode == "mmap":
+                size = os.fstat(f.fileno()).st_size
+                if size:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                        hasher.update(mapped)
+                return _finish_digest(hasher, algorithm)
+            buffer = bytearray(READ_BUFFER_SIZE)
+            view = memoryview(buffer)
+            while True:
+                read = f.readinto(buffer)
+                if not read:
+                    break
+                hasher.update(view[:read])
+        return _finish_digest(hasher, algorithm)
+    except (OSError, IOError, ValueError):
+        return "error"
+
+def hash_file_sample(file_path, algorithm: str = "sha256", blocks: int = 16,
+                     block_size: int = SAMPLE_BLOCK_SIZE) -> str:
+    """Fingerprint a large file from its size, head, tail and evenly spaced blocks"""
+    # Content only, so copies and moves keep their fingerprint; an edit between
+    # blocks is caught by size/mtime_ns instead (see WorkspaceScanner._content_changed)
+    try:
+        hasher = _new_hasher(algorithm)
+        with open(file_path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            hasher.update(f"{size}:".encode())
+            span = max(size - block_size, 0)
+            offsets = {0, span}
+            offsets.update(span * i // (blocks + 1) for i in range(1, blocks + 1))
+            for offset in sorted(offsets):
+                f.seek(offset)
+                hasher.update(f.read(block_size))
+        return _finish_digest(hasher, algorithm)
+    except (OSError, IOError):
+        return "error"
+
+def fingerprint_file(file_path, size: int = -1, algorithm: str = "sha256",
+                     read_mode: str = "buffered", max_file_size: int = 0,
+                     sample_blocks: int = 16, deadline: float = 0) -> Tuple[str, bool]:
+    """Return (fingerprint, sampled), sampling files over max_file_size or past the deadline (0 = no limit)"""
+    if size < 0:
+        try:
+            size = os.stat(file_path).st_size
+        except OSError:
+            return "error", False
+    if (max_file_size and size > max_file_size) or (deadline and time.time() > deadline):
+        return hash_file_sample(file_path, algorithm, sample_blocks), True
+    return hash_file_content(file_path, algorithm, read_mode), False
+
+def _config_flag(value: str) -> bool:
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+def load_workspace_config(config_path: str = "config.ini") -> Dict[str, str]:
+    """Read the [WORKSPACE] section of config.ini, empty if unavailable"""
+    parser = configparser.ConfigParser(inline_comment_prefixes=("#",))
+    try:
+        parser.read(config_path)
+    except configparser.Error:
+        return {}
+    return dict(parser["WORKSPACE"]) if parser.has_section("WORKSPACE") else {}
+
+def _translate_gitignore_glob(pattern: str) -> str:
+    """Translate a gitignore glob into a regex fragment ('/'-separated paths)"""
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == "*":
+            if pattern.startswith("**", i) and (i == 0 or pattern[i - 1] == "/"):
+                if i + 2 == n:
+                    out.append(".*")
+                    i += 2
+                    continue
+                if pattern[i + 2] == "/":
+                    out.append("(?:.*/)?")
+                    i += 3
+                    continue
+            while i + 1 < n and pattern[i + 1] == "*":
+                i += 1
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            start = i + 2 if pattern[i + 1:i + 2] in ("!", "^") else i + 1
+            end = pattern.find("]", start + 1)
+            if end == -1:
+                out.append(re.escape(c))
+            else:
+                body = pattern[i + 1:end]
+                negate = body[:1] in ("!", "^")
+                if negate:
+                    body = body[1:]
+                body = body.replace("\\", "\\\\").replace("[", "\\[")
+                out.append(f"[^{body}/]" if negate else f"[{body}]")
+                i = end
+        elif c == "\\" and i + 1 < n:
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
 @dataclass
+class IgnoreRule:
+    pattern: str
+    negate: bool
+    dir_only: bool
+    basename_only: bool
+    base: str
+
+    @classmethod
+    def parse(cls, line: str, base: str = "") -> Optional["IgnoreRule"]:
+        """Parse one gitignore line; returns None for blanks and comments"""
+        line = line.rstrip("\r\n")
+        while line.endswith(" ") and not line.endswith("\\ "):
+            line = line[:-1]
+        if not line or line.startswith("#"):
+            return None
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        if not line:
+            return None
+        basename_only = "/" not in line
+        return cls(line.lstrip("/"), negate, dir_only, basename_only, base)
+
+class IgnoreRuleSet:
+    """Ordered gitignore rules compiled into runs of combined regexes"""
+
+    def __init__(self, rules: List[IgnoreRule]):
+        self.rules = rules
+        self.runs = []
+        for rule in rules:
+            key = (rule.negate, rule.dir_only, rule.basename_only, rule.base)
+            if self.runs and self.runs[-1][0] == key:
+                self.runs[-1][1].append(rule.pattern)
+            else:
+                self.runs.append((key, [rule.pattern]))
+        self.runs = [
+            (negate, dir_only, basename_only, base,
+             re.compile("(?:" + "|".join(_translate_gitignore_glob(p) for p in patterns) + r")\Z"))
+            for (negate, dir_only, basename_only, base), patterns in self.runs
+        ]
+
+    def extend(self, rules: List[IgnoreRule]) -> "IgnoreRuleSet":
+        return IgnoreRuleSet(self.rules + rules) if rules else self
+
+    def match(self, rel_path: str, name: str, is_dir: bool) -> bool:
+        """Last matching rule wins; rel_path uses '/' separators"""
+        for negate, dir_only, basename_only, base, regex in reversed(self.runs):
+            if dir_only and not is_dir:
+                continue
+            if basename_only:
+                subject = name
+            elif base:
+                subject = rel_path[len(base) + 1:]
+            else:
+                subject = rel_path
+            if regex.match(subject):
+                return not negate
+        return False
+
+class IgnoreMatcher:
+    """Compiled ignore matcher with .gitignore semantics, rule sets cached per directory"""
+
+    def __init__(self, patterns, root_path: Optional[str] = None):
+        self.root_path = root_path
+        # ignore_patterns is a set: negations go last so they can re-include
+        base_rules = [IgnoreRule.parse(p) for p in sorted(patterns, key=lambda p: (p.startswith("!"), p))]
+        self._base = IgnoreRuleSet([r for r in base_rules if r])
+        self._rules: Dict[str, IgnoreRuleSet] = {}
+        self._dir_decisions: Dict[str, bool] = {}
+
+    def _read_gitignore(self, rel_dir: str) -> List[IgnoreRule]:
+        if self.root_path is None:
+            return []
+        gitignore = os.path.join(self.root_path, rel_dir, ".gitignore")
+        try:
+            with open(gitignore, "r", encoding="utf-8", errors="replace") as f:
+                lines = f.readlines()
+        except OSError:
+            return []
+        base = rel_dir.replace(os.sep, "/")
+        return [rule for rule in (IgnoreRule.parse(line, base) for line in lines) if rule]
+
+    def rules_for(self, rel_dir: str, has_gitignore: Optional[bool] = None) -> IgnoreRuleSet:
+        """Rules in effect inside rel_dir ("" is the workspace root)"""
+        rules = self._rules.get(rel_dir)
+        if rules is None:
+            parent = self.rules_for(os.path.dirname(rel_dir)) if rel_dir else self._base
+            rules = parent.extend(self._read_gitignore(rel_dir) if has_gitignore is not False else [])
+            self._rules[rel_dir] = rules
+        return rules
+
+    def is_ignored(self, rel_path: str, is_dir: bool, rules: Optional[IgnoreRuleSet] = None) -> bool:
+        if is_dir and rel_path in self._dir_decisions:
+            return self._dir_decisions[rel_path]
+        rel_dir, name = os.path.split(rel_path)
+        if rules is None:
+            rules = self.rules_for(rel_dir)
+        ignored = rules.match(rel_path if os.sep == "/" else rel_path.replace(os.sep, "/"), name, is_dir)
+        if is_dir:
+            self._dir_decisions[rel_path] = ignored
+        return ignored
+
+@dataclass(slots=True)
 class FileState:
     path: str
     size: int
     modified: float
     hash: str
     type: str
+    mtime_ns: int = 0
+    inode: int = 0
+    sampled: bool = False
+
+def _pack_paths(keys: List[bytes]) -> Tuple[bytes, array]:
+    """Concatenate encoded paths into one blob plus an n+1 offsets array"""
+    offsets = array("Q", [0])
+    position = 0
+    for key in keys:
+        position += len(key)
+        offsets.append(position)
+    return b"".join(keys), offsets
+
+def _tree_hash(file_state: FileState) -> str:
+    """FileStateTable.tree_hash for a single FileState"""
+    if file_state.sampled:
+        return f"{file_state.hash}:{file_state.size}:{file_state.mtime_ns}"
+    return file_state.hash
+
+class FileStateTable(MutableMapping):
+    """Columnar path -> FileState mapping (FileStates are built on access; assign changes back)"""
+    # Paths are kept in a sorted UTF-8 blob with an offsets array and found by
+    # bisection (first over every FENCE_STRIDE-th path, then within its block);
+    # paths added since the last compact() sit in a small dict, and removed
+    # packed rows are tombstoned until the next compact().
+    
+    _SAMPLED = 0x01
+    _RAW_HASH = 0x02  # hash kept as a string (not fixed-width hex, e.g. "error")
+    _DELETED = 0x04  # packed row whose path was removed
+    COMPACT_MIN = 4096  # added/removed rows tolerated before compacting (or the packed count, if larger)
+    FENCE_STRIDE = 16
+    
+    def __init__(self, items=None):
+        self._set_paths(b"", array("Q", [0]))
+        self._tail: Dict[str, int] = {}
+        self._free: List[int] = []  # tail rows to reuse
+        self._dead = 0
+        self._count = 0
+        self._size = array("Q")
+        self._mtime_ns = array("q")
+        self._modified = array("d")
+        self._inode = array("Q")
+        self._type = array("B")
+        self._flags = array("B")
+        self._hashes = bytearray()
+        self._hash_width = 0
+        self._raw_hashes: Dict[int, str] = {}
+        self._types: List[str] = []
+        self._type_index: Dict[str, int] = {}
+        if items:
+            self.update(items)
+    
+    @classmethod
+    def from_columns(cls, path_blob, path_offsets, size, mtime_ns, modified, inode,
+                     type_codes, types: List[str], flags, hash_blob, hash_width: int,
+                     raw_hashes: Dict[int, str]) -> "FileStateTable":
+        """Build a table straight from column data (rows in sorted path order, paths as a UTF-8 blob)"""
+        table = cls()
+        table._set_paths(bytes(path_blob), array("Q", path_offsets))
+        table._count = table._packed
+        table._size = array("Q", size)
+        table._mtime_ns = array("q", mtime_ns)
+        table._modified = array("d", modified)
+        table._inode = array("Q", inode)
+        table._type = array("B", type_codes)
+        table._flags = array("B", flags)
+        table._hashes = bytearray(hash_blob)
+        table._hash_width = hash_width
+        table._raw_hashes = dict(raw_hashes)
+        table._types = list(types)
+        table._type_index = {file_type: i for i, file_type in enumerate(types)}
+        return table
+    
+    def _type_code(self, file_type: str) -> int:
+        code = self._type_index.get(file_type)
+        if code is None:
+            code = len(self._types)
+            if code > 255:
+                raise ValueError("too many distinct file types")
+            self._types.append(file_type)
+            self._type_index[file_type] = code
+        return code
+    
+    def _pack_hash(self, row: int, value: str) -> bool:
+        """Store a hex digest in the fixed-width column; False if it does not fit"""
+        try:
+            digest = bytes.fromhex(value)
+        except ValueError:
+            return False
+        if not digest or digest.hex() != value:
+            return False
+        if not self._hash_width:
+            self._hash_width = len(digest)
+            self._hashes = bytearray(len(self._size) * self._hash_width)
+        width = self._hash_width
+        if len(digest) != width:
+            return False
+        self._hashes[row * width:(row + 1) * width] = digest
+        return True
+    
+    def _set_paths(self, blob: bytes, offsets: array):
+        """Install a packed path table (replaced whole, never changed in place)"""
+        self._blob = blob
+        self._offsets = offsets
+        self._packed = len(offsets) - 1
+        self._fences = [blob[offsets[row]:offsets[row + 1]]
+                        for row in range(0, self._packed, self.FENCE_STRIDE)]
+    
+    def _packed_row(self, path) -> int:
+        """Row of path among the packed rows (tombstoned or not), or -1"""
+        if not isinstance(path, str):
+            return -1
+        key = path.encode("utf-8", "surrogatepass")
+        block = bisect_right(self._fences, key) - 1
+        if block < 0:
+            return -1
+        blob, offsets = self._blob, self._offsets
+        low = block * self.FENCE_STRIDE
+        rows = range(low, min(low + self.FENCE_STRIDE, self._packed))
+        row = low + bisect_left(rows, key, key=lambda i: blob[offsets[i]:offsets[i + 1]])
+        if row < self._packed and blob[offsets[row]:offsets[row + 1]] == key:
+            return row
+        return -1
+    
+    def _row(self, path) -> int:
+        """Row holding path, or -1"""
+        row = self._tail.get(path)
+        if row is not None:
+            return row
+        row = self._packed_row(path)
+        return row if row >= 0 and not self._flags[row] & self._DELETED else -1
+    
+    def _path_rows(self) -> Iterator[Tuple[str, int]]:
+        """(path, row) of every file: packed rows in path order, then the tail"""
+        blob, offsets, flags = self._blob, self._offsets, self._flags
+        for row in range(self._packed):
+            if not flags[row] & self._DELETED:
+                yield blob[offsets[row]:offsets[row + 1]].decode("utf-8", "surrogatepass"), row
+        yield from self._tail.items()
+    
+    def _file_state(self, path: str, row: int) -> FileState:
+        return FileState(path, self._size[row], self._modified[row], self.hash_at(row),
+                         self._types[self._type[row]], self._mtime_ns[row],
+                         self._inode[row], bool(self._flags[row] & self._SAMPLED))
+    
+    def _compact_due(self) -> bool:
+        return len(self._tail) + self._dead > max(self.COMPACT_MIN, self._packed - self._dead)
+    
+    def compact(self):
+        """Fold added paths into the sorted blob and drop removed rows"""
+        if not self._tail and not self._dead:
+            return
+        blob, offsets, flags = self._blob, self._offsets, self._flags
+        ordered = [(blob[offsets[row]:offsets[row + 1]], row) for row in range(self._packed)
+                   if not flags[row] & self._DELETED]
+        ordered.extend((path.encode("utf-8", "surrogatepass"), row) for path, row in self._tail.items())
+        ordered.sort()  # the packed rows are one sorted run already
+        
+        self._set_paths(*_pack_paths([key for key, _ in ordered]))
+        rows = [row for _, row in ordered]
+        for name in ("_size", "_mtime_ns", "_modified", "_inode", "_type", "_flags"):
+            column = getattr(self, name)
+            setattr(self, name, array(column.typecode, [column[row] for row in rows]))
+        width = self._hash_width
+        self._hashes = bytearray(b"".join(self._hashes[row * width:(row + 1) * width] for row in rows))
+        self._raw_hashes = {new: self._raw_hashes[row] for new, row in enumerate(rows)
+                            if row in self._raw_hashes}
+        self._count = len(rows)
+        self._tail = {}
+        self._free = []
+        self._dead = 0
+    
+    def __setitem__(self, path: str, file_state: FileState):
+        row = self._tail.get(path)
+        if row is None:
+            row = self._packed_row(path)
+            if row >= 0 and self._flags[row] & self._DELETED:
+                self._dead -= 1
+                self._count += 1
+            elif row < 0:
+                if self._free:
+                    row = self._free.pop()
+                else:
+                    row = len(self._size)
+                    for column in (self._size, self._mtime_ns, self._inode, self._type, self._flags):
+                        column.append(0)
+                    self._modified.append(0.0)
+                    self._hashes.extend(bytes(self._hash_width))
+                self._tail[path] = row
+                self._count += 1
+        
+        self._size[row] = file_state.size
+        self._mtime_ns[row] = file_state.mtime_ns
+        self._modified[row] = file_state.modified
+        self._inode[row] = file_state.inode
+        self._type[row] = self._type_code(file_state.type)
+        flags = self._SAMPLED if file_state.sampled else 0
+        if self._pack_hash(row, file_state.hash):
+            self._raw_hashes.pop(row, None)
+        else:
+            self._raw_hashes[row] = file_state.hash
+            flags |= self._RAW_HASH
+        self._flags[row] = flags
+        if self._compact_due():
+            self.compact()
+    
+    def __getitem__(self, path: str) -> FileState:
+        row = self._row(path)
+        if row < 0:
+            raise KeyError(path)
+        return self._file_state(path, row)
+    
+    def get(self, path, default=None):
+        row = self._row(path)
+        return default if row < 0 else self._file_state(path, row)
+    
+    def __delitem__(self, path: str):
+        row = self._tail.pop(path, None)
+        if row is not None:
+            self._free.append(row)
+        else:
+            row = self._row(path)
+            if row < 0:
+                raise KeyError(path)
+            self._flags[row] |= self._DELETED
+            self._dead += 1
+        self._raw_hashes.pop(row, None)
+        self._count -= 1
+        if self._compact_due():
+            self.compact()
+    
+    def __contains__(self, path) -> bool:
+        return self._row(path) >= 0
+    
+    def __iter__(self) -> Iterator[str]:
+        return (path for path, _ in self._path_rows())
+    
+    def __len__(self) -> int:
+        return self._count
+    
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({len(self)} files)"
+    
+    def items(self):
+        return _TableItems(self)
+    
+    def values(self):
+        return _TableValues(self)
+    
+    def copy(self) -> "FileStateTable":
+        table = FileStateTable()
+        # The packed path table is replaced, never changed, by compact(): it can be shared
+        for name in ("_blob", "_offsets", "_fences", "_packed", "_dead", "_count", "_hash_width"):
+            setattr(table, name, getattr(self, name))
+        for name in ("_size", "_mtime_ns", "_modified", "_inode", "_type", "_flags", "_hashes"):
+            setattr(table, name, getattr(self, name)[:])
+        table._tail = dict(self._tail)
+        table._free = list(self._free)
+        table._raw_hashes = dict(self._raw_hashes)
+        table._types = list(self._types)
+        table._type_index = dict(self._type_index)
+        return table
+    
+    def hash_at(self, row: int) -> str:
+        if self._flags[row] & self._RAW_HASH:
+            return self._raw_hashes[row]
+        width = self._hash_width
+        return self._hashes[row * width:(row + 1) * width].hex()
+    
+    def file_hash(self, path: str) -> str:
+        """Content hash of one file without building its FileState"""
+        row = self._row(path)
+        if row < 0:
+            raise KeyError(path)
+        return self.hash_at(row)
+    
+    def tree_hash(self, path: str) -> str:
+        """file_hash for the directory Merkle tree: sampled rows add their size and mtime_ns"""
+        row = self._row(path)
+        if row < 0:
+            raise KeyError(path)
+        if self._flags[row] & self._SAMPLED:
+            return f"{self.hash_at(row)}:{self._size[row]}:{self._mtime_ns[row]}"
+        return self.hash_at(row)
+    
+    def stat_signatures(self) -> Iterator[Tuple[str, int, int, int, bool]]:
+        """Yield (path, size, mtime_ns, inode, sampled) without building FileStates"""
+        for path, row in self._path_rows():
+            yield (path, self._size[row], self._mtime_ns[row], self._inode[row],
+                   bool(self._flags[row] & self._SAMPLED))
+    
+    def sampled_count(self) -> int:
+        return sum(1 for _, row in self._path_rows() if self._flags[row] & self._SAMPLED)
+
+class _TableItems(ItemsView):
+    """items() of a FileStateTable, walked by row instead of looking each path up"""
+    
+    def __iter__(self):
+        table = self._mapping
+        for path, row in table._path_rows():
+            yield path, table._file_state(path, row)
+
+class _TableValues(ValuesView):
+    """values() of a FileStateTable, walked by row instead of looking each path up"""
+    
+    def __iter__(self):
+        table = self._mapping
+        for path, row in table._path_rows():
+            yield table._file_state(path, row)
 
 @dataclass
 class WorkspaceState:
     timestamp: str
     root_path: str
-    files: Dict[str, FileState]
+    files: MutableMapping  # path -> FileState; a FileStateTable for scanned states
     directories: Set[str]
     total_files: int
     total_size: int
     state_hash: str
+    hash_algorithm: str = "sha256"
+    dir_hashes: Dict[str, str] = field(default_factory=dict)
+    dir_meta: Dict[str, List[int]] = field(default_factory=dict)
 
 class WorkspaceScanner:
-    def __init__(self, root_path: str = "."):
+    TYPE_MAP = {
+        '.py': 'python', '.js': 'javascript', '.html': 'html',
+        '.css': 'css', '.md': 'markdown', '.json': 'json',
+        '.sql': 'sql', '.txt': 'text', '.log': 'log',
+        '.ini': 'config', '.yaml': 'config', '.yml': 'config'
+    }
+    
+    def __init__(self, root_path: str = ".", config_path: str = "config.ini",
+                 hash_workers: Optional[int] = None, hash_executor: Optional[str] = None):
         self.root_path = Path(root_path).resolve()
         self.ignore_patterns = {
             "__pycache__", ".git", ".venv", "venv", "node_modules",
             ".pytest_cache", ".mypy_cache", "*.pyc", "*.pyo"
         }
+        self.last_scan_stats = {"hashed": 0, "reused": 0, "sampled": 0, "timed_out": False,
+                                "dirs_listed": 0, "dirs_trusted": 0}
+        self._matcher: Optional[IgnoreMatcher] = None
+        
+        # Hashing pool configuration (explicit arguments override config.ini)
+        config = load_workspace_config(config_path)
+        if hash_workers is None:
+            hash_workers = int(config.get("hash_workers", 0))
+        self.hash_workers = hash_workers if hash_workers > 0 else (os.cpu_count() or 1)
+        self.hash_executor = (hash_executor or config.get("hash_executor", "thread")).lower()
+        if self.hash_executor not in ("thread", "process"):
+            raise ValueError(f"Unknown hash_executor: {self.hash_executor}")
+        self.hash_algorithm = config.get("hash_algorithm", "blake2b").lower()
+        if self.hash_algorithm not in HASH_ALGORITHMS:
+            raise ValueError(f"Unknown hash_algorithm: {self.hash_algorithm}")
+        self.hash_read_mode = config.get("hash_read_mode", "buffered").lower()
+        if self.hash_read_mode not in HASH_READ_MODES:
+            raise ValueError(f"Unknown hash_read_mode: {self.hash_read_mode}")
+        self.use_gitignore = _config_flag(config.get("use_gitignore", "true"))
+        
+        # Limits: files above max_file_size are sampled, and once scan_timeout
+        # seconds have elapsed the remaining files are sampled too (0 = no limit)
+        self.max_file_size = int(config.get("max_file_size", 0))
+        self.scan_timeout = float(config.get("scan_timeout", 0))
+        self.sample_blocks = int(config.get("sample_blocks", 16))
+        
+        # Record directory mtimes and skip re-listing unchanged directories
+        self.trust_directory_mtime = _config_flag(config.get("trust_directory_mtime", "false"))
         
+    def _build_matcher(self) -> IgnoreMatcher:
+        return IgnoreMatcher(self.ignore_patterns, str(self.root_path) if self.use_gitignore else None)
+    
     def should_ignore(self, path: Path) -> bool:
-        """Determine if path should be ignored"""
-        for pattern in self.ignore_patterns:
-            if pattern.startswith("*."):
-                if path.suffix == pattern[1:]:
-                    return True
-            elif pattern in path.parts:
+        """Determine if path (absolute or workspace-relative) should be ignored"""
+        path = Path(path)
+        if path.is_absolute():
+            try:
+                path = path.relative_to(self.root_path)
+            except ValueError:
+                return False
+        if self._matcher is None:
+            self._matcher = self._build_matcher()
+        
+        # An ignored ancestor excludes everything beneath it
+        rel_path = ""
+        for index, part in enumerate(path.parts):
+            rel_path = os.path.join(rel_path, part) if rel_path else part
+            is_dir = index < len(path.parts) - 1 or (self.root_path / rel_path).is_dir()
+            if self._matcher.is_ignored(rel_path, is_dir):
                 return True
         return False
     
     def calculate_file_hash(self, file_path: Path) -> str:
-        """Generate SHA-256 hash for file content"""
+        """Fingerprint file content with the configured algorithm"""
+        return hash_file_content(file_path, self.hash_algorithm, self.hash_read_mode)
+    
+    def _hash_files(self, file_paths: List[str], sizes: List[int],
+                    deadline: float = 0) -> List[Tuple[str, bool]]:
+        """Fingerprint files on the configured worker pool, preserving input order"""
+        hash_func = partial(fingerprint_file, algorithm=self.hash_algorithm,
+                            read_mode=self.hash_read_mode, max_file_size=self.max_file_size,
+                            sample_blocks=self.sample_blocks, deadline=deadline)
+        if self.hash_workers <= 1 or len(file_paths) < 2:
+            return [hash_func(path, size) for path, size in zip(file_paths, sizes)]
+        
+        # hashlib releases the GIL on large updates, so threads scale for I/O-bound
+        # trees; the process pool helps when many small files keep the GIL busy
+        executor_cls = ThreadPoolExecutor if self.hash_executor == "thread" else ProcessPoolExecutor
+        workers = min(self.hash_workers, len(file_paths))
+        chunksize = 1 if self.hash_executor == "thread" else max(1, len(file_paths) // (workers * 4))
+        with executor_cls(max_workers=workers) as pool:
+            return list(pool.map(hash_func, file_paths, sizes, chunksize=chunksize))
+    
+    def get_file_type(self, path) -> str:
+        """Classify file type (accepts Path or str)"""
+        suffix = os.path.splitext(os.fspath(path))[1].lower()
+        return self.TYPE_MAP.get(suffix, 'other')
+    
+    def _gitignore_changed(self, prior_files: Dict[str, FileState], rel_path: str, abs_path: str) -> bool:
+        """True when a .gitignore appeared, vanished or changed since the prior scan"""
+        prior = prior_files.get(rel_path)
         try:
-            hash_sha256 = hashlib.sha256()
-            with open(file_path, "rb") as f:
-                for chunk in iter(lambda: f.read(4096), b""):
-                    hash_sha256.update(chunk)
-            return hash_sha256.hexdigest()[:16]  # Truncate for performance
-        except (OSError, IOError):
-            return "error"
-    
-    def get_file_type(self, path: Path) -> str:
-        """Classify file type"""
-        suffix = path.suffix.lower()
-        type_map = {
-            '.py': 'python', '.js': 'javascript', '.html': 'html',
-            '.css': 'css', '.md': 'markdown', '.json': 'json',
-            '.sql': 'sql', '.txt': 'text', '.log': 'log',
-            '.ini': 'config', '.yaml': 'config', '.yml': 'config'
-        }
-        return type_map.get(suffix, 'other')
+            stat = os.stat(abs_path)
+        except OSError:
+            return prior is not None
+        return prior is None or (prior.size, prior.mtime_ns) != (stat.st_size, stat.st_mtime_ns)
     
-    def scan_workspace(self) -> WorkspaceState:
-        """Generate complete workspace state"""
-        files = {}
-        directories = set()
-        total_size = 0
+    def _walk(self, directories: Set[str], dir_meta: Optional[Dict[str, List[int]]] = None,
+              prior_state: Optional[WorkspaceState] = None, stats: Optional[Dict] = None,
+              start: str = ""):
+        """Yield (rel_path, abs_path, stat) for every non-ignored file via os.scandir"""
+        # dir_meta collects [mtime_ns, tracked entry count] per listed directory; with
+        # trust_directory_mtime, directories unchanged since prior_state are not re-listed.
+        matcher = self._matcher = self._build_matcher()
+        record = dir_meta is not None
+        trust = record and prior_state is not None and self.trust_directory_mtime
+        prior_meta = prior_state.dir_meta if trust else {}
+        prior_index = self._tree_index(prior_state) if prior_meta else {}
+        prior_files = prior_state.files if prior_meta else {}
+        # Directories touched within the last second may still change in the
+        # same mtime tick, so their metadata is not trusted on the next scan
+        racy_after_ns = time.time_ns() - 1_000_000_000
+        stack = [(os.path.join(str(self.root_path), start) if start else str(self.root_path),
+                  start, bool(prior_meta))]
         
-        for root, dirs, filenames in os.walk(self.root_path):
-            root_path = Path(root)
+        while stack:
+            abs_dir, rel_dir, allow_trust = stack.pop()
+            prefix = rel_dir + os.sep if rel_dir else ""
             
-            # Filter ignored directories
-            dirs[:] = [d for d in dirs if not self.should_ignore(root_path / d)]
+            if record:
+                try:
+                    dir_stat = os.stat(abs_dir)
+                except OSError:
+                    continue
+                meta = prior_meta.get(rel_dir)
+                if allow_trust and self._gitignore_changed(prior_files, prefix + ".gitignore",
+                                                           os.path.join(abs_dir, ".gitignore")):
+                    allow_trust = False
+                if allow_trust and meta and meta[0] == dir_stat.st_mtime_ns and rel_dir in prior_index:
+                    # Trusted directory: reuse the cached listing, stat known children only
+                    if rel_dir:
+                        directories.add(rel_dir)
+                    dir_meta[rel_dir] = meta
+                    if stats is not None:
+                        stats["dirs_trusted"] += 1
+                    subdirs, names = prior_index[rel_dir]
+                    for name in names:
+                        abs_path = os.path.join(abs_dir, name)
+                        try:
+                            stat = os.stat(abs_path)
+                        except OSError:
+                            continue
+                        yield prefix + name, abs_path, stat
+                    stack.extend((os.path.join(abs_dir, name), prefix + name, True) for name in subdirs)
+                    continue
             
-            # Add directory to set
-            rel_dir = root_path.relative_to(self.root_path)
-            if str(rel_dir) != ".":
-                directories.add(str(rel_dir))
+            try:
+                with os.scandir(abs_dir) as entries:
+                    entries = list(entries)
+            except OSError:
+                continue
+            if rel_dir:
+                directories.add(rel_dir)
+            listed_meta = None
+            if record and dir_stat.st_mtime_ns < racy_after_ns:
+                listed_meta = dir_meta[rel_dir] = [dir_stat.st_mtime_ns, 0]
+            if stats is not None:
+                stats["dirs_listed"] += 1
+            rules = matcher.rules_for(rel_dir, any(e.name == ".gitignore" for e in entries))
             
-            # Process files
-            for filename in filenames:
-                file_path = root_path / filename
-                
-                if self.should_ignore(file_path):
-                    continue
-                
+            tracked = 0
+            for entry in entries:
+                rel_path = prefix + entry.name
                 try:
-                    stat = file_path.stat()
-                    rel_path = str(file_path.relative_to(self.root_path))
-                    
-                    file_state = FileState(
-                        path=rel_path,
-                        size=stat.st_size,
-                        modified=stat.st_mtime,
-                        hash=self.calculate_file_hash(file_path),
-                        type=self.get_file_type(file_path)
-                    )
-                    
-                    files[rel_path] = file_state
-                    total_size += stat.st_size
-                    
-                except (OSError, IOError):
+                    is_dir = entry.is_dir()
+                    if matcher.is_ignored(rel_path, is_dir, rules):
+                        continue
+                    if is_dir:
+                        if not entry.is_symlink():
+                            stack.append((entry.path, rel_path, allow_trust))
+                            tracked += 1
+                        continue
+                    stat = entry.stat()
+                except OSError:
                     continue
+                tracked += 1
+                yield rel_path, entry.path, stat
+            if listed_meta is not None:
+                listed_meta[1] = tracked
+    
+    def _tracked_names(self, abs_dir: str, rel_dir: str, matcher: IgnoreMatcher) -> Optional[Set[str]]:
+        """Names of the entries a scan would track in one directory; None if unreadable"""
+        prefix = rel_dir + os.sep if rel_dir else ""
+        try:
+            with os.scandir(abs_dir) as entries:
+                entries = list(entries)
+            rules = matcher.rules_for(rel_dir, any(e.name == ".gitignore" for e in entries))
+            return {entry.name for entry in entries
+                    if not matcher.is_ignored(prefix + entry.name, entry.is_dir(), rules)
+                    and not (entry.is_dir() and entry.is_symlink())}
+        except OSError:
+            return None
+    
+    def _reusable_hash(self, prior: Optional[FileState], stat: os.stat_result) -> Optional[str]:
+        """Return the cached hash when stat data proves the file is unchanged"""
+        if prior is None or prior.hash == "error" or not prior.mtime_ns:
+            return None
+        # Fingerprints sampled only because a scan ran out of time get redone
+        if prior.sampled != bool(self.max_file_size and stat.st_size > self.max_file_size):
+            return None
+        if (prior.size, prior.mtime_ns, prior.inode) != (stat.st_size, stat.st_mtime_ns, stat.st_ino):
+            return None
+        return prior.hash
+    
+    def revalidate(self, state: WorkspaceState) -> bool:
+        """True when a stat pass proves the workspace still matches state (changed directories are listed)"""
+        if state.root_path != str(self.root_path) or state.hash_algorithm != self.hash_algorithm:
+            return False
+        root = str(self.root_path)
         
-        # Generate state hash
-        state_content = json.dumps({
-            "files": {k: asdict(v) for k, v in files.items()},
-            "directories": sorted(directories)
-        }, sort_keys=True)
-        state_hash = hashlib.sha256(state_content.encode()).hexdigest()[:16]
+        matcher = None
+        for rel_dir in itertools.chain([""], state.directories):
+            meta = state.dir_meta.get(rel_dir)
+            abs_dir = os.path.join(root, rel_dir) if rel_dir else root
+            try:
+                if meta is not None and os.stat(abs_dir).st_mtime_ns == meta[0]:
+                    continue
+            except OSError:
+                return False
+            # e.g. ignored output written through a temporary file and a rename
+            if matcher is None:
+                matcher = self._build_matcher()
+            names = self._tracked_names(abs_dir, rel_dir, matcher)
+            if names is None or (meta is not None and len(names) != meta[1]):
+                return False
+            subdirs, files = self._tree_index(state).get(rel_dir, ((), ()))
+            if len(names) != len(subdirs) + len(files) or names != set(subdirs).union(files):
+                return False
+        
+        signatures = getattr(state.files, "stat_signatures", None)
+        rows = signatures() if signatures else (
+            (path, f.size, f.mtime_ns, f.inode, f.sampled) for path, f in state.files.items())
+        for rel_path, size, mtime_ns, inode, sampled in rows:
+            try:
+                stat = os.stat(os.path.join(root, rel_path))
+            except OSError:
+                return False
+            if (size, mtime_ns, inode) != (stat.st_size, stat.st_mtime_ns, stat.st_ino) or not mtime_ns:
+                return False
+            # Fingerprints sampled only because a scan ran out of time get redone
+            if sampled != bool(self.max_file_size and size > self.max_file_size):
+                return False
+        return True
+    
+    def scan_workspace(self, previous_state: Optional[WorkspaceState] = None,
+                       force_rehash: bool = False) -> WorkspaceState:
+        """Generate complete workspace state"""
+        # Hashes of files with unchanged (size, mtime_ns, inode) in previous_state are reused
+        # unless force_rehash; large or late files are fingerprinted by sampling.
+        deadline = time.time() + self.scan_timeout if self.scan_timeout > 0 else 0
+        files = FileStateTable()
+        directories = set()
+        total_size = 0
+        stats = {"hashed": 0, "reused": 0, "sampled": 0, "timed_out": False,
+                 "dirs_listed": 0, "dirs_trusted": 0}
+        dir_meta = {}
+        pending: List[Tuple[FileState, str]] = []
+        
+        prior_files = {}
+        if (previous_state is not None and not force_rehash
+                and previous_state.root_path == str(self.root_path)
+                and previous_state.hash_algorithm == self.hash_algorithm):
+            prior_files = previous_state.files
+        prior_state = previous_state if prior_files else None
+        
+        for rel_path, abs_path, stat in self._walk(directories, dir_meta, prior_state, stats):
+            prior = prior_files.get(rel_path)
+            file_hash = self._reusable_hash(prior, stat)
+            file_state = FileState(
+                path=rel_path,
+                size=stat.st_size,
+                modified=stat.st_mtime,
+                hash=file_hash or "",
+                type=self.get_file_type(rel_path),
+                mtime_ns=stat.st_mtime_ns,
+                inode=stat.st_ino,
+                sampled=prior.sampled if file_hash else False
+            )
+            if file_state.hash:
+                files[rel_path] = file_state
+            else:
+                pending.append((file_state, abs_path))
+            total_size += stat.st_size
+        
+        # Hash new or touched files; walking stays on this thread
+        hashes = self._hash_files([file_path for _, file_path in pending],
+                                  [file_state.size for file_state, _ in pending], deadline)
+        for (file_state, _), (file_hash, sampled) in zip(pending, hashes):
+            file_state.hash = file_hash
+            file_state.sampled = sampled
+            files[file_state.path] = file_state
+        stats["hashed"] = len(pending)
+        stats["reused"] = len(files) - len(pending)
+        stats["sampled"] = files.sampled_count()
+        stats["timed_out"] = bool(deadline and time.time() > deadline)
+        
+        # Generate state hash from the root of the directory Merkle tree
+        dir_hashes = self.build_dir_hashes(files, directories)
+        state_hash = dir_hashes[""][:16]
+        files.compact()
+        self.last_scan_stats = stats
         
         return WorkspaceState(
             timestamp=datetime.now().isoformat(),
@@ -126,11 +914,224 @@ class WorkspaceScanner:
             directories=directories,
             total_files=len(files),
             total_size=total_size,
-            state_hash=state_hash
+            state_hash=state_hash,
+            hash_algorithm=self.hash_algorithm,
+            dir_hashes=dir_hashes,
+            dir_meta=dir_meta
         )
     
+    def _build_tree_index(self, paths, directories) -> Dict[str, Tuple[List[str], List[str]]]:
+        """Map each directory ("" = root) to its (subdirectory names, file names)"""
+        index = {"": ([], [])}
+        for rel_dir in directories:
+            index.setdefault(rel_dir, ([], []))
+        for rel_dir in directories:
+            parent, _, name = rel_dir.rpartition(os.sep)
+            index.setdefault(parent, ([], []))[0].append(name)
+        for rel_path in paths:
+            parent, _, name = rel_path.rpartition(os.sep)
+            index.setdefault(parent, ([], []))[1].append(name)
+        return index
+    
+    def _tree_index(self, state: WorkspaceState) -> Dict[str, Tuple[List[str], List[str]]]:
+        """Directory index for a state, built once and kept on the state object"""
+        index = getattr(state, "_tree_index", None)
+        if index is None:
+            index = self._build_tree_index(state.files.keys(), state.directories)
+            state._tree_index = index
+        return index
+    
+    def _hash_directory(self, rel_dir: str, subdirs: List[str], names: List[str],
+                        files: Dict[str, FileState], dir_hashes: Dict[str, str]) -> str:
+        prefix = rel_dir + os.sep if rel_dir else ""
+        if isinstance(files, FileStateTable):
+            file_hash = files.tree_hash
+        else:
+            file_hash = lambda rel_path: _tree_hash(files[rel_path])
+        entries = [f"{name}\0f\0{file_hash(prefix + name)}" for name in names]
+        entries.extend(f"{name}\0d\0{dir_hashes.get(prefix + name, '')}" for name in subdirs)
+        entries.sort()
+        content = "\n".join(entries).encode("utf-8", "surrogatepass")
+        return hashlib.blake2b(content, digest_size=16).hexdigest()
+    
+    def build_dir_hashes(self, files: Dict[str, FileState], directories: Set[str]) -> Dict[str, str]:
+        """Compute the Merkle tree of per-directory hashes, deepest directories first"""
+        index = self._build_tree_index(files.keys(), directories)
+        dir_hashes = {}
+        for rel_dir in sorted(index, key=lambda d: d.count(os.sep) + bool(d), reverse=True):
+            subdirs, names = index[rel_dir]
+            dir_hashes[rel_dir] = self._hash_directory(rel_dir, subdirs, names, files, dir_hashes)
+        return dir_hashes
+    
+    def _index_remove_subtree(self, state: WorkspaceState, index: Dict, rel_dir: str,
+                              changed: Dict[str, Optional[FileState]]):
+        """Drop a directory and everything beneath it from state and index"""
+        for rel_path in self._subtree_files(index, rel_dir):
+            self._index_remove_file(state, index, rel_path, changed)
+        stack = [rel_dir]
+        while stack:
+            current = stack.pop()
+            subdirs, _ = index.pop(current, ((), ()))
+            stack.extend(current + os.sep + name for name in subdirs)
+            state.directories.discard(current)
+            state.dir_hashes.pop(current, None)
+            state.dir_meta.pop(current, None)
+        parent, _, name = rel_dir.rpartition(os.sep)
+        if parent in index and name in index[parent][0]:
+            index[parent][0].remove(name)
+    
+    def _index_remove_file(self, state: WorkspaceState, index: Dict, rel_path: str,
+                           changed: Dict[str, Optional[FileState]]):
+        file_state = state.files.pop(rel_path, None)
+        if file_state is None:
+            return
+        changed.setdefault(rel_path, file_state)
+        state.total_size -= file_state.size
+        parent, _, name = rel_path.rpartition(os.sep)
+        if parent in index:
+            index[parent][1].remove(name)
+    
+    def _index_add_directory(self, state: WorkspaceState, index: Dict, rel_dir: str):
+        if rel_dir in index:
+            return
+        index[rel_dir] = ([], [])
+        state.directories.add(rel_dir)
+        parent, _, name = rel_dir.rpartition(os.sep)
+        index.setdefault(parent, ([], []))[0].append(name)
+    
+    def _index_upsert_file(self, state: WorkspaceState, index: Dict, rel_path: str,
+                           stat: os.stat_result, changed: Dict[str, Optional[FileState]],
+                           pending: List[Tuple[FileState, str]]):
+        prior = changed.get(rel_path, state.files.get(rel_path))
+        current = state.files.get(rel_path)
+        file_hash = self._reusable_hash(prior, stat)
+        file_state = FileState(
+            path=rel_path,
+            size=stat.st_size,
+            modified=stat.st_mtime,
+            hash=file_hash or "",
+            type=self.get_file_type(rel_path),
+            mtime_ns=stat.st_mtime_ns,
+            inode=stat.st_ino,
+            sampled=prior.sampled if file_hash else False
+        )
+        if current is not None and current == file_state:
+            return
+        changed.setdefault(rel_path, current)
+        if current is None:
+            parent, _, name = rel_path.rpartition(os.sep)
+            index[parent][1].append(name)
+        else:
+            state.total_size -= current.size
+        state.files[rel_path] = file_state
+        state.total_size += file_state.size
+        if not file_hash:
+            pending.append((file_state, os.path.join(str(self.root_path), rel_path)))
+    
+    def apply_paths(self, state: WorkspaceState, rel_paths) -> Dict[str, Optional[FileState]]:
+        """Re-stat paths and update state in place; returns each changed path's prior FileState (None if new)"""
+        index = self._tree_index(state)
+        changed: Dict[str, Optional[FileState]] = {}
+        pending: List[Tuple[FileState, str]] = []
+        dirty_dirs = set()
+        rel_paths = sorted(set(rel_paths))
+        
+        # A changed .gitignore can re-include or exclude anything below it
+        if any(os.path.basename(p) == ".gitignore" for p in rel_paths):
+            self._matcher = None
+            rel_paths = sorted(set(os.path.dirname(p) if os.path.basename(p) == ".gitignore" else p
+                                   for p in rel_paths))
+        if self._matcher is None:
+            self._matcher = self._build_matcher()
+        
+        for rel_path in rel_paths:
+            parent = os.path.dirname(rel_path)
+            if rel_path and parent not in index:
+                continue  # inside an untracked (ignored or vanished) directory
+            abs_path = os.path.join(str(self.root_path), rel_path)
+            try:
+                is_dir = S_ISDIR(os.lstat(abs_path).st_mode)
+                file_stat = None if is_dir else os.stat(abs_path)
+            except OSError:
+                is_dir, file_stat = False, None
+            
+            if file_stat is not None and not S_ISDIR(file_stat.st_mode) \
+                    and not self._matcher.is_ignored(rel_path, False):
+                if rel_path in index:
+                    self._index_remove_subtree(state, index, rel_path, changed)
+                self._index_upsert_file(state, index, rel_path, file_stat, changed, pending)
+                dirty_dirs.add(parent)
+                continue
+            
+            # Directory, or a path that vanished or is now ignored: drop what
+            # was known beneath it, then re-walk only that subtree
+            if rel_path in state.files:
+                self._index_remove_file(state, index, rel_path, changed)
+            if not rel_path:
+                for name in list(index[""][0]):
+                    self._index_remove_subtree(state, index, name, changed)
+                for name in list(index[""][1]):
+                    self._index_remove_file(state, index, name, changed)
+            elif rel_path in index:
+                self._index_remove_subtree(state, index, rel_path, changed)
+            dirty_dirs.add(parent)
+            if not is_dir or (rel_path and self._matcher.is_ignored(rel_path, True)):
+                continue
+            
+            walked_dirs = set()
+            found = list(self._walk(walked_dirs, start=rel_path))
+            for rel_dir in sorted(walked_dirs, key=lambda d: d.count(os.sep)):
+                self._index_add_directory(state, index, rel_dir)
+                dirty_dirs.add(rel_dir)
+            for found_path, _, found_stat in found:
+                self._index_upsert_file(state, index, found_path, found_stat, changed, pending)
+                dirty_dirs.add(os.path.dirname(found_path))
+        
+        hashes = self._hash_files([abs_path for _, abs_path in pending],
+                                  [file_state.size for file_state, _ in pending])
+        for (file_state, _), (file_hash, sampled) in zip(pending, hashes):
+            file_state.hash = file_hash
+            file_state.sampled = sampled
+            state.files[file_state.path] = file_state
+        
+        # Recompute the Merkle path from each touched directory up to the root
+        for rel_dir in list(dirty_dirs):
+            while rel_dir:
+                rel_dir = os.path.dirname(rel_dir)
+                dirty_dirs.add(rel_dir)
+        dirty_dirs.add("")
+        for rel_dir in sorted(dirty_dirs, key=lambda d: d.count(os.sep) + bool(d), reverse=True):
+            if rel_dir not in index:
+                continue
+            subdirs, names = index[rel_dir]
+            state.dir_hashes[rel_dir] = self._hash_directory(rel_dir, subdirs, names,
+                                                             state.files, state.dir_hashes)
+            state.dir_meta.pop(rel_dir, None)
+        state.state_hash = state.dir_hashes[""][:16]
+        state.total_files = len(state.files)
+        state.timestamp = datetime.now().isoformat()
+        
+        return {path: prior for path, prior in changed.items() if prior != state.files.get(path)}
+    
+    def _content_changed(self, old_file: FileState, new_file: FileState) -> bool:
+        """Compare fingerprints, falling back to stat data across full/sampled kinds"""
+        if old_file.sampled != new_file.sampled:
+            return (old_file.size, old_file.mtime_ns) != (new_file.size, new_file.mtime_ns)
+        if old_file.sampled:
+            # A sample can miss an edit between its blocks; stat data does not (0 = not recorded)
+            if old_file.size != new_file.size or (old_file.mtime_ns and new_file.mtime_ns
+                                                  and old_file.mtime_ns != new_file.mtime_ns):
+                return True
+        return old_file.hash != new_file.hash
+    
     def compare_states(self, old_state: WorkspaceState, new_state: WorkspaceState) -> Dict:
         """Generate diff between workspace states"""
+        if old_state.hash_algorithm != new_state.hash_algorithm:
+            raise ValueError(
+                f"Cannot compare states fingerprinted with {old_state.hash_algorithm} "
+                f"and {new_state.hash_algorithm}"
+            )
+        
         changes = {
             "added": [],
             "modified": [],
@@ -138,6 +1139,11 @@ class WorkspaceScanner:
             "moved": []
         }
         
+        if old_state.dir_hashes and new_state.dir_hashes:
+            self._diff_trees(old_state, new_state, changes)
+            self.detect_moves(changes, old_state.files, new_state.files)
+            return changes
+        
         old_files = set(old_state.files.keys())
         new_files = set(new_state.files.keys())
         
@@ -149,18 +1155,205 @@ class WorkspaceScanner:
         
         # Modified files
         for file_path in old_files & new_files:
-            old_file = old_state.files[file_path]
-            new_file = new_state.files[file_path]
+            self._compare_file(old_state, new_state, file_path, changes)
+        
+        self.detect_moves(changes, old_state.files, new_state.files)
+        return changes
+    
+    def iter_changes(self, old_state: WorkspaceState, new_state: WorkspaceState,
+                     detect_moves: bool = True) -> Iterator[Tuple[str, object]]:
+        """Stream the compare_states diff as (kind, entry) pairs in a merge-join walk"""
+        # Moves are paired at the end of the walk; detect_moves=False streams everything.
+        if old_state.hash_algorithm != new_state.hash_algorithm:
+            raise ValueError(
+                f"Cannot compare states fingerprinted with {old_state.hash_algorithm} "
+                f"and {new_state.hash_algorithm}"
+            )
+        
+        if not detect_moves:
+            yield from self._merge_diff(old_state, new_state)
+            return
+        
+        changes = {"added": [], "modified": [], "removed": [], "moved": []}
+        for kind, entry in self._merge_diff(old_state, new_state):
+            if kind == "modified":
+                yield kind, entry
+            else:
+                changes[kind].append(entry)
+        self.detect_moves(changes, old_state.files, new_state.files)
+        for kind in ("added", "removed", "moved"):
+            for entry in changes[kind]:
+                yield kind, entry
+    
+    def _merge_diff(self, old_state: WorkspaceState,
+                    new_state: WorkspaceState) -> Iterator[Tuple[str, object]]:
+        """Merge-join the sorted entries of both states, one directory at a time"""
+        use_tree = bool(old_state.dir_hashes and new_state.dir_hashes)
+        if not use_tree:
+            yield from self._merge_paths(old_state, new_state, "", sorted(old_state.files),
+                                         sorted(new_state.files))
+            return
+        
+        old_index = self._tree_index(old_state)
+        new_index = self._tree_index(new_state)
+        stack = [""]
+        while stack:
+            rel_dir = stack.pop()
+            if old_state.dir_hashes.get(rel_dir) == new_state.dir_hashes.get(rel_dir):
+                continue
+            old_subdirs, old_names = old_index.get(rel_dir, ((), ()))
+            new_subdirs, new_names = new_index.get(rel_dir, ((), ()))
+            prefix = rel_dir + os.sep if rel_dir else ""
+            yield from self._merge_paths(old_state, new_state, prefix, sorted(old_names),
+                                         sorted(new_names))
             
-            if old_file.hash != new_file.hash:
-                changes["modified"].append({
-                    "path": file_path,
-                    "size_change": new_file.size - old_file.size,
-                    "modified_time": new_file.modified
-                })
+            # Subdirectories: descend into shared ones (in sorted order), emit whole
+            # subtrees for the ones only one side has
+            old_subdirs, new_subdirs = sorted(old_subdirs), sorted(new_subdirs)
+            shared = []
+            i = j = 0
+            while i < len(old_subdirs) or j < len(new_subdirs):
+                old_name = old_subdirs[i] if i < len(old_subdirs) else None
+                new_name = new_subdirs[j] if j < len(new_subdirs) else None
+                if new_name is None or (old_name is not None and old_name < new_name):
+                    for rel_path in self._subtree_files(old_index, prefix + old_name):
+                        yield "removed", rel_path
+                    i += 1
+                elif old_name is None or new_name < old_name:
+                    for rel_path in self._subtree_files(new_index, prefix + new_name):
+                        yield "added", rel_path
+                    j += 1
+                else:
+                    shared.append(prefix + old_name)
+                    i += 1
+                    j += 1
+            stack.extend(reversed(shared))
+    
+    def _merge_paths(self, old_state: WorkspaceState, new_state: WorkspaceState, prefix: str,
+                     old_names: List[str], new_names: List[str]) -> Iterator[Tuple[str, object]]:
+        """Merge-join two sorted name lists into added, removed and modified entries"""
+        i = j = 0
+        while i < len(old_names) or j < len(new_names):
+            old_name = old_names[i] if i < len(old_names) else None
+            new_name = new_names[j] if j < len(new_names) else None
+            if new_name is None or (old_name is not None and old_name < new_name):
+                yield "removed", prefix + old_name
+                i += 1
+            elif old_name is None or new_name < old_name:
+                yield "added", prefix + new_name
+                j += 1
+            else:
+                entry = self._modification(old_state, new_state, prefix + old_name)
+                if entry is not None:
+                    yield "modified", entry
+                i += 1
+                j += 1
+    
+    def detect_moves(self, changes: Dict, old_files: Dict[str, FileState],
+                     new_files: Dict[str, FileState]) -> Dict:
+        """Pair removed and added paths with identical content into changes["moved"], preferring the same inode"""
+        if not changes["added"] or not changes["removed"]:
+            return changes
+        
+        by_content: Dict[Tuple[str, int, bool], List[str]] = {}
+        for old_path in changes["removed"]:
+            old_file = old_files[old_path]
+            by_content.setdefault((old_file.hash, old_file.size, old_file.sampled), []).append(old_path)
         
+        moved_from = set()
+        still_added = []
+        for new_path in changes["added"]:
+            new_file = new_files[new_path]
+            candidates = by_content.get((new_file.hash, new_file.size, new_file.sampled))
+            match = None
+            if candidates:
+                same_inode = [c for c in candidates if new_file.inode and old_files[c].inode == new_file.inode]
+                if same_inode:
+                    match = same_inode[0]
+                elif new_file.size and new_file.hash != "error":
+                    name = os.path.basename(new_path)
+                    same_name = [c for c in candidates if os.path.basename(c) == name]
+                    match = (same_name or candidates)[0]
+            if match is None:
+                still_added.append(new_path)
+                continue
+            candidates.remove(match)
+            moved_from.add(match)
+            changes["moved"].append({
+                "from": match,
+                "to": new_path,
+                "size": new_file.size,
+                "hash": new_file.hash
+            })
+        
+        changes["added"] = still_added
+        changes["removed"] = [p for p in changes["removed"] if p not in moved_from]
         return changes
     
+    def _compare_file(self, old_state: WorkspaceState, new_state: WorkspaceState,
+                      file_path: str, changes: Dict):
+        entry = self._modification(old_state, new_state, file_path)
+        if entry is not None:
+            changes["modified"].append(entry)
+    
+    def _modification(self, old_state: WorkspaceState, new_state: WorkspaceState,
+                      file_path: str) -> Optional[Dict]:
+        old_file = old_state.files[file_path]
+        new_file = new_state.files[file_path]
+        
+        if not self._content_changed(old_file, new_file):
+            return None
+        return {
+            "path": file_path,
+            "size_change": new_file.size - old_file.size,
+            "modified_time": new_file.modified
+        }
+    
+    def _subtree_files(self, index: Dict[str, Tuple[List[str], List[str]]], rel_dir: str) -> List[str]:
+        """All file paths beneath rel_dir according to a tree index"""
+        paths = []
+        stack = [rel_dir]
+        while stack:
+            current = stack.pop()
+            subdirs, names = index.get(current, ((), ()))
+            prefix = current + os.sep if current else ""
+            paths.extend(prefix + name for name in names)
+            stack.extend(prefix + name for name in subdirs)
+        return paths
+    
+    def _diff_trees(self, old_state: WorkspaceState, new_state: WorkspaceState, changes: Dict):
+        """Diff two states by descending only into directories whose hashes differ"""
+        old_index = self._tree_index(old_state)
+        new_index = self._tree_index(new_state)
+        stack = [""]
+        
+        while stack:
+            rel_dir = stack.pop()
+            if old_state.dir_hashes.get(rel_dir) == new_state.dir_hashes.get(rel_dir):
+                continue
+            
+            old_subdirs, old_names = old_index.get(rel_dir, ((), ()))
+            new_subdirs, new_names = new_index.get(rel_dir, ((), ()))
+            prefix = rel_dir + os.sep if rel_dir else ""
+            
+            old_name_set = set(old_names)
+            new_name_set = set(new_names)
+            changes["added"].extend(prefix + name for name in new_names if name not in old_name_set)
+            changes["removed"].extend(prefix + name for name in old_names if name not in new_name_set)
+            for name in old_name_set & new_name_set:
+                self._compare_file(old_state, new_state, prefix + name, changes)
+            
+            old_subdir_set = set(old_subdirs)
+            new_subdir_set = set(new_subdirs)
+            for name in new_subdirs:
+                if name in old_subdir_set:
+                    stack.append(prefix + name)
+                else:
+                    changes["added"].extend(self._subtree_files(new_index, prefix + name))
+            for name in old_subdirs:
+                if name not in new_subdir_set:
+                    changes["removed"].extend(self._subtree_files(old_index, prefix + name))
+    
     def save_state(self, state: WorkspaceState, output_path: str = "workspace_state.json"):
         """Save workspace state to file"""
         state_dict = {
@@ -170,19 +1363,32 @@ class WorkspaceScanner:
             "directories": sorted(state.directories),
             "total_files": state.total_files,
             "total_size": state.total_size,
-            "state_hash": state.state_hash
+            "state_hash": state.state_hash,
+            "hash_algorithm": state.hash_algorithm,
+            "dir_hashes": state.dir_hashes,
+            "dir_meta": state.dir_meta
         }
         
         with open(output_path, 'w') as f:
             json.dump(state_dict, f, indent=2)
     
-    def load_state(self, input_path: str = "workspace_state.json") -> WorkspaceState:
-        """Load workspace state from file"""
+    def load_state(self, input_path: str = "workspace_state.json",
+                   lazy: bool = False) -> WorkspaceState:
+        """Load workspace state from file (binary caches too; lazy=True memory-maps them)"""
         try:
+            with open(input_path, 'rb') as f:
+                is_binary = f.read(8) == b"WSCACHE\0"
+            if is_binary:
+                from state_cache import CacheFormatError, open_state_mapped, read_state_binary
+                try:
+                    return open_state_mapped(input_path) if lazy else read_state_binary(input_path)
+                except CacheFormatError:
+                    return None
+            
             with open(input_path, 'r') as f:
                 data = json.load(f)
             
-            files = {k: FileState(**v) for k, v in data["files"].items()}
+            files = FileStateTable((k, FileState(**v)) for k, v in data["files"].items())
             
             return WorkspaceState(
                 timestamp=data["timestamp"],
@@ -191,7 +1397,10 @@ class WorkspaceScanner:
                 directories=set(data["directories"]),
                 total_files=data["total_files"],
                 total_size=data["total_size"],
-                state_hash=data["state_hash"]
+                state_hash=data["state_hash"],
+                hash_algorithm=data.get("hash_algorithm", "sha256"),
+                dir_hashes=data.get("dir_hashes", {}),
+                dir_meta=data.get("dir_meta", {})
             )
         except (FileNotFoundError, json.JSONDecodeError, KeyError):
             return None
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Workspace Watch Mode
+Linux inotify subscription keeping a WorkspaceState live without rescans
+"""
+
+import os
+import sys
+import errno
+import ctypes
+import ctypes.util
+import select
+import struct
+import threading
+from typing import Dict, List, Optional, Set
+from workspace_scanner import WorkspaceScanner, WorkspaceState, FileState
+
+# inotify event masks (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_EXCL_UNLINK = 0x04000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+              IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF |
+              IN_ONLYDIR | IN_DONT_FOLLOW | IN_EXCL_UNLINK)
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+class InotifyUnavailable(OSError):
+    """Raised when the platform or libc does not provide inotify"""
+
+def _load_libc():
+    if not sys.platform.startswith("linux"):
+        raise InotifyUnavailable("inotify requires Linux")
+    libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    if not hasattr(libc, "inotify_init1"):
+        raise InotifyUnavailable("libc lacks inotify_init1")
+    libc.inotify_init1.argtypes = [ctypes.c_int]
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    return libc
+
+class WorkspaceWatcher:
+    """Keeps a WorkspaceState current by applying inotify events incrementally"""
+    # A daemon thread drains the kernel queue; poll() applies events on the caller's
+    # thread. A queue overflow or failed watch falls back to a full rescan.
+
+    def __init__(self, scanner: WorkspaceScanner, state: Optional[WorkspaceState] = None):
+        self.scanner = scanner
+        self.state = state
+        self.root = str(scanner.root_path)
+        self.live = False
+        self.rescan_count = 0
+
+        self._libc = _load_libc()
+        self._fd = -1
+        self._watches: Dict[int, str] = {}
+        self._watched_dirs: Dict[str, int] = {}
+        self._raw_events: List[tuple] = []
+        self._needs_rescan = False
+        self._changes: Dict[str, Optional[FileState]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> WorkspaceState:
+        """Open the inotify instance, watch every tracked directory and start reading"""
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+        # Watch before scanning so nothing changing during the scan is missed
+        self._watch_directory("")
+        self.state = self.scanner.scan_workspace(previous_state=self.state)
+        for rel_dir in self.state.directories:
+            self._watch_directory(rel_dir)
+
+        self.live = True
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._read_loop, name="workspace-watcher", daemon=True)
+        self._thread.start()
+        return self.state
+
+    def stop(self):
+        """Stop reading events and release the inotify descriptor"""
+        self.live = False
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+        self._watches.clear()
+        self._watched_dirs.clear()
+
+    def _watch_directory(self, rel_dir: str):
+        if rel_dir in self._watched_dirs:
+            return
+        path = os.path.join(self.root, rel_dir) if rel_dir else self.root
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err in (errno.ENOENT, errno.ENOTDIR):
+                return  # vanished before we got to it; its parent's event covers it
+            # Out of watches (ENOSPC) or similar: the live view can no longer be trusted
+            with self._lock:
+                self._needs_rescan = True
+            return
+        self._watches[wd] = rel_dir
+        self._watched_dirs[rel_dir] = wd
+
+    def _unwatch_subtree(self, rel_dir: str):
+        prefix = rel_dir + os.sep
+        for watched in [d for d in self._watched_dirs if d == rel_dir or d.startswith(prefix)]:
+            wd = self._watched_dirs.pop(watched)
+            self._watches.pop(wd, None)
+            self._libc.inotify_rm_watch(self._fd, wd)
+
+    def _read_loop(self):
+        while not self._stop.is_set():
+            try:
+                ready, _, _ = select.select([self._fd], [], [], 0.5)
+                if not ready:
+                    continue
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                continue
+            except OSError:
+                break
+
+            events = []
+            offset = 0
+            while offset + _EVENT_HEADER.size <= len(data):
+                wd, mask, cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset:offset + length].split(b"\0", 1)[0]
+                offset += length
+                events.append((wd, mask, cookie, os.fsdecode(name)))
+
+            with self._lock:
+                if any(mask & IN_Q_OVERFLOW for _, mask, _, _ in events):
+                    self._needs_rescan = True
+                    self._raw_events.clear()
+                elif not self._needs_rescan:
+                    self._raw_events.extend(events)
+
+    def poll(self) -> Dict[str, Optional[FileState]]:
+        """Apply pending events; returns each changed path's prior FileState (None if new)"""
+        with self._lock:
+            events, self._raw_events = self._raw_events, []
+            needs_rescan, self._needs_rescan = self._needs_rescan, False
+
+        if needs_rescan:
+            return self._full_rescan()
+        if not events:
+            return {}
+
+        paths: Set[str] = set()
+        new_dirs: Set[str] = set()
+        for wd, mask, _, name in events:
+            rel_dir = self._watches.get(wd)
+            if rel_dir is None or mask & IN_IGNORED:
+                continue
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                if rel_dir:
+                    paths.add(rel_dir)
+                    self._unwatch_subtree(rel_dir)
+                continue
+            if not name:
+                continue
+            rel_path = os.path.join(rel_dir, name) if rel_dir else name
+            paths.add(rel_path)
+            if mask & IN_ISDIR:
+                if mask & IN_MOVED_FROM:
+                    self._unwatch_subtree(rel_path)
+                elif mask & (IN_CREATE | IN_MOVED_TO):
+                    new_dirs.add(rel_path)
+
+        changed = self.scanner.apply_paths(self.state, paths)
+
+        # Watch directories that appeared (including everything moved in with them)
+        for rel_dir in new_dirs:
+            prefix = rel_dir + os.sep
+            for tracked in [rel_dir] + [d for d in self.state.directories if d.startswith(prefix)]:
+                if tracked in self.state.directories:
+                    self._watch_directory(tracked)
+
+        self._record(changed)
+        return changed
+
+    def _full_rescan(self) -> Dict[str, Optional[FileState]]:
+        """Recover from a lost event stream by rescanning and re-establishing watches"""
+        self.rescan_count += 1
+        old_state = self.state
+        for wd in list(self._watches):
+            self._libc.inotify_rm_watch(self._fd, wd)
+        self._watches.clear()
+        self._watched_dirs.clear()
+
+        # Watch before rescanning; events queued meanwhile are re-applied harmlessly
+        self._watch_directory("")
+        for rel_dir in old_state.directories:
+            self._watch_directory(rel_dir)
+        new_state = self.scanner.scan_workspace(previous_state=old_state)
+        for rel_dir in new_state.directories:
+            self._watch_directory(rel_dir)
+        self.state = new_state
+
+        diff = self.scanner.compare_states(old_state, new_state)
+        changed: Dict[str, Optional[FileState]] = {path: None for path in diff["added"]}
+        changed.update((path, old_state.files[path]) for path in diff["removed"])
+        changed.update((mod["path"], old_state.files[mod["path"]]) for mod in diff["modified"])
+        for move in diff["moved"]:
+            changed[move["from"]] = old_state.files[move["from"]]
+            changed[move["to"]] = None
+        self._record(changed)
+        return changed
+
+    def _record(self, changed: Dict[str, Optional[FileState]]):
+        for path, prior in changed.items():
+            self._changes.setdefault(path, prior)
+
+    def drain_changes(self) -> Dict[str, Optional[FileState]]:
+        """Apply pending events and return {path: FileState as of the last drain} for net changes"""
+        self.poll()
+        changes, self._changes = self._changes, {}
+        return {path: prior for path, prior in changes.items()
+                if prior != self.state.files.get(path)}